@@ -1,30 +1,62 @@
 from __future__ import annotations
 
 import asyncio
+import functools
+import gc
 import logging
 from dotenv import load_dotenv
-from openai.types.beta.realtime.session import TurnDetection
 import json
 import os
 from typing import Any
 import re
+import socket
+import sys
+import time
 import uuid
 from datetime import datetime, timedelta
 from microsoft_graph_client import graph_client
+from memory_profiler import CallMemoryProfiler
+from call_metrics import CallTimings, SIP_CALL_STATUS_ATTRIBUTE, TurnLatencyTracker
+from dnc_index import mapped_dnc_check
+from pacer import pool_size_for_rate
+from redial_scheduler import OUTCOME_COMPLETED, OUTCOME_VOICEMAIL, classify_sip_error, scheduler_from_env
+import startup_profiler
+from audio_gate import AudioGate, gate_from_env
+from barge_in import BargeInDetector, barge_in_from_env
+from answer_cache import CallAnswers, answers_from_env
+from call_cost import CallCost, MeteredAudioInput
+from cascade_pipeline import PIPELINE_CASCADE, PIPELINE_REALTIME, build_cascade, pipeline_from_env, supervisor_from_env
+from worker_metrics import (
+    EVENT_ANSWER_CACHE,
+    EVENT_AUDIO_GATE,
+    EVENT_BARGE_IN,
+    EVENT_CALL_COST,
+    EVENT_CALL_ENDED,
+    EVENT_CALL_STARTED,
+    EVENT_DIAL,
+    EVENT_FALLBACK,
+    EVENT_GRAPH,
+    EVENT_TURN,
+    MetricsEmitter,
+    emitter_from_env,
+)
 
 from livekit import rtc, api
 from livekit.agents import (
     AgentSession,
     Agent,
     JobContext,
+    JobProcess,
     function_tool,
     RunContext,
     get_job_context,
     cli,
     WorkerOptions,
     RoomInputOptions,
+    RoomOutputOptions,
+    StopResponse,
+    llm,
 )
-from livekit.plugins import openai
 
 # Load environment variables
 load_dotenv(dotenv_path=".env.local")
@@ -35,18 +67,24 @@ logger.setLevel(logging.INFO)
 
 outbound_trunk_id = os.getenv("SIP_OUTBOUND_TRUNK_ID", "ST_G24Bo8JH4iy7")
 
-class TDXSDRBot(Agent):
-    def __init__(
-        self,
-        *,
-        company_name: str,
-        contact_name: str,
-        prospect_info: dict[str, Any],
-        dial_info: dict[str, Any],
-        call_direction: str = "inbound",
-    ):
-        super().__init__(
-            instructions=f"""
+# The realtime model's native audio format. These options only pin livekit-agents'
+# own RoomInput/OutputOptions defaults (24 kHz mono): the room audio already matches
+# the model, and the SDK's 48 <-> 24 kHz stage is the only resampling. Pinned so a
+# change of SDK defaults can't add a resampler in front of the model unnoticed
+REALTIME_SAMPLE_RATE = 24000
+ROOM_INPUT_OPTIONS = RoomInputOptions(audio_sample_rate=REALTIME_SAMPLE_RATE, audio_num_channels=1)
+ROOM_OUTPUT_OPTIONS = RoomOutputOptions(audio_sample_rate=REALTIME_SAMPLE_RATE, audio_num_channels=1)
+
+# Hosts every call talks to; resolved during prewarm so the first call skips DNS
+PREWARM_HOSTS = [
+    "api.openai.com",
+    "graph.microsoft.com",
+    "login.microsoftonline.com",
+]
+
+# Prompt del agente: es texto estático, así que se construye una sola vez por
+# proceso y todas las llamadas comparten la misma cadena en memoria.
+SDR_INSTRUCTIONS = """
             
 🚀 **CONFIGURACIÓN DE VELOCIDAD CRÍTICA:**
 - HABLA MUY RÁPIDO como un vendedor experto con mucha energía
@@ -184,37 +222,10 @@ Email → Disponibilidad → Confirmación → Agendamiento
 ---
 
 Este enfoque transformará a Enrique en un consultor de inteligencia artificial que no solo escucha, sino que **entiende rápidamente la esencia del dolor del cliente**, adaptando su estrategia de comunicación para ser lo más efectivo posible."""
-        )
-        self.participant: rtc.RemoteParticipant | None = None
-        self.dial_info = dial_info
-        self.prospect_info = prospect_info
-        self.company_name = company_name
-        self.contact_name = contact_name
-        self.call_direction = call_direction
 
-    def set_participant(self, participant: rtc.RemoteParticipant):
-        self.participant = participant
+GREETING_TEMPLATE = "¡Hola! Habla Enrique de TDX. ¿Cómo está? Estoy llamando porque TDX está ayudando a empresas como {company_name} a transformar sus operaciones con inteligencia artificial. ¿Tiene un minuto para platicar?"
 
-    async def on_session_start(self, ctx: RunContext):
-        """Called when agent session starts - handle greeting based on call direction"""
-        logger.info(f"🚀 Agent session started!")
-        logger.info(f"📞 Call direction detected: {self.call_direction}")
-        logger.info(f"🏢 Company: {self.company_name}")
-        logger.info(f"👤 Contact: {self.contact_name}")
-        
-        try:
-            logger.info("⏳ Waiting 1 second for connection to stabilize...")
-            await asyncio.sleep(1)  # Faster response time for better user experience
-            
-            # Always greet immediately for both inbound and outbound
-            greeting_msg = f"¡Hola! Habla Enrique de TDX. ¿Cómo está? Estoy llamando porque TDX está ayudando a empresas como {self.company_name} a transformar sus operaciones con inteligencia artificial. ¿Tiene un minuto para platicar?"
-            
-            logger.info(f"🎤 Sending greeting for {self.call_direction} call...")
-            logger.info(f"💬 Greeting message: {greeting_msg}")
-            
-            # Send greeting and enable continuous conversation
-            await ctx.session.generate_reply(
-                instructions=f"""
+GREETING_INSTRUCTIONS_TEMPLATE = """
                 VELOCIDAD: Habla MUY RÁPIDO como un vendedor experto y entusiasmado. Actúa como si tuvieras mucha energía y estuvieras emocionado por la llamada.
                 
                 Say this greeting exactly in Spanish: '{greeting_msg}'
@@ -230,17 +241,254 @@ Este enfoque transformará a Enrique en un consultor de inteligencia artificial
                 
                 REMEMBER: This is a sales conversation, not a one-time announcement. Engage fully!
                 """
+
+# Añadido a SDR_INSTRUCTIONS en el pipeline en cascada: el texto del LLM se convierte a voz
+CASCADE_INSTRUCTIONS = """
+
+---
+
+**SALIDA DE VOZ:** Tu texto se convierte a voz. Responde en frases cortas, en texto plano:
+sin markdown, sin emojis, sin listas. Escribe los emails y las horas como se dicen en voz alta."""
+
+# Primera respuesta tras pasar una llamada en curso del modelo realtime al pipeline en cascada
+HANDOFF_INSTRUCTIONS_TEMPLATE = """
+                La llamada con {contact_name} de {company_name} ya está en curso (fase: {phase}); NO saludes de nuevo.
+                Hubo una demora de tu lado: discúlpate en una frase corta y continúa donde quedó la conversación.
+                Si lo último que dijo el prospecto no aparece en la conversación, pídele amablemente que lo repita.
+                """
+
+# Basic email validation pattern, compiled once per process
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Fases de la conversación. El silencio de server_vad es el piso de la latencia de
+# cada turno, así que solo la fase de email (deletreo letra por letra) paga uno largo
+PHASE_GREETING = "greeting"
+PHASE_DISCOVERY = "discovery"
+PHASE_EMAIL = "email"
+PHASE_SCHEDULING = "scheduling"
+
+TURN_DETECTION_BY_PHASE = {
+    # Respuestas cortas ("¿Aló? Sí, con él"); umbral alto por el ruido al conectar
+    PHASE_GREETING: {"threshold": 0.7, "silence_duration_ms": 400, "prefix_padding_ms": 200},
+    PHASE_DISCOVERY: {"threshold": 0.6, "silence_duration_ms": 500, "prefix_padding_ms": 200},
+    # Pausas entre letras; más padding para no cortar la primera letra
+    PHASE_EMAIL: {"threshold": 0.6, "silence_duration_ms": 1000, "prefix_padding_ms": 300},
+    # Fechas y horas: "el jueves... a las tres"
+    PHASE_SCHEDULING: {"threshold": 0.6, "silence_duration_ms": 600, "prefix_padding_ms": 200},
+}
+
+# Fase a la que pasa la llamada tras una respuesta en caché (answer_cache.ANSWERS)
+ANSWER_PHASES = {
+    "what_is_tdx": PHASE_DISCOVERY,
+    # La respuesta pide el email
+    "send_info": PHASE_EMAIL,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def turn_detection_for(phase: str):
+    """server_vad settings for a conversation phase, built once per process"""
+    from openai.types.beta.realtime.session import TurnDetection
+
+    return TurnDetection(
+        type="server_vad",  # server_vad es MÁS PRECISO que semantic_vad para emails
+        create_response=True,
+        interrupt_response=True,
+        **TURN_DETECTION_BY_PHASE[phase],
+    )
+
+class CallState:
+    """Per-call data for the agent, slotted since one instance exists per concurrent call"""
+    __slots__ = (
+        "company_name",
+        "contact_name",
+        "prospect_info",
+        "dial_info",
+        "call_direction",
+        "participant",
+        "outcome",
+        "metrics",
+        "phase",
+        "pipeline",
+        "cost",
+        "answers",
+    )
+
+    def __init__(
+        self,
+        *,
+        company_name: str,
+        contact_name: str,
+        prospect_info: dict[str, Any],
+        dial_info: dict[str, Any],
+        call_direction: str,
+    ):
+        self.company_name = company_name
+        self.contact_name = contact_name
+        self.prospect_info = prospect_info
+        self.dial_info = dial_info
+        self.call_direction = call_direction
+        self.participant: rtc.RemoteParticipant | None = None
+        # Set by tools that know how the call ended (e.g. voicemail); None = completed
+        self.outcome: str | None = None
+        # Ops dashboard emitter, None when TDX_METRICS_URL is not set
+        self.metrics: MetricsEmitter | None = None
+        # Conversation phase; selects the realtime model's turn detection
+        self.phase = PHASE_GREETING
+        # PIPELINE_REALTIME, or PIPELINE_CASCADE once the call runs on STT -> LLM -> TTS
+        self.pipeline = PIPELINE_REALTIME
+        # Usage accounting, set by the entrypoint
+        self.cost: CallCost | None = None
+        # Pre-rendered answers (answer_cache), None when TDX_ANSWER_CACHE is off
+        self.answers: CallAnswers | None = None
+
+    def release(self):
+        """Drop references to per-call payloads once the call has ended"""
+        self.prospect_info = {}
+        self.dial_info = {}
+        self.participant = None
+
+
+class TDXSDRBot(Agent):
+    def __init__(
+        self,
+        *,
+        company_name: str,
+        contact_name: str,
+        prospect_info: dict[str, Any],
+        dial_info: dict[str, Any],
+        call_direction: str = "inbound",
+        cascade: dict[str, Any] | None = None,
+        chat_ctx: llm.ChatContext | None = None,
+    ):
+        # cascade: STT/LLM/TTS from cascade_pipeline.build_cascade(); None = the session's realtime model
+        super().__init__(
+            instructions=SDR_INSTRUCTIONS + CASCADE_INSTRUCTIONS if cascade else SDR_INSTRUCTIONS,
+            chat_ctx=chat_ctx,
+            **(cascade or {}),
+        )
+        self.call_state = CallState(
+            company_name=company_name,
+            contact_name=contact_name,
+            prospect_info=prospect_info,
+            dial_info=dial_info,
+            call_direction=call_direction,
+        )
+        if cascade:
+            self.call_state.pipeline = PIPELINE_CASCADE
+        # Set on the agent that takes over a call in progress: it speaks first
+        self.handoff = False
+
+    def set_participant(self, participant: rtc.RemoteParticipant):
+        self.call_state.participant = participant
+
+    def on_cascade(self, cascade: dict[str, Any]) -> TDXSDRBot:
+        """This agent on the cascaded pipeline: same call state, the conversation so far carried over"""
+        state = self.call_state
+        bot = TDXSDRBot(
+            company_name=state.company_name,
+            contact_name=state.contact_name,
+            prospect_info=state.prospect_info,
+            dial_info=state.dial_info,
+            call_direction=state.call_direction,
+            cascade=cascade,
+            chat_ctx=self.chat_ctx,
+        )
+        # The shared state keeps its pipeline until the session actually switches
+        bot.call_state = state
+        bot.handoff = True
+        return bot
+
+    async def on_enter(self):
+        if self.handoff:
+            # The caller is waiting on the answer the realtime model never gave
+            self.session.generate_reply(instructions=HANDOFF_INSTRUCTIONS_TEMPLATE.format(
+                contact_name=self.call_state.contact_name,
+                company_name=self.call_state.company_name,
+                phase=self.call_state.phase,
+            ))
+
+    async def on_user_turn_completed(self, turn_ctx: llm.ChatContext, new_message: llm.ChatMessage):
+        """Cascade turns only: play a cached answer instead of generating one"""
+        answers = self.call_state.answers
+        # Spelled-out emails never match, and a letter must not be taken for a question
+        if answers is None or self.call_state.phase == PHASE_EMAIL:
+            return
+        answer = answers.lookup(new_message.text_content or "")
+        if answer is None:
+            return
+        logger.info(f"🗃️ Cached answer '{answer.intent}' for: {new_message.text_content}")
+        # No reply is generated for this turn, so the question goes into the context here
+        turn_ctx.items.append(new_message)
+        await self.update_chat_ctx(turn_ctx)
+        self.session.say(answer.text, audio=answer.audio() if answer.frames else None)
+        if answer.intent in ANSWER_PHASES:
+            self.set_phase(self.session, ANSWER_PHASES[answer.intent])
+        raise StopResponse()
+
+    def set_phase(self, session: AgentSession, phase: str):
+        """Switch the realtime model's turn detection to the given conversation phase"""
+        if phase == self.call_state.phase:
+            return
+        logger.info(f"🎚️ Phase {self.call_state.phase} -> {phase}: {TURN_DETECTION_BY_PHASE[phase]}")
+        self.call_state.phase = phase
+        if self.call_state.pipeline == PIPELINE_CASCADE:
+            # The cascade's turns end on the STT/VAD; the phase is only tracked
+            return
+        try:
+            session.llm.update_options(turn_detection=turn_detection_for(phase))
+        except Exception as e:
+            # Keep talking with the previous settings rather than break the call
+            logger.warning(f"Could not update turn detection for {phase}: {e}")
+
+    async def _graph_call(self, op: str, coro):
+        """Await a Microsoft Graph call and report its latency to the dashboard"""
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = await coro
+            ok = True
+            return result
+        finally:
+            if self.call_state.cost is not None:
+                self.call_state.cost.on_graph(op)
+            if self.call_state.metrics is not None:
+                self.call_state.metrics.emit(EVENT_GRAPH, op=op, latency_s=time.perf_counter() - started, ok=ok)
+
+    async def on_session_start(self, ctx: RunContext):
+        """Called when agent session starts - handle greeting based on call direction"""
+        logger.info(f"🚀 Agent session started!")
+        logger.info(f"📞 Call direction detected: {self.call_state.call_direction}")
+        logger.info(f"🏢 Company: {self.call_state.company_name}")
+        logger.info(f"👤 Contact: {self.call_state.contact_name}")
+        
+        logger.info("⏳ Waiting 1 second for connection to stabilize...")
+        await asyncio.sleep(1)  # Faster response time for better user experience
+        await self.greet(ctx.session)
+
+    async def greet(self, session: AgentSession):
+        """Say the opening line; outbound calls invoke this at the exact answer moment"""
+        try:
+            # Always greet immediately for both inbound and outbound
+            greeting_msg = GREETING_TEMPLATE.format(company_name=self.call_state.company_name)
+            
+            logger.info(f"🎤 Sending greeting for {self.call_state.call_direction} call...")
+            logger.info(f"💬 Greeting message: {greeting_msg}")
+            
+            # Send greeting and enable continuous conversation
+            await session.generate_reply(
+                instructions=GREETING_INSTRUCTIONS_TEMPLATE.format(greeting_msg=greeting_msg)
             )
             
             logger.info("✅ Greeting sent with conversation instructions!")
             
         except Exception as e:
-            logger.error(f"❌ Error in on_session_start: {e}")
+            logger.error(f"❌ Error sending greeting: {e}")
             logger.error(f"🔍 Exception details: {type(e).__name__}: {str(e)}")
             # Try a simple fallback greeting
             try:
                 logger.info("🔄 Attempting fallback greeting...")
-                await ctx.session.generate_reply(
+                await session.generate_reply(
                     instructions="Say in Spanish: 'Hola, habla Enrique de TDX. ¿Cómo está?'"
                 )
                 logger.info("✅ Fallback greeting sent!")
@@ -257,7 +505,7 @@ Este enfoque transformará a Enrique en un consultor de inteligencia artificial
     @function_tool()
     async def transfer_call(self, ctx: RunContext):
         """Transfer the call to a senior SDR or human agent"""
-        transfer_to = self.dial_info["transfer_to"]
+        transfer_to = self.call_state.dial_info["transfer_to"]
         if not transfer_to:
             return "cannot transfer call"
 
@@ -272,7 +520,7 @@ Este enfoque transformará a Enrique en un consultor de inteligencia artificial
             await job_ctx.api.sip.transfer_sip_participant(
                 api.TransferSIPParticipantRequest(
                     room_name=job_ctx.room.name,
-                    participant_identity=self.participant.identity,
+                    participant_identity=self.call_state.participant.identity,
                     transfer_to=f"tel:{transfer_to}",
                 )
             )
@@ -284,7 +532,7 @@ Este enfoque transformará a Enrique en un consultor de inteligencia artificial
     @function_tool()
     async def end_call(self, ctx: RunContext):
         """Called when the user wants to end the call"""
-        logger.info(f"ending the call for {self.participant.identity}")
+        logger.info(f"ending the call for {self.call_state.participant.identity}")
         current_speech = ctx.session.current_speech
         if current_speech:
             await current_speech.wait_for_playout()
@@ -300,9 +548,11 @@ Este enfoque transformará a Enrique en un consultor de inteligencia artificial
         """Collect and verify prospect's email address with spelling confirmation"""
         logger.info(f"collecting email: {email}, spelled out: {spelled_out}")
         
-        # Basic email validation - import ya está al inicio del archivo
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        is_valid = re.match(email_pattern, email.lower()) is not None
+        # Basic email validation - patrón precompilado a nivel de módulo
+        is_valid = EMAIL_PATTERN.match(email.lower()) is not None
+        
+        # Valid: next come dates and times. Invalid: they spell it again
+        self.set_phase(ctx.session, PHASE_SCHEDULING if is_valid else PHASE_EMAIL)
         
         return {
             "email_collected": True,
@@ -336,7 +586,9 @@ Este enfoque transformará a Enrique en un consultor de inteligencia artificial
             end_date = start_date + timedelta(days=7)  # Search 7 days ahead
             
             # Check availability using Microsoft Graph API
-            available_slots = await graph_client.check_availability(start_date, end_date)
+            available_slots = await self._graph_call(
+                "check_availability", graph_client.check_availability(start_date, end_date)
+            )
             
             # Ensure we have at least 2 slots, fallback to mock if needed
             if len(available_slots) < 2:
@@ -369,7 +621,7 @@ Este enfoque transformará a Enrique en un consultor de inteligencia artificial
     ):
         """Schedule meeting using Microsoft Graph API with user feedback"""
         logger.info(
-            f"scheduling {meeting_type} for {self.contact_name} ({email}) from {self.company_name} on {date} at {time}"
+            f"scheduling {meeting_type} for {self.call_state.contact_name} ({email}) from {self.call_state.company_name} on {date} at {time}"
         )
         
         # NUEVO: Feedback inmediato al usuario
@@ -380,16 +632,19 @@ Este enfoque transformará a Enrique en un consultor de inteligencia artificial
         # NUEVO: Pequeña pausa para que se escuche el mensaje
         await asyncio.sleep(0.2)
         
+        # Dates are settled; the rest of the call is wrap-up questions
+        self.set_phase(ctx.session, PHASE_DISCOVERY)
+        
         try:
             # Create meeting using Microsoft Graph API - import ya está al inicio
-            result = await graph_client.create_meeting(
+            result = await self._graph_call("create_meeting", graph_client.create_meeting(
                 attendee_email=email,
                 meeting_date=date,
                 meeting_time=time,
-                contact_name=self.contact_name,
-                company_name=self.company_name,
+                contact_name=self.call_state.contact_name,
+                company_name=self.call_state.company_name,
                 meeting_type=meeting_type
-            )
+            ))
             
             logger.info(f"Meeting created successfully: {result.get('meeting_id', 'N/A')}")
             return result
@@ -424,7 +679,7 @@ Este enfoque transformará a Enrique en un consultor de inteligencia artificial
     ):
         """Qualify prospect using BANT methodology"""
         logger.info(
-            f"qualifying prospect {self.contact_name}: Budget={budget_range}, Authority={authority_level}, Need={need_urgency}, Timeline={timeline}"
+            f"qualifying prospect {self.call_state.contact_name}: Budget={budget_range}, Authority={authority_level}, Need={need_urgency}, Timeline={timeline}"
         )
         
         # Score qualification
@@ -450,6 +705,9 @@ Este enfoque transformará a Enrique en un consultor de inteligencia artificial
             score += 10
         
         qualified = score >= 60
+        if qualified:
+            # The script asks for the email right after qualifying
+            self.set_phase(ctx.session, PHASE_EMAIL)
         
         return {
             "qualified": qualified,
@@ -460,41 +718,117 @@ Este enfoque transformará a Enrique en un consultor de inteligencia artificial
     @function_tool()
     async def detected_answering_machine(self, ctx: RunContext):
         """Called when the call reaches voicemail"""
-        logger.info(f"detected answering machine for {self.participant.identity}")
+        logger.info(f"detected answering machine for {self.call_state.participant.identity}")
+        self.call_state.outcome = OUTCOME_VOICEMAIL
         await ctx.session.generate_reply(
-            instructions=f"Leave a professional voicemail: Hi {self.contact_name}, this is from TDX. I'm calling regarding AI solutions that could help {self.company_name}. I'll follow up via email. Have a great day!"
+            instructions=f"Leave a professional voicemail: Hi {self.call_state.contact_name}, this is from TDX. I'm calling regarding AI solutions that could help {self.call_state.company_name}. I'll follow up via email. Have a great day!"
         )
         await asyncio.sleep(15)
         await self.hangup()
 
-async def entrypoint(ctx: JobContext):
-    logger.info(f"connecting to room {ctx.room.name}")
-    await ctx.connect()
+def build_realtime_model():
+    """Realtime model with a warm session pool, configured for FAST speech + HIGH accuracy"""
+    # Imported here rather than at module level: the OpenAI plugin pulls in ~2 s of
+    # openai types the worker's main process never needs (prewarm has loaded them)
+    from realtime_pool import PooledRealtimeModel, DEFAULT_IDLE_TTL_S
+
+    return PooledRealtimeModel(
+        pool_size=1,
+        idle_ttl_s=float(os.getenv("TDX_REALTIME_POOL_IDLE_S", DEFAULT_IDLE_TTL_S)),
+        refill=False,  # one job per loop; a refilled session would never be claimed
+        model="gpt-4o-realtime-preview",
+        voice="echo",  # Mejor para español
+        # Calls start in the greeting phase; the tools switch phases as the call moves on
+        turn_detection=turn_detection_for(PHASE_GREETING),
+        temperature=0.6,  # CAMBIO: Más bajo para MÁXIMA precisión en emails
+        # REMOVIDO: input_audio_transcription causa error de compatibilidad
+    )
+
 
-    # Parse metadata
+def prewarm(proc: JobProcess):
+    """Preload everything a call needs so each job process starts hot"""
+    started = time.perf_counter()
+    
+    # Microsoft Graph: the singleton builds its client lazily, do it here and fetch the token
+    proc.userdata["graph_ready"] = graph_client.warm_up()
+    
+    # Plugins are imported lazily by the entrypoint; load them before the job arrives
+    import realtime_pool  # noqa: F401  (imports livekit.plugins.openai)
+    # Builds the per-phase TurnDetection (and imports the openai types) before the first call
+    for phase in TURN_DETECTION_BY_PHASE:
+        turn_detection_for(phase)
+    
+    # Prompt templates are module-level constants; validate them once per process
+    GREETING_INSTRUCTIONS_TEMPLATE.format(
+        greeting_msg=GREETING_TEMPLATE.format(company_name="TDX")
+    )
+    
+    # Local models are optional - only load them if the plugin is installed
+    try:
+        from livekit.plugins import silero
+        proc.userdata["vad"] = silero.VAD.load()
+        logger.info("✅ Silero VAD loaded during prewarm")
+    except ImportError:
+        proc.userdata["vad"] = None
+    
+    # Warm DNS for the endpoints the call will hit
+    for host in PREWARM_HOSTS:
+        try:
+            socket.getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+        except OSError as e:
+            logger.warning(f"Could not resolve {host} during prewarm: {e}")
+    
+    # Cached answers and their audio, shared by every call in this process
+    proc.userdata["answers"] = answers_from_env()
+    
+    proc.userdata["warmup_s"] = time.perf_counter() - started
+    logger.info(f"🔥 Process prewarmed in {proc.userdata['warmup_s'] * 1000:.0f} ms")
+
+
+def parse_call_metadata(room_name: str, raw_metadata: str) -> tuple[dict, str, str | None]:
+    """Job metadata, call direction and phone number for a call room"""
     metadata = {}
-    if ctx.job.metadata:
+    if raw_metadata:
         try:
-            metadata = json.loads(ctx.job.metadata)
+            metadata = json.loads(raw_metadata)
         except json.JSONDecodeError:
             logger.warning("Invalid metadata JSON, using defaults")
     
-    dial_info = metadata.get("dial_info", {})
-    prospect_info = metadata.get("prospect_info", {})
-    
     # Extract phone number from room name if not in metadata
-    phone_number = dial_info.get("phone_number")
-    if not phone_number and ctx.room.name.startswith("call-"):
-        phone_number = "+" + ctx.room.name.replace("call-", "")
+    phone_number = metadata.get("dial_info", {}).get("phone_number")
+    if not phone_number and room_name.startswith("call-"):
+        phone_number = "+" + room_name.replace("call-", "")
     
     # Determine call direction based on metadata or room pattern
     call_direction = metadata.get("call_direction", "outbound")
     # If room matches outbound pattern (simple call-NUMBER), it's outbound
-    if ctx.room.name.startswith("call-") and not "_" in ctx.room.name:
+    if room_name.startswith("call-") and not "_" in room_name:
         call_direction = "outbound"  # Simple pattern = outbound call from script
-    elif ctx.room.name.startswith("call-") and "_" in ctx.room.name:
+    elif room_name.startswith("call-") and "_" in room_name:
         call_direction = "inbound"   # Complex pattern = inbound dispatch rule
     
+    return metadata, call_direction, phone_number
+
+
+async def entrypoint(ctx: JobContext):
+    job_started = time.perf_counter()
+    memory = CallMemoryProfiler(ctx.room.name)
+    memory.snapshot("job_start")
+    
+    pipeline = pipeline_from_env()
+    realtime_model = None
+    if pipeline == PIPELINE_REALTIME:
+        # Open the realtime websocket first so the handshake overlaps connect and dialing
+        realtime_model = build_realtime_model()
+        realtime_model.prewarm_sessions()
+    logger.info(f"connecting to room {ctx.room.name}")
+    logger.info(f"🔥 Process warmup took {ctx.proc.userdata.get('warmup_s', 0) * 1000:.0f} ms")
+    await ctx.connect()
+
+    metadata, call_direction, phone_number = parse_call_metadata(ctx.room.name, ctx.job.metadata)
+    dial_info = metadata.get("dial_info", {})
+    prospect_info = metadata.get("prospect_info", {})
+    
     participant_identity = phone_number or "unknown"
     company_name = prospect_info.get("company_name", "Unknown Company")
     contact_name = prospect_info.get("contact_name", "there")
@@ -506,59 +840,275 @@ async def entrypoint(ctx: JobContext):
         prospect_info=prospect_info,
         dial_info=dial_info,
         call_direction=call_direction,
+        cascade=build_cascade(ctx.proc.userdata.get("vad")) if pipeline == PIPELINE_CASCADE else None,
     )
-
-    # Use OpenAI Realtime API with OPTIMAL configuration for FAST speech + HIGH accuracy
-    session = AgentSession(
-        llm=openai.realtime.RealtimeModel(
-            model="gpt-4o-realtime-preview",
-            voice="echo",  # Mejor para español
-            turn_detection=TurnDetection(
-                type="server_vad",     # CAMBIO: server_vad es MÁS PRECISO que semantic_vad para emails
-                threshold=0.6,         # NUEVO: Más alto que default (0.5) para reducir ruido
-                silence_duration_ms=700,  # NUEVO: Más tiempo para emails largos (default 500ms)
-                prefix_padding_ms=200,    # NUEVO: Reducido de 300ms para mayor velocidad
-                create_response=True,
-                interrupt_response=True,
-            ),
-            temperature=0.6,  # CAMBIO: Más bajo para MÁXIMA precisión en emails
-            # REMOVIDO: input_audio_transcription causa error de compatibilidad
-        )
-    )
+    cost = CallCost(ctx.room.name, metadata.get("campaign_id"))
+    agent.call_state.cost = cost
+    answer_cache = ctx.proc.userdata.get("answers")
+    if answer_cache is not None:
+        agent.call_state.answers = CallAnswers(answer_cache)
+    memory.snapshot("agent_created")
+
+    # The realtime model was created (and its session warmed) at job start;
+    # a cascade agent brings its own STT/LLM/TTS
+    session = AgentSession(llm=realtime_model) if realtime_model is not None else AgentSession()
+    timings = CallTimings(ctx.room.name)
+    turns = TurnLatencyTracker()
+    audio_gate: AudioGate | None = None
+    barge_in: BargeInDetector | None = None
+
+    def install_audio_wrappers():
+        """Local barge-in (TDX_BARGE_IN) and line-silence gate (TDX_AUDIO_GATE) around the room audio"""
+        nonlocal audio_gate, barge_in
+        # Barge-in goes first so it sees every frame, silence included, for its noise floor
+        barge_in = barge_in_from_env(session.input.audio, session.output.audio)
+        if barge_in is not None:
+            session.output.audio = barge_in.output
+            session.input.audio = barge_in
+        # Forward enough trailing silence for the longest phase to still end its turn
+        longest_silence_ms = max(opts["silence_duration_ms"] for opts in TURN_DETECTION_BY_PHASE.values())
+        audio_gate = gate_from_env(session.input.audio, longest_silence_ms)
+        if audio_gate is not None:
+            session.input.audio = audio_gate
+        # Outermost: counts the audio that actually reaches the model
+        if session.input.audio is not None:
+            cost.input_meter = MeteredAudioInput(session.input.audio)
+            session.input.audio = cost.input_meter
+        if session.output.audio is not None:
+            session.output.audio.on("playback_finished", lambda ev: cost.on_playback(ev.playback_position))
+
+    async def release_call_resources(reason: str):
+        """Free per-call buffers on hangup so a draining process doesn't hold them"""
+        turns.report(ctx.room.name)
+        connected_at = timings.marks.get("answered", timings.marks.get("participant_joined"))
+        cost.finish(sip_s=time.monotonic() - connected_at if connected_at is not None else 0.0)
+        call_cost = cost.to_dict()
+        outcome = agent.call_state.outcome or OUTCOME_COMPLETED
+        logger.info(f"💵 Call cost ({outcome}): {call_cost}")
+        emit(EVENT_CALL_COST, outcome=outcome, **call_cost)
+        if audio_gate is not None:
+            gate_stats = audio_gate.stats.to_dict()
+            logger.info(f"🔇 Audio gate: {gate_stats}")
+            emit(EVENT_AUDIO_GATE, **gate_stats)
+        if barge_in is not None:
+            barge_in_stats = barge_in.stats.to_dict()
+            logger.info(f"✋ Barge-in: {barge_in_stats}")
+            emit(EVENT_BARGE_IN, **barge_in_stats)
+            await barge_in.aclose()
+        if agent.call_state.answers is not None:
+            answer_stats = agent.call_state.answers.stats.to_dict()
+            logger.info(f"🗃️ Answer cache: {answer_stats}")
+            emit(EVENT_ANSWER_CACHE, **answer_stats)
+        memory.snapshot("hangup")
+        agent.call_state.release()
+        session.history.items.clear()
+        gc.collect()
+        memory.snapshot("released")
+        memory.report()
+        if realtime_model is not None:
+            await realtime_model.aclose()
+
+    ctx.add_shutdown_callback(release_call_resources)
+
+    metrics = emitter_from_env(ctx.room.name)
+    agent.call_state.metrics = metrics
+    if metrics is not None:
+        metrics.start()
+        metrics.emit(EVENT_CALL_STARTED, direction=call_direction)
+
+        async def close_metrics(reason: str):
+            metrics.emit(EVENT_CALL_ENDED, outcome=agent.call_state.outcome, reason=reason)
+            await metrics.aclose()
+
+        ctx.add_shutdown_callback(close_metrics)
+
+    def emit(event_type: str, **fields):
+        if metrics is not None:
+            metrics.emit(event_type, **fields)
+
+    def fall_back_to_cascade(reason: str):
+        """Move the live call off the realtime model (LatencySupervisor breach)"""
+        logger.warning(f"🔀 Realtime {reason} in phase {agent.call_state.phase}: switching to the cascaded pipeline")
+        emit(EVENT_FALLBACK, reason=reason, phase=agent.call_state.phase)
+        try:
+            session.update_agent(agent.on_cascade(build_cascade(ctx.proc.userdata.get("vad"))))
+        except Exception as e:
+            logger.error(f"❌ Could not switch to the cascaded pipeline: {e}")
+            return
+        agent.call_state.pipeline = PIPELINE_CASCADE
+
+    supervisor = supervisor_from_env(fall_back_to_cascade) if pipeline == PIPELINE_REALTIME else None
+    if supervisor is not None:
+        async def close_supervisor(reason: str):
+            supervisor.close()
+            if supervisor.switched:
+                logger.info(f"🔀 Fallback: {supervisor.to_dict()}")
+
+        ctx.add_shutdown_callback(close_supervisor)
+
+        @session.on("error")
+        def _on_session_error(ev):
+            if ev.source is realtime_model:
+                supervisor.on_realtime_error(ev.error)
+
+    @session.on("metrics_collected")
+    def _on_metrics(ev):
+        cost.on_metrics(ev.metrics)
+
+    @session.on("function_tools_executed")
+    def _on_tools(ev):
+        cost.on_tools(call.name for call in ev.function_calls)
+
+    @session.on("user_state_changed")
+    def _on_user_state(ev):
+        turns.on_user_state(ev.old_state, ev.new_state)
+        if supervisor is not None:
+            if ev.new_state == "speaking":
+                supervisor.on_user_speaking()
+            elif ev.old_state == "speaking":
+                supervisor.on_user_turn_ended()
+        if barge_in is not None:
+            # The server heard the caller: timing for a local barge-in pause
+            barge_in.on_user_state(ev.new_state)
+
+    @session.on("agent_state_changed")
+    def _on_agent_state(ev):
+        if ev.new_state == "speaking" and "first_agent_speech" not in timings.marks:
+            timings.mark("first_agent_speech")
+            timings.report()
+        phase = agent.call_state.phase
+        latency = turns.on_agent_state(ev.new_state, phase)
+        if latency is not None:
+            # silence_ms: the VAD window the caller waited before the turn counted as ended
+            silence_ms = TURN_DETECTION_BY_PHASE[phase]["silence_duration_ms"]
+            emit(EVENT_TURN, latency_s=latency, phase=phase, silence_ms=silence_ms, pipeline=agent.call_state.pipeline)
+            if supervisor is not None and agent.call_state.pipeline == PIPELINE_REALTIME:
+                supervisor.on_turn_latency(latency)
+            if agent.call_state.answers is not None and agent.call_state.pipeline == PIPELINE_CASCADE:
+                agent.call_state.answers.on_turn_latency(latency)
+            if phase == PHASE_GREETING:
+                # They answered the greeting: discovery questions from here on
+                agent.set_phase(session, PHASE_DISCOVERY)
 
     # Check if this is an outbound call (phone number in metadata)
     outbound_phone = dial_info.get("phone_number") if call_direction == "outbound" else None
     
     if outbound_phone:
-        # OUTBOUND CALL: Start session first, then create SIP participant
+        # OUTBOUND CALL: dial and start the realtime session at the same time
         logger.info(f"Creating outbound call to {outbound_phone}")
-        try:
-            # Start session first
-            session_task = asyncio.create_task(
-                session.start(agent=agent, room=ctx.room)
+        sip_identity = f"sip_{outbound_phone.replace('+', '')}"
+        redial = scheduler_from_env()
+        
+        # Last line of defense for every dispatch path, against the exported DNC file
+        # (mapped, not loaded, so idle processes don't hold the list). Dedupe is the
+        # dispatchers' job: a redial legitimately calls the same number again the same day
+        blocked = mapped_dnc_check(outbound_phone)
+        if blocked:
+            logger.warning(f"🚫 Not dialing {outbound_phone}: {blocked}")
+            agent.call_state.outcome = blocked
+            emit(EVENT_DIAL, outcome=blocked)
+            if redial is not None:
+                redial.close()
+            ctx.shutdown()
+            return
+        
+        async def record_outcome(
+            outcome: str,
+            sip_status: str | None = None,
+            duration_s: float | None = None,
+            call_cost: dict[str, Any] | None = None,
+        ):
+            """Store the attempt so the redial scheduler can retry no-answer/busy/voicemail"""
+            if redial is None:
+                return
+            try:
+                next_at = await asyncio.to_thread(
+                    redial.record_attempt,
+                    outbound_phone,
+                    outcome,
+                    metadata=metadata,
+                    room=ctx.room.name,
+                    sip_status=sip_status,
+                    duration_s=duration_s,
+                    cost=call_cost,
+                )
+                when = time.strftime("%Y-%m-%d %H:%M", time.localtime(next_at)) if next_at else "no redial"
+                logger.info(f"🔁 Call outcome {outcome} for {outbound_phone}: {when}")
+            except Exception as e:
+                logger.warning(f"Could not record call outcome: {e}")
+        
+        async def record_answered_call(reason: str):
+            if "answered" in timings.marks:
+                duration_s = time.monotonic() - timings.marks["answered"]
+                # release_call_resources (registered first) already closed the cost books
+                await record_outcome(
+                    agent.call_state.outcome or OUTCOME_COMPLETED, duration_s=duration_s, call_cost=cost.to_dict()
+                )
+            if redial is not None:
+                redial.close()
+        
+        ctx.add_shutdown_callback(record_answered_call)
+        
+        @ctx.room.on("participant_attributes_changed")
+        def _on_sip_status(changed: dict[str, str], participant: rtc.Participant):
+            if participant.identity == sip_identity and SIP_CALL_STATUS_ATTRIBUTE in changed:
+                timings.on_sip_call_status(changed[SIP_CALL_STATUS_ATTRIBUTE])
+        
+        async def start_session():
+            timings.mark("session_starting")
+            await session.start(
+                agent=agent,
+                room=ctx.room,
+                room_input_options=ROOM_INPUT_OPTIONS,
+                room_output_options=ROOM_OUTPUT_OPTIONS,
             )
-            
-            # Give session a moment to initialize
-            await asyncio.sleep(0.5)
-            
-            # Create SIP participant for outbound call
+            install_audio_wrappers()
+            timings.mark("session_ready")
+        
+        async def dial():
+            timings.mark("dial_started")
+            # wait_until_answered: the request returns when the callee picks up,
+            # so the agent knows the exact answer moment
             sip_participant = await ctx.api.sip.create_sip_participant(
                 api.CreateSIPParticipantRequest(
                     room_name=ctx.room.name,
-                    sip_trunk_id=os.getenv("SIP_OUTBOUND_TRUNK_ID"),
+                    sip_trunk_id=dial_info.get("sip_trunk_id") or os.getenv("SIP_OUTBOUND_TRUNK_ID"),
                     sip_call_to=outbound_phone,
-                    participant_identity=f"sip_{outbound_phone.replace('+', '')}",
+                    participant_identity=sip_identity,
+                    wait_until_answered=True,
                 )
             )
-            logger.info(f"SIP participant created: {sip_participant.participant_identity}")
-            
-            # Wait for session to be fully started
-            await session_task
+            timings.mark("answered")
+            emit(EVENT_DIAL, outcome="answered", dial_s=timings.latency("dial_started", "answered"))
+            return sip_participant
+        
+        try:
+            session_task = asyncio.create_task(start_session())
+            dial_task = asyncio.create_task(dial())
+            try:
+                sip_participant, _ = await asyncio.gather(dial_task, session_task)
+            except Exception:
+                # No answer / SIP error / session failure: don't leave the other half running
+                session_task.cancel()
+                dial_task.cancel()
+                if dial_task.done() and not dial_task.cancelled() and dial_task.exception():
+                    outcome, sip_status = classify_sip_error(dial_task.exception())
+                    agent.call_state.outcome = outcome
+                    emit(EVENT_DIAL, outcome=outcome, sip_status=sip_status)
+                    await record_outcome(outcome, sip_status)
+                raise
+            logger.info(f"SIP participant answered: {sip_participant.participant_identity}")
+            logger.info(f"⏱️ Session ready {(time.perf_counter() - job_started) * 1000:.0f} ms after job start")
+            memory.snapshot("session_started")
             
-            # Wait for participant to join
-            participant = await ctx.wait_for_participant()
+            # The callee already answered, so the participant is in the room
+            participant = await ctx.wait_for_participant(identity=sip_identity)
             logger.info(f"Outbound participant joined: {participant.identity}")
             agent.set_participant(participant)
+            timings.mark("participant_joined")
+            memory.snapshot("participant_joined")
+            
+            await agent.greet(session)
             
         except Exception as e:
             logger.error(f"Error in outbound call: {e}")
@@ -572,17 +1122,27 @@ async def entrypoint(ctx: JobContext):
         try:
             # Start session immediately for inbound calls
             session_task = asyncio.create_task(
-                session.start(agent=agent, room=ctx.room)
+                session.start(
+                    agent=agent,
+                    room=ctx.room,
+                    room_input_options=ROOM_INPUT_OPTIONS,
+                    room_output_options=ROOM_OUTPUT_OPTIONS,
+                )
             )
             
             # Wait for session to be ready
             await session_task
+            install_audio_wrappers()
             logger.info("Session started successfully for inbound call")
+            logger.info(f"⏱️ Session ready {(time.perf_counter() - job_started) * 1000:.0f} ms after job start")
+            memory.snapshot("session_started")
             
             # Wait for participant to join (should happen automatically for inbound calls)
             participant = await ctx.wait_for_participant()
             logger.info(f"Inbound participant joined: {participant.identity}")
             agent.set_participant(participant)
+            timings.mark("participant_joined")
+            memory.snapshot("participant_joined")
             
         except Exception as e:
             logger.error(f"Error in inbound call setup: {e}")
@@ -590,10 +1150,39 @@ async def entrypoint(ctx: JobContext):
             traceback.print_exc()
             ctx.shutdown()
 
+def idle_processes_for_dialer() -> int:
+    """Warm job processes to keep: explicit setting, else sized from the dialer rate"""
+    if os.getenv("TDX_NUM_IDLE_PROCESSES"):
+        return int(os.getenv("TDX_NUM_IDLE_PROCESSES"))
+    
+    dialer_cps = float(os.getenv("TDX_DIALER_CPS", "0"))
+    if dialer_cps <= 0:
+        return 1
+    
+    workers = int(os.getenv("TDX_WORKER_COUNT", "1"))
+    setup_s = float(os.getenv("TDX_JOB_SETUP_S", "3"))
+    return pool_size_for_rate(dialer_cps, setup_s, workers)
+
+def build_worker_options() -> WorkerOptions:
+    """Worker options shared by every entry script"""
+    return WorkerOptions(
+        entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
+        agent_name="tdx-sdr-bot",
+        # Each idle process is a full interpreter (~150 MB); by default LiveKit keeps
+        # one per host CPU, which does not fit Render's small instances
+        num_idle_processes=idle_processes_for_dialer(),
+        job_memory_warn_mb=float(os.getenv("TDX_JOB_MEMORY_WARN_MB", "300")),
+    )
+
 if __name__ == "__main__":
-    cli.run_app(
-        WorkerOptions(
-            entrypoint_fnc=entrypoint,
-            agent_name="tdx-sdr-bot",
-        )
-    )
\ No newline at end of file
+    if "download-files" in sys.argv:
+        # download-files only sees plugins registered in this process
+        from livekit.plugins import openai  # noqa: F401
+        try:
+            from livekit.plugins import silero  # noqa: F401
+        except ImportError:
+            pass
+    
+    startup_profiler.install_registration_hook()
+    cli.run_app(build_worker_options())
\ No newline at end of file
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Pre-rendered answers to the questions every prospect asks
+
+"¿Qué es TDX?", "¿cuánto cuesta?", "¿me puede enviar información?": the LLM
+writes these answers from scratch on every call and the TTS speaks them
+sentence by sentence, so the caller waits for both on the questions that come
+up most. This module keeps a curated answer for each (ANSWERS) with its audio
+rendered ahead of time, and a keyword matcher over the caller's transcript:
+
+- transcripts are normalized (lowercase, no accents or punctuation, filler
+  words dropped) and scanned once for the trigger phrases, indexed by their
+  first word; a lookup costs microseconds;
+- only short turns match (MAX_WORDS), and only when exactly one answer
+  matches: a question buried in a longer turn, or two questions at once, are
+  left to the model;
+- a trigger right after a negation ("no me envía información") or a turn with
+  a rejection ("no me importa cuánto cuesta, no me interesa") never matches:
+  the pitch is the wrong answer to a "no";
+- each answer plays at most once per call, so asking again gets a fresh reply.
+
+The agent calls this from Agent.on_user_turn_completed, which the SDK only
+runs when it has the caller's transcript before the reply: the cascaded
+pipeline (cascade_pipeline.py), whether the call started on it or fell back
+to it. Enabled with TDX_ANSWER_CACHE=1; the audio is read from
+TDX_ANSWER_CACHE_DIR at prewarm, and an answer without rendered audio (or
+rendered from an older text) is spoken through the TTS instead.
+
+Render the audio after editing ANSWERS (needs OPENAI_API_KEY):
+    python answer_cache.py render
+    python answer_cache.py match "¿Y eso cuánto cuesta?"
+    python answer_cache.py match        # corre MATCH_CHECKS
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import statistics
+import sys
+import time
+import unicodedata
+import wave
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from livekit import rtc
+
+from cascade_pipeline import TTS_INSTRUCTIONS, TTS_MODEL, TTS_VOICE
+
+logger = logging.getLogger("answer_cache")
+
+ANSWER_CACHE_ENV = "TDX_ANSWER_CACHE"
+ANSWER_CACHE_DIR_ENV = "TDX_ANSWER_CACHE_DIR"
+DEFAULT_CACHE_DIR = "answer_cache"
+
+# Rendered at the room's output rate (agent.REALTIME_SAMPLE_RATE): played without resampling
+SAMPLE_RATE = 24000
+FRAME_MS = 20
+# Longer turns carry more than the question; the model answers those
+MAX_WORDS = 12
+
+# Dropped before matching, so "¿me puede enviar más información, por favor?" = "me puede enviar informacion"
+FILLER_WORDS = frozenset({
+    "a", "algo", "alguna", "bueno", "disculpe", "eh", "entonces", "este", "favor", "la", "mas", "mm",
+    "oiga", "oye", "pero", "perdon", "poco", "por", "pues", "su", "un", "una", "y", "ya",
+})
+# A trigger right after one of these is the caller turning the offer down
+NEGATIONS = frozenset({"no", "nunca", "ni"})
+# Anywhere in the turn, these leave it to the model whatever else matched
+REJECTIONS = (
+    "no me interesa", "no nos interesa", "no estoy interesado", "no estoy interesada", "no gracias",
+    "no quiero", "no necesito", "no necesitamos", "no me llame", "no me llamen",
+)
+
+# intent -> (answer, trigger phrases); phrases go through normalize() like the transcripts
+ANSWERS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "what_is_tdx": (
+        "TDX es una empresa de tecnología que ayuda a las empresas a transformar sus operaciones con "
+        "inteligencia artificial: automatizamos la atención a clientes, optimizamos flujos de trabajo y "
+        "conectamos sus datos para decidir más rápido. ¿Qué proceso le gustaría mejorar primero?",
+        (
+            "qué es TDX", "qué es tedex", "qué es te de equis", "qué hace TDX", "qué hacen ustedes",
+            "a qué se dedican", "a qué se dedica TDX", "quiénes son ustedes", "de qué empresa",
+            "de dónde me llama", "de dónde me llaman", "qué empresa es",
+        ),
+    ),
+    "pricing": (
+        "Depende del alcance: cada solución se diseña según el proceso y el volumen de su empresa, así que "
+        "no manejamos un precio fijo. En una reunión de treinta minutos con un consultor le damos una "
+        "estimación concreta. ¿Le parece bien agendarla esta semana?",
+        (
+            "cuánto cuesta", "cuánto cuestan", "cuánto vale", "cuánto valen", "cuánto cobran", "cuánto sale",
+            "cuál es el precio", "cuáles son los precios", "qué precio tiene", "qué precios tienen",
+            "qué costo tiene", "cuál es el costo", "cuánto me costaría", "cuánto costaría",
+        ),
+    ),
+    "send_info": (
+        "¡Claro, con gusto! Se la envío por correo, junto con una invitación a una reunión corta con un "
+        "consultor. ¿A qué email se la envío? Dígamelo despacio, letra por letra.",
+        (
+            "enviar información", "enviarme información", "envíeme información", "me envía información",
+            "me envías información", "mandar información", "mandarme información", "mándeme información",
+            "me manda información", "me mandas información", "enviar un correo", "envíeme un correo",
+            "mándeme un correo", "me envía un correo", "me manda un correo",
+        ),
+    ),
+}
+
+
+def normalize(text: str) -> List[str]:
+    """Lowercase words without accents, punctuation or filler words"""
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(c if c.isalnum() else " " for c in text if unicodedata.category(c) != "Mn")
+    return [w for w in text.split() if w not in FILLER_WORDS]
+
+
+def _fingerprint(text: str) -> str:
+    """Changes with the answer text and the voice settings, so stale audio is never played"""
+    key = "\n".join((text, TTS_MODEL, TTS_VOICE, TTS_INSTRUCTIONS))
+    return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+def audio_path(cache_dir: str, intent: str, text: str) -> str:
+    return os.path.join(cache_dir, f"{intent}-{_fingerprint(text)}.wav")
+
+
+class IntentMatcher:
+    """Trigger phrases indexed by their first word; one pass over the transcript"""
+
+    __slots__ = ("_by_first_word",)
+
+    def __init__(self, phrases: Dict[str, Tuple[str, ...]]):
+        self._by_first_word: Dict[str, List[Tuple[Tuple[str, ...], Optional[str]]]] = {}
+        for intent, triggers in phrases.items():
+            for trigger in triggers:
+                words = tuple(normalize(trigger))
+                self._by_first_word.setdefault(words[0], []).append((words, intent))
+        # Indexed alongside the triggers with no intent, so the same pass finds them
+        for rejection in REJECTIONS:
+            words = tuple(normalize(rejection))
+            self._by_first_word.setdefault(words[0], []).append((words, None))
+
+    def match(self, transcript: str) -> Optional[str]:
+        """The one intent the transcript asks about, or None"""
+        words = normalize(transcript)
+        if not words or len(words) > MAX_WORDS:
+            return None
+        found = set()
+        for i, word in enumerate(words):
+            for phrase, intent in self._by_first_word.get(word, ()):
+                if tuple(words[i:i + len(phrase)]) != phrase:
+                    continue
+                if intent is None:
+                    return None
+                if i > 0 and words[i - 1] in NEGATIONS:
+                    # "no me envía información": the question is turned down, not asked
+                    return None
+                found.add(intent)
+        return found.pop() if len(found) == 1 else None
+
+
+# transcript -> the intent it must match (None: left to the model); run by `match` with no transcript
+MATCH_CHECKS: Tuple[Tuple[str, Optional[str]], ...] = (
+    ("¿Y eso cuánto cuesta?", "pricing"),
+    ("¿Qué es TDX?", "what_is_tdx"),
+    ("¿Me puede enviar más información, por favor?", "send_info"),
+    ("¿Cuánto cuesta y qué es TDX?", None),
+    ("No, no me envía información, no me interesa", None),
+    ("No me envía información", None),
+    ("Ni me manda información ni nada", None),
+    ("No me importa cuánto cuesta, no me interesa", None),
+    ("No gracias, ¿de dónde me llama?", None),
+    ("Nunca me manda un correo", None),
+)
+
+
+class CachedAnswer:
+    __slots__ = ("intent", "text", "frames")
+
+    def __init__(self, intent: str, text: str, frames: Optional[List[rtc.AudioFrame]]):
+        self.intent = intent
+        self.text = text
+        # None: not rendered, the TTS speaks the text
+        self.frames = frames
+
+    @property
+    def duration_s(self) -> float:
+        return sum(f.duration for f in self.frames) if self.frames else 0.0
+
+    async def audio(self) -> AsyncIterator[rtc.AudioFrame]:
+        for frame in self.frames:
+            yield frame
+
+
+def _read_frames(path: str) -> List[rtc.AudioFrame]:
+    with wave.open(path, "rb") as f:
+        if f.getframerate() != SAMPLE_RATE or f.getnchannels() != 1 or f.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected {SAMPLE_RATE} Hz mono 16-bit")
+        pcm = f.readframes(f.getnframes())
+    step = SAMPLE_RATE * FRAME_MS // 1000 * 2
+    return [
+        rtc.AudioFrame(pcm[i:i + step], SAMPLE_RATE, 1, len(pcm[i:i + step]) // 2)
+        for i in range(0, len(pcm), step)
+    ]
+
+
+class AnswerCache:
+    """The curated answers and their audio; loaded once per process and shared by its calls"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, answers: Dict[str, Tuple[str, Tuple[str, ...]]] = ANSWERS):
+        self.matcher = IntentMatcher({intent: triggers for intent, (_, triggers) in answers.items()})
+        self.answers: Dict[str, CachedAnswer] = {}
+        for intent, (text, _) in answers.items():
+            path = audio_path(cache_dir, intent, text)
+            frames = None
+            if os.path.exists(path):
+                frames = _read_frames(path)
+            else:
+                logger.warning(f"No rendered audio for '{intent}' ({path}), it will go through the TTS")
+            self.answers[intent] = CachedAnswer(intent, text, frames)
+
+    def lookup(self, transcript: str) -> Optional[CachedAnswer]:
+        intent = self.matcher.match(transcript)
+        return self.answers[intent] if intent is not None else None
+
+
+class AnswerCacheStats:
+    """Per-call lookups and hits, and the turn latency of cached vs generated answers"""
+
+    __slots__ = ("lookups", "hits", "tts_hits", "match_s", "hit_latency_s", "miss_latency_s")
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits: Counter = Counter()
+        # Hits spoken through the TTS because the answer had no rendered audio
+        self.tts_hits = 0
+        self.match_s = 0.0
+        # End of caller speech -> agent audio, cascade turns only
+        self.hit_latency_s: List[float] = []
+        self.miss_latency_s: List[float] = []
+
+    def to_dict(self) -> Dict[str, object]:
+        hits = sum(self.hits.values())
+        hit_p50 = statistics.median(self.hit_latency_s) if self.hit_latency_s else None
+        miss_p50 = statistics.median(self.miss_latency_s) if self.miss_latency_s else None
+        return {
+            "lookups": self.lookups,
+            "hits": hits,
+            "hit_rate_pct": round(100 * hits / self.lookups, 1) if self.lookups else 0.0,
+            "by_intent": dict(self.hits),
+            "tts_hits": self.tts_hits,
+            "hit_ms_p50": round(hit_p50 * 1000, 1) if hit_p50 is not None else None,
+            "miss_ms_p50": round(miss_p50 * 1000, 1) if miss_p50 is not None else None,
+            # Estimate: each cached turn against this call's median generated turn
+            "saved_ms": (
+                round(sum(miss_p50 - s for s in self.hit_latency_s) * 1000, 1) if miss_p50 is not None else None
+            ),
+            "match_us_avg": round(self.match_s * 1e6 / self.lookups, 1) if self.lookups else 0.0,
+        }
+
+
+class CallAnswers:
+    """One call's view of the AnswerCache: what was already played and the stats"""
+
+    __slots__ = ("cache", "stats", "played", "_pending_hit")
+
+    def __init__(self, cache: AnswerCache):
+        self.cache = cache
+        self.stats = AnswerCacheStats()
+        self.played: set = set()
+        # The next agent turn is a cached answer
+        self._pending_hit = False
+
+    def lookup(self, transcript: str) -> Optional[CachedAnswer]:
+        started = time.perf_counter()
+        answer = self.cache.lookup(transcript)
+        self.stats.match_s += time.perf_counter() - started
+        self.stats.lookups += 1
+        self._pending_hit = False
+        if answer is None or answer.intent in self.played:
+            return None
+        self.played.add(answer.intent)
+        self.stats.hits[answer.intent] += 1
+        if answer.frames is None:
+            self.stats.tts_hits += 1
+        self._pending_hit = True
+        return answer
+
+    def on_turn_latency(self, latency_s: float) -> None:
+        """A cascade turn was answered latency_s after the caller stopped"""
+        (self.stats.hit_latency_s if self._pending_hit else self.stats.miss_latency_s).append(latency_s)
+        self._pending_hit = False
+
+
+def answers_from_env() -> Optional[AnswerCache]:
+    """AnswerCache from TDX_ANSWER_CACHE_DIR, or None when TDX_ANSWER_CACHE is off"""
+    if os.getenv(ANSWER_CACHE_ENV, "").lower() not in ("1", "true", "yes"):
+        return None
+    return AnswerCache(os.getenv(ANSWER_CACHE_DIR_ENV, DEFAULT_CACHE_DIR))
+
+
+# --- rendering -----------------------------------------------------------------
+
+async def render(cache_dir: str, force: bool = False) -> None:
+    """Synthesize every answer with the cascade's TTS voice into cache_dir"""
+    from livekit.plugins import openai
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tts = openai.TTS(model=TTS_MODEL, voice=TTS_VOICE, instructions=TTS_INSTRUCTIONS)
+    try:
+        for intent, (text, _) in ANSWERS.items():
+            path = audio_path(cache_dir, intent, text)
+            if os.path.exists(path) and not force:
+                print(f"   {intent:<14} ya existe: {path}")
+                continue
+            started = time.perf_counter()
+            frame = await tts.synthesize(text).collect()
+            resampler = rtc.AudioResampler(frame.sample_rate, SAMPLE_RATE, num_channels=frame.num_channels)
+            frames = [*resampler.push(frame), *resampler.flush()]
+            pcm = b"".join(bytes(f.data) for f in frames)
+            with wave.open(path, "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(SAMPLE_RATE)
+                f.writeframes(pcm)
+            print(f"   {intent:<14} {len(pcm) / 2 / SAMPLE_RATE:5.1f}s de audio "
+                  f"(TTS {time.perf_counter() - started:.1f}s) -> {path}")
+    finally:
+        await tts.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Respuestas pre-grabadas a las preguntas frecuentes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    render_cmd = sub.add_parser("render", help="Sintetiza el audio de las respuestas")
+    render_cmd.add_argument("--dir", default=os.getenv(ANSWER_CACHE_DIR_ENV, DEFAULT_CACHE_DIR))
+    render_cmd.add_argument("--force", action="store_true", help="Vuelve a sintetizar aunque el audio exista")
+
+    match_cmd = sub.add_parser("match", help="Qué respuesta tocaría para una transcripción")
+    match_cmd.add_argument("transcript", nargs="?", help="Sin transcripción corre MATCH_CHECKS")
+
+    args = parser.parse_args()
+    if args.command == "render":
+        from dotenv import load_dotenv
+
+        load_dotenv(dotenv_path=".env.local")
+        print(f"🗃️  Renderizando {len(ANSWERS)} respuestas en {args.dir}")
+        asyncio.run(render(args.dir, args.force))
+    elif args.command == "match":
+        matcher = IntentMatcher({intent: triggers for intent, (_, triggers) in ANSWERS.items()})
+        if args.transcript is None:
+            failed = 0
+            for transcript, expected in MATCH_CHECKS:
+                intent = matcher.match(transcript)
+                ok = intent == expected
+                failed += not ok
+                print(f"   {'✅' if ok else '❌'} {transcript!r} -> {intent} (esperado {expected})")
+            print(f"🗃️  {len(MATCH_CHECKS) - failed}/{len(MATCH_CHECKS)} casos correctos")
+            sys.exit(1 if failed else 0)
+        intent = matcher.match(args.transcript)
+        print(f"🗃️  {normalize(args.transcript)} -> {intent or 'sin respuesta en caché (responde el modelo)'}")
+        if intent:
+            print(f"   {ANSWERS[intent][0]}")
+
+
+if __name__ == "__main__":
+    main()
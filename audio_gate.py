@@ -0,0 +1,184 @@
+"""
+Local voice-activity gate in front of the realtime model
+
+The SIP leg streams audio continuously, so long stretches of line silence
+and hold are sent (and billed) to the realtime API. AudioGate wraps the
+session's audio input and forwards only what the server needs:
+
+- caller speech, plus a pre-roll of the frames just before it (so the
+  server VAD's prefix padding still sees the onset);
+- after speech, a hangover of silence longer than the longest turn-detection
+  silence window, so server VAD can still close the turn.
+
+Everything else is dropped. The detector is an energy gate with an adaptive
+noise floor: a few microseconds per frame, no model to load. Enabled with
+TDX_AUDIO_GATE=1.
+
+The gate never copies or re-wraps audio: frames it forwards are the SDK's own
+objects, and the level is measured through a view of the frame's buffer into
+a float scratch array allocated once per call.
+"""
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import numpy as np
+from livekit import rtc
+from livekit.agents.voice import io
+
+logger = logging.getLogger("audio_gate")
+
+AUDIO_GATE_ENV = "TDX_AUDIO_GATE"
+# Frames kept from before the speech onset; covers server_vad prefix_padding_ms
+PRE_ROLL_MS = 400
+# Voiced audio needed to open the gate (debounces clicks)
+ONSET_MS = 40
+# Extra silence forwarded past the longest turn-detection window
+HANGOVER_MARGIN_MS = 300
+# Speech must be this many times louder than the line's noise floor...
+NOISE_FLOOR_RATIO = 3.0
+# ...and never quieter than this (int16 RMS), whatever the floor
+MIN_SPEECH_RMS = 250.0
+# Noise floor smoothing for frames below the threshold
+NOISE_FLOOR_ALPHA = 0.05
+
+
+# Scratch size: 100 ms at 48 kHz stereo; larger frames get a bigger buffer once
+SCRATCH_SAMPLES = 9600
+
+
+class FrameLevel:
+    """RMS of int16 frames through one reusable float32 buffer"""
+
+    __slots__ = ("_scratch", "_buf")
+
+    def __init__(self, samples: int = SCRATCH_SAMPLES):
+        self._scratch = np.empty(samples, dtype=np.float32)
+        # Slice for the current frame size; frames keep one size for the whole call
+        self._buf = self._scratch[:0]
+
+    def rms(self, frame: rtc.AudioFrame) -> float:
+        # A view over the SDK's buffer: no copy of the audio
+        samples = np.frombuffer(frame.data, dtype=np.int16)
+        n = samples.size
+        if not n:
+            return 0.0
+        if n != self._buf.size:
+            if n > self._scratch.size:
+                self._scratch = np.empty(n, dtype=np.float32)
+            self._buf = self._scratch[:n]
+        buf = self._buf
+        # int16 -> float32 in place; squaring int16 directly would overflow
+        np.copyto(buf, samples, casting="unsafe")
+        return math.sqrt(float(np.dot(buf, buf)) / n)
+
+
+class GateStats:
+    """Per-call counters: audio seen, forwarded and saved, and what the gate cost"""
+
+    __slots__ = ("input_s", "forwarded_s", "openings", "cpu_s")
+
+    def __init__(self):
+        self.input_s = 0.0
+        self.forwarded_s = 0.0
+        self.openings = 0
+        self.cpu_s = 0.0
+
+    @property
+    def saved_s(self) -> float:
+        return self.input_s - self.forwarded_s
+
+    def to_dict(self) -> Dict[str, float]:
+        minutes = self.input_s / 60
+        return {
+            "input_s": round(self.input_s, 1),
+            "forwarded_s": round(self.forwarded_s, 1),
+            "saved_s": round(self.saved_s, 1),
+            "saved_pct": round(100 * self.saved_s / self.input_s, 1) if self.input_s else 0.0,
+            "openings": self.openings,
+            "cpu_ms": round(self.cpu_s * 1000, 1),
+            "cpu_ms_per_min": round(self.cpu_s * 1000 / minutes, 2) if minutes else 0.0,
+        }
+
+
+class AudioGate(io.AudioInput):
+    """AudioInput wrapper that drops line silence before it reaches the realtime model"""
+
+    def __init__(self, source: io.AudioInput, *, hangover_ms: float, pre_roll_ms: float = PRE_ROLL_MS):
+        self._source = source
+        self.hangover_s = hangover_ms / 1000
+        self.pre_roll_s = pre_roll_ms / 1000
+        self.stats = GateStats()
+        self._level = FrameLevel()
+        self._open = False
+        self._voiced_s = 0.0
+        self._silence_s = 0.0
+        self._noise_floor = MIN_SPEECH_RMS / NOISE_FLOOR_RATIO
+        self._pre_roll: Deque[rtc.AudioFrame] = deque()
+        self._pre_roll_s = 0.0
+        # Pre-roll frames waiting to be returned after the gate opened
+        self._pending: Deque[rtc.AudioFrame] = deque()
+
+    def on_attached(self) -> None:
+        self._source.on_attached()
+
+    def on_detached(self) -> None:
+        self._source.on_detached()
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        while not self._pending:
+            frame = await self._source.__anext__()
+            # Thread CPU time, so waiting on the event loop isn't billed to the gate
+            started = time.thread_time()
+            forward = self._process(frame)
+            self.stats.cpu_s += time.thread_time() - started
+            if forward:
+                break
+        frame = self._pending.popleft()
+        self.stats.forwarded_s += frame.duration
+        return frame
+
+    def _process(self, frame: rtc.AudioFrame) -> bool:
+        """Run one frame through the gate; queues what should be forwarded"""
+        duration = frame.duration
+        self.stats.input_s += duration
+        level = self._level.rms(frame)
+        threshold = max(MIN_SPEECH_RMS, self._noise_floor * NOISE_FLOOR_RATIO)
+        voiced = level >= threshold
+        if not voiced:
+            self._noise_floor += NOISE_FLOOR_ALPHA * (level - self._noise_floor)
+
+        if self._open:
+            self._pending.append(frame)
+            self._silence_s = 0.0 if voiced else self._silence_s + duration
+            if self._silence_s >= self.hangover_s:
+                self._open = False
+                self._voiced_s = 0.0
+            return True
+
+        self._pre_roll.append(frame)
+        self._pre_roll_s += duration
+        while len(self._pre_roll) > 1 and self._pre_roll_s - self._pre_roll[0].duration >= self.pre_roll_s:
+            self._pre_roll_s -= self._pre_roll.popleft().duration
+
+        self._voiced_s = self._voiced_s + duration if voiced else 0.0
+        if self._voiced_s * 1000 < ONSET_MS:
+            return False
+
+        self._open = True
+        self._silence_s = 0.0
+        self.stats.openings += 1
+        self._pending.extend(self._pre_roll)
+        self._pre_roll.clear()
+        self._pre_roll_s = 0.0
+        return True
+
+
+def gate_from_env(source: Optional[io.AudioInput], hangover_ms: float) -> Optional[AudioGate]:
+    """AudioGate around the session's audio input, or None when TDX_AUDIO_GATE is off"""
+    if source is None or os.getenv(AUDIO_GATE_ENV, "").lower() not in ("1", "true", "yes"):
+        return None
+    return AudioGate(source, hangover_ms=hangover_ms + HANGOVER_MARGIN_MS)
@@ -0,0 +1,313 @@
+"""
+Local barge-in detection on the caller's audio
+
+When the caller talks over the agent, the realtime server only interrupts the
+reply once its VAD has seen enough speech and the event has crossed the
+network back to the worker: several hundred milliseconds during which the
+agent keeps talking over the caller. And because the model streams audio
+faster than real time, the whole reply is usually already queued in the
+room's audio source, out of reach.
+
+Two wrappers fix that:
+
+- PacedAudioOutput sits in front of the room's audio output and feeds it in
+  real time, keeping only PLAYOUT_LEAD_MS queued downstream, so playout can
+  be paused (and resumed where it stopped) from Python.
+- BargeInDetector wraps the session's audio input. While the agent is
+  speaking, voiced caller audio louder than the line's noise floor (and the
+  agent's own echo) pauses playout within ONSET_MS of speech.
+
+The session still decides: if it interrupts the reply (clearing the output
+buffer) within CONFIRM_TIMEOUT_MS, the pause simply got there first;
+otherwise playout resumes where it stopped and the detection counts as a
+false alarm. The server reporting the caller speaking is not enough on its
+own: a short backchannel ("ajá") is speech that never interrupts, and the
+reply has to carry on after it. Enabled with TDX_BARGE_IN=1.
+"""
+import asyncio
+import logging
+import os
+import statistics
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from livekit import rtc
+from livekit.agents.voice import io
+
+from audio_gate import MIN_SPEECH_RMS, NOISE_FLOOR_ALPHA, NOISE_FLOOR_RATIO, FrameLevel
+
+logger = logging.getLogger("barge_in")
+
+BARGE_IN_ENV = "TDX_BARGE_IN"
+# Agent audio queued past the pause point: what the caller still hears after a pause
+PLAYOUT_LEAD_MS = 80
+# Voiced caller audio needed to pause the agent
+ONSET_MS = 60
+# How long the session has to interrupt the reply before playout resumes
+CONFIRM_TIMEOUT_MS = 800
+# While the agent talks the line carries some of its own voice back; demand this much more level
+ECHO_HEADROOM = 2.0
+
+
+class PacedAudioOutput(io.AudioOutput):
+    """AudioOutput wrapper that feeds the next output in real time so playout can be paused"""
+
+    def __init__(self, next_in_chain: io.AudioOutput, *, lead_ms: float = PLAYOUT_LEAD_MS):
+        super().__init__(next_in_chain=next_in_chain, sample_rate=next_in_chain.sample_rate)
+        self.lead_s = lead_ms / 1000
+        self._frames: Deque[rtc.AudioFrame] = deque()
+        # A segment was captured and its playback_finished hasn't been emitted yet
+        self._segment_open = False
+        # Some of the segment already reached the next output (so it owns playback_finished)
+        self._forwarded = False
+        self._flush_pending = False
+        # When the audio already handed to the next output finishes playing
+        self._playhead = 0.0
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def playing(self) -> bool:
+        return self._segment_open
+
+    @property
+    def paused(self) -> bool:
+        return not self._resumed.is_set()
+
+    @property
+    def queued_s(self) -> float:
+        """Audio the next output still has to play"""
+        return max(0.0, self._playhead - time.monotonic())
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        self._segment_open = True
+        self._frames.append(frame)
+        self._wakeup.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._pump())
+
+    def flush(self) -> None:
+        super().flush()
+        if self._segment_open:
+            self._flush_pending = True
+            self._wakeup.set()
+
+    def clear_buffer(self) -> None:
+        self._frames.clear()
+        self.emit("buffer_cleared")
+        self._resumed.set()
+        if not self._segment_open:
+            return
+        if self._forwarded:
+            # The next output reports the interruption (and what was played) once flushed
+            self._next_in_chain.clear_buffer()
+            self._wakeup.set()
+        else:
+            self._flush_pending = False
+            self.on_playback_finished(playback_position=0.0, interrupted=True)
+
+    def on_playback_finished(self, **kwargs) -> None:
+        self._segment_open = False
+        self._forwarded = False
+        super().on_playback_finished(**kwargs)
+
+    def pause(self) -> None:
+        """Stop feeding the next output; what it has queued (lead_s at most) still plays"""
+        self._resumed.clear()
+
+    def resume(self) -> None:
+        self._resumed.set()
+
+    async def _pump(self) -> None:
+        while True:
+            await self._resumed.wait()
+            if not self._frames:
+                if self._flush_pending:
+                    self._flush_pending = False
+                    self._next_in_chain.flush()
+                    continue
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            now = time.monotonic()
+            ahead = self._playhead - now
+            if ahead > self.lead_s:
+                await asyncio.sleep(ahead - self.lead_s)
+                continue
+            frame = self._frames.popleft()
+            self._playhead = max(self._playhead, now) + frame.duration
+            self._forwarded = True
+            await self._next_in_chain.capture_frame(frame)
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class BargeInStats:
+    """Per-call detections, what the server made of them, and the time each pause won"""
+
+    __slots__ = ("detections", "confirmed", "cancelled", "missed", "stop_ms", "server_ms", "cpu_s")
+
+    def __init__(self):
+        self.detections = 0
+        self.confirmed = 0
+        self.cancelled = 0
+        # Server interruptions with no local detection first
+        self.missed = 0
+        # Caller speech onset -> agent audio actually stopped (onset + lead left in the queue)
+        self.stop_ms: List[float] = []
+        # Local pause -> server reports the caller speaking: talk-over the pause avoided
+        self.server_ms: List[float] = []
+        self.cpu_s = 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        decided = self.confirmed + self.cancelled
+        return {
+            "detections": self.detections,
+            "confirmed": self.confirmed,
+            "cancelled": self.cancelled,
+            "missed": self.missed,
+            "false_alarm_pct": round(100 * self.cancelled / decided, 1) if decided else 0.0,
+            "stop_ms_p50": round(statistics.median(self.stop_ms), 1) if self.stop_ms else None,
+            "server_ms_p50": round(statistics.median(self.server_ms), 1) if self.server_ms else None,
+            "cpu_ms": round(self.cpu_s * 1000, 1),
+        }
+
+
+class BargeInDetector(io.AudioInput):
+    """AudioInput wrapper that pauses `output` as soon as the caller talks over the agent"""
+
+    def __init__(
+        self,
+        source: io.AudioInput,
+        output: PacedAudioOutput,
+        *,
+        onset_ms: float = ONSET_MS,
+        confirm_timeout_ms: float = CONFIRM_TIMEOUT_MS,
+    ):
+        self._source = source
+        self.output = output
+        self.onset_s = onset_ms / 1000
+        self.confirm_timeout_s = confirm_timeout_ms / 1000
+        self.stats = BargeInStats()
+        self._level = FrameLevel()
+        self._noise_floor = MIN_SPEECH_RMS / NOISE_FLOOR_RATIO
+        self._voiced_s = 0.0
+        # Re-armed by an unvoiced frame, so one burst never pauses twice
+        self._armed = True
+        self._paused_at: Optional[float] = None
+        # The server reported the caller speaking during the current pause
+        self._heard = False
+        self._timeout: Optional[asyncio.TimerHandle] = None
+        output.on("buffer_cleared", self._confirm)
+        output.on("playback_finished", self._on_playback_finished)
+
+    def on_attached(self) -> None:
+        self._source.on_attached()
+
+    def on_detached(self) -> None:
+        self._source.on_detached()
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        frame = await self._source.__anext__()
+        started = time.thread_time()
+        self._process(frame)
+        self.stats.cpu_s += time.thread_time() - started
+        return frame
+
+    def _process(self, frame: rtc.AudioFrame) -> None:
+        level = self._level.rms(frame)
+        threshold = max(MIN_SPEECH_RMS, self._noise_floor * NOISE_FLOOR_RATIO)
+        if self.output.playing:
+            threshold *= ECHO_HEADROOM
+        if level < threshold:
+            self._noise_floor += NOISE_FLOOR_ALPHA * (level - self._noise_floor)
+            self._voiced_s = 0.0
+            self._armed = True
+            return
+
+        self._voiced_s += frame.duration
+        if (
+            self._armed
+            and self._voiced_s >= self.onset_s
+            and self.output.playing
+            and self._paused_at is None
+        ):
+            self._armed = False
+            self._pause()
+
+    def _pause(self) -> None:
+        self.output.pause()
+        self._paused_at = time.monotonic()
+        self._heard = False
+        self.stats.detections += 1
+        self.stats.stop_ms.append((self._voiced_s + self.output.queued_s) * 1000)
+        self._timeout = asyncio.get_running_loop().call_later(self.confirm_timeout_s, self._cancel)
+
+    def _settle(self) -> None:
+        self._paused_at = None
+        if self._timeout is not None:
+            self._timeout.cancel()
+            self._timeout = None
+
+    def _confirm(self) -> None:
+        """The session interrupted the reply: the pause was a real barge-in"""
+        if self._paused_at is None:
+            return
+        self.stats.confirmed += 1
+        self._settle()
+
+    def _cancel(self) -> None:
+        """Nothing interrupted the reply: a cough, a door, line noise or a backchannel"""
+        self._timeout = None
+        if self._paused_at is None:
+            return
+        self.stats.cancelled += 1
+        logger.debug(f"Barge-in not confirmed after {self.confirm_timeout_s * 1000:.0f} ms, resuming")
+        self._paused_at = None
+        self.output.resume()
+
+    def on_user_state(self, new_state: str) -> None:
+        """Session user_state_changed: timing only, the pause waits for an interruption"""
+        if new_state != "speaking":
+            return
+        if self._paused_at is not None:
+            if not self._heard:
+                self._heard = True
+                self.stats.server_ms.append((time.monotonic() - self._paused_at) * 1000)
+        elif self.output.playing:
+            self.stats.missed += 1
+
+    def _on_playback_finished(self, ev: io.PlaybackFinishedEvent) -> None:
+        # Interrupted or played out while paused: nothing left to resume
+        if self._paused_at is None:
+            return
+        if ev.interrupted:
+            self._confirm()
+        else:
+            self._settle()
+        self.output.resume()
+
+    async def aclose(self) -> None:
+        self._settle()
+        await self.output.aclose()
+
+
+def barge_in_from_env(
+    audio_input: Optional[io.AudioInput], audio_output: Optional[io.AudioOutput]
+) -> Optional[BargeInDetector]:
+    """BargeInDetector over the session's audio, or None when TDX_BARGE_IN is off"""
+    if audio_input is None or audio_output is None:
+        return None
+    if os.getenv(BARGE_IN_ENV, "").lower() not in ("1", "true", "yes"):
+        return None
+    return BargeInDetector(audio_input, PacedAudioOutput(audio_output))
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks de los caminos calientes del agente
+
+Mide el código propio que corre en cada llamada: validación de email
+(collect_email), puntaje BANT (qualify_prospect), cálculo de horarios libres
+sobre calendarios sintéticos, parseo de metadata / dirección de la llamada,
+la construcción de TDXSDRBot con su prompt y el camino de audio por frame
+(gate de silencio), con su CPU y memoria asignada por minuto de llamada.
+
+Cada benchmark se normaliza contra un bucle de calibración de Python puro,
+así el baseline guardado sirve en otra máquina (CI, laptop, Render): lo que
+se compara es el costo relativo, no los microsegundos absolutos.
+
+Los benchmarks se corren en ROUNDS rondas intercaladas y se queda el mínimo,
+así que una regresión tiene que aparecer en todas las rondas; además cada
+resultado guarda su dispersión entre rondas y el umbral se amplía a
+SPREAD_FACTOR veces la dispersión del benchmark (o la mediana de la corrida,
+si la máquina está ruidosa). Lo que aun así parece una regresión se vuelve a medir antes de
+fallar: tiene que repetirse en las dos mediciones.
+
+Uso:
+    python benchmark.py                            # correr y comparar con benchmark_baseline.json
+    python benchmark.py --save                     # guardar el resultado como nuevo baseline
+    python benchmark.py --threshold 0.15           # fallar si algo empeora más de 15%
+    python benchmark.py --only slots --json
+    python benchmark.py --history bench.jsonl      # agregar el resultado (con el commit) al historial
+"""
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+from array import array
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from livekit import rtc
+
+import agent
+from audio_gate import AudioGate
+from microsoft_graph_client import graph_client
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+# Relative slowdown (normalized) that counts as a regression
+DEFAULT_THRESHOLD = 0.25
+# Each timing sample runs for about this long; REPEAT paired samples per benchmark and round
+TARGET_SAMPLE_S = 0.05
+REPEAT = 9
+# Rounds run one after the other over every benchmark, so a burst of load hits one round, not all
+ROUNDS = 3
+# A benchmark whose rounds disagree by X% only regresses past SPREAD_FACTOR * X%
+SPREAD_FACTOR = 2.0
+
+# Room audio as the agent receives it: 10 ms frames at the realtime model's rate
+AUDIO_FRAME_MS = 10
+FRAMES_PER_MINUTE = 60 * 1000 // AUDIO_FRAME_MS
+
+# A Monday, so the slot search sees a full business week
+CALENDAR_START = datetime(2030, 1, 14, 8, 0)
+
+
+def run_tool(coro) -> Any:
+    """Drive a tool coroutine that never suspends, without an event loop in the measurement"""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("tool suspended; it can't be benchmarked synchronously")
+
+
+def calibration() -> None:
+    """Fixed pure-Python workload every benchmark is normalized against"""
+    total = 0
+    for i in range(1000):
+        total += i * i % 7
+    "-".join(str(i) for i in range(50))
+
+
+def synthetic_calendar(events: int, busy_hours: List[int]) -> List[SimpleNamespace]:
+    """Graph-like events: `busy_hours` blocked every weekday, then 30-minute meetings up to `events`"""
+    calendar = []
+
+    def add(start: datetime, minutes: int) -> None:
+        end = start + timedelta(minutes=minutes)
+        calendar.append(SimpleNamespace(
+            start=SimpleNamespace(date_time=start.strftime("%Y-%m-%dT%H:%M:%S.0000000")),
+            end=SimpleNamespace(date_time=end.strftime("%Y-%m-%dT%H:%M:%S.0000000")),
+        ))
+
+    day = CALENDAR_START
+    while len(calendar) < events:
+        if day.weekday() < 5:
+            for hour in busy_hours:
+                add(day.replace(hour=hour, minute=0), 60)
+            minute = 0
+            while len(calendar) < events and minute < 8 * 60:
+                add(day.replace(hour=9, minute=0) + timedelta(minutes=minute), 30)
+                minute += 45
+        day += timedelta(days=1)
+    return calendar[:events]
+
+
+def audio_frame(voiced: bool) -> rtc.AudioFrame:
+    samples = agent.REALTIME_SAMPLE_RATE * AUDIO_FRAME_MS // 1000
+    level = 4000 if voiced else 20
+    pcm = array("h", (level if i % 2 else -level for i in range(samples)))
+    return rtc.AudioFrame(pcm.tobytes(), agent.REALTIME_SAMPLE_RATE, 1, samples)
+
+
+def call_minute_frames() -> List[rtc.AudioFrame]:
+    """A minute of caller audio: 3 s of speech, 2 s of line silence, repeated"""
+    speech, silence = audio_frame(True), audio_frame(False)
+    return [speech if (i * AUDIO_FRAME_MS) % 5000 < 3000 else silence for i in range(FRAMES_PER_MINUTE)]
+
+
+def audio_path() -> Dict[str, float]:
+    """CPU and memory the agent's own per-frame audio work costs per call-minute"""
+    frames = call_minute_frames()
+    gate = AudioGate(None, hangover_ms=1300)
+    gate._process(frames[0])
+
+    started = time.thread_time()
+    for frame in frames:
+        gate._process(frame)
+        gate._pending.clear()
+    cpu_s = time.thread_time() - started
+
+    # Transient allocations per frame (peak above the steady state) and blocks left behind
+    tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    peak_bytes = 0
+    for frame in frames[:2000]:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        gate._process(frame)
+        gate._pending.clear()
+        peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1] - current)
+    retained_blocks = sys.getallocatedblocks() - blocks
+    tracemalloc.stop()
+    return {
+        "frames_per_min": FRAMES_PER_MINUTE,
+        "cpu_ms_per_min": round(cpu_s * 1000, 2),
+        "us_per_frame": round(cpu_s * 1e6 / FRAMES_PER_MINUTE, 2),
+        "peak_alloc_bytes_per_frame": peak_bytes,
+        "retained_blocks_per_2000_frames": retained_blocks,
+    }
+
+
+def build_benchmarks() -> Dict[str, Callable[[], Any]]:
+    bot = agent.TDXSDRBot(
+        company_name="Empresa Demo",
+        contact_name="Laura",
+        prospect_info={"company_name": "Empresa Demo", "contact_name": "Laura"},
+        dial_info={"phone_number": "+573153041548", "transfer_to": "+18632190153"},
+        call_direction="outbound",
+    )
+    # Tools switch the realtime model's turn detection through ctx.session.llm
+    ctx = SimpleNamespace(session=SimpleNamespace(llm=SimpleNamespace(update_options=lambda **kwargs: None)))
+    outbound_metadata = json.dumps({
+        "dial_info": {"phone_number": "+573153041548", "transfer_to": "+18632190153"},
+        "prospect_info": {"company_name": "Empresa Demo", "contact_name": "Laura", "campaign": "ia-2030"},
+    })
+    end = CALENDAR_START + timedelta(days=7)
+    empty_calendar: List[Any] = []
+    # A busy week: the 10/14/15 h slots taken, so the search has to walk several days
+    busy_calendar = synthetic_calendar(60, busy_hours=[10, 14, 15])
+    packed_calendar = synthetic_calendar(300, busy_hours=[10, 14, 15, 16])
+    speech_frame, silence_frame = audio_frame(True), audio_frame(False)
+    # An open gate forwarding speech, and a closed one dropping line silence
+    open_gate, closed_gate = AudioGate(None, hangover_ms=1300), AudioGate(None, hangover_ms=1300)
+
+    return {
+        "email_valid": lambda: run_tool(bot.collect_email(ctx, "Laura.Gomez@EmpresaDemo.com", "l a u r a")),
+        "email_invalid": lambda: run_tool(bot.collect_email(ctx, "laura arroba empresa punto com")),
+        "qualify_qualified": lambda: run_tool(bot.qualify_prospect(ctx, "50k-100k", "decision_maker", "high", "immediate")),
+        "qualify_nurture": lambda: run_tool(bot.qualify_prospect(ctx, "unknown", "user", "low", "12_months")),
+        "slots_empty": lambda: graph_client._calculate_available_slots(empty_calendar, CALENDAR_START, end),
+        "slots_busy_60": lambda: graph_client._calculate_available_slots(busy_calendar, CALENDAR_START, end),
+        "slots_packed_300": lambda: graph_client._calculate_available_slots(packed_calendar, CALENDAR_START, end),
+        "metadata_outbound": lambda: agent.parse_call_metadata("call-573153041548", outbound_metadata),
+        "metadata_inbound": lambda: agent.parse_call_metadata("call-_+573153041548_AbCdEf", ""),
+        "bot_construction": lambda: agent.TDXSDRBot(
+            company_name="Empresa Demo",
+            contact_name="Laura",
+            prospect_info={},
+            dial_info={"phone_number": "+573153041548"},
+            call_direction="outbound",
+        ),
+        "greeting_prompt": lambda: agent.GREETING_INSTRUCTIONS_TEMPLATE.format(
+            greeting_msg=agent.GREETING_TEMPLATE.format(company_name="Empresa Demo")
+        ),
+        "audio_gate_speech": lambda: open_gate._process(speech_frame) and open_gate._pending.clear(),
+        "audio_gate_silence": lambda: closed_gate._process(silence_frame),
+    }
+
+
+def _calibrated_number(timer: timeit.Timer) -> int:
+    number, elapsed = timer.autorange()
+    return max(1, int(number * TARGET_SAMPLE_S / max(elapsed, 1e-9)))
+
+
+def measure(timer: timeit.Timer, number: int, unit: timeit.Timer, unit_number: int) -> Tuple[float, float]:
+    """Best seconds per call, and its ratio to the best calibration loop
+
+    Calibration samples are interleaved with the benchmark's, so both bests
+    come from the same stretch of a shared or frequency-scaling CPU; noise only
+    ever slows a sample down, so the minimum is the stable statistic.
+    """
+    best_s = best_unit_s = float("inf")
+    for _ in range(REPEAT):
+        best_unit_s = min(best_unit_s, unit.timeit(unit_number) / unit_number)
+        best_s = min(best_s, timer.timeit(number) / number)
+    return best_s, best_s / best_unit_s
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(only: Optional[str] = None, names: Optional[List[str]] = None) -> Dict[str, Any]:
+    benchmarks = build_benchmarks()
+    if only:
+        benchmarks = {name: fn for name, fn in benchmarks.items() if only in name}
+    if names is not None:
+        benchmarks = {name: fn for name, fn in benchmarks.items() if name in names}
+    unit = timeit.Timer(calibration)
+    unit_number = _calibrated_number(unit)
+    unit_s = min(unit.repeat(repeat=REPEAT, number=unit_number)) / unit_number
+    timers = {}
+    for name, fn in benchmarks.items():
+        # First call pays one-off imports and caches that prewarm() handles in production
+        fn()
+        timer = timeit.Timer(fn)
+        timers[name] = (timer, _calibrated_number(timer))
+    samples: Dict[str, List[Tuple[float, float]]] = {name: [] for name in timers}
+    for _ in range(ROUNDS):
+        for name, (timer, number) in timers.items():
+            samples[name].append(measure(timer, number, unit, unit_number))
+    results = {}
+    for name, rounds in samples.items():
+        ratios = [ratio for _, ratio in rounds]
+        results[name] = {
+            "us": round(min(s for s, _ in rounds) * 1e6, 3),
+            "normalized": round(min(ratios), 4),
+            # How far the typical round landed from the best one; one unlucky round doesn't count
+            "spread": round(statistics.median(ratios) / min(ratios) - 1, 3),
+        }
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "calibration_us": round(unit_s * 1e6, 3),
+        "results": results,
+        "audio_path": audio_path() if names is None and (not only or "audio" in only) else None,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> Dict[str, str]:
+    """Benchmark name -> what regressed, for changes past the threshold (widened by noise)"""
+    regressions = {}
+    # The machine's own noise: a quiet benchmark on a busy box is only quiet by luck
+    noise = statistics.median(r["spread"] for r in report["results"].values()) if report["results"] else 0.0
+    for name, result in report["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        change = result["normalized"] / before["normalized"] - 1
+        result["change"] = round(change, 3)
+        # Noisy benchmarks (in the baseline or in this run) need a bigger change to count
+        allowed = max(threshold, SPREAD_FACTOR * max(before.get("spread", 0.0), result["spread"], noise))
+        if change > allowed:
+            regressions[name] = (f"{name}: {change:+.0%} > {allowed:.0%} "
+                                 f"({before['us']:.2f}µs -> {result['us']:.2f}µs)")
+    return regressions
+
+
+def merge_best(report: Dict[str, Any], again: Dict[str, Any]) -> None:
+    """Keep each benchmark's best of two measurements: a real regression shows up in both"""
+    for name, result in again["results"].items():
+        first = report["results"][name]
+        first["us"] = min(first["us"], result["us"])
+        first["normalized"] = min(first["normalized"], result["normalized"])
+        first["spread"] = max(first["spread"], result["spread"])
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"⏱️  Benchmarks @ {report['commit'] or 'sin commit'} (Python {report['python']}, "
+          f"calibración {report['calibration_us']:.1f}µs)")
+    for name, result in report["results"].items():
+        change = f"{result['change']:+.1%}" if "change" in result else ""
+        print(f"   {name:<20} {result['us']:>10.2f}µs  x{result['normalized']:<8.3f} "
+              f"±{result['spread']:<6.1%} {change}")
+    audio = report.get("audio_path")
+    if audio:
+        print(f"🔊 Audio por minuto de llamada ({audio['frames_per_min']} frames): "
+              f"{audio['cpu_ms_per_min']:.1f}ms CPU, {audio['us_per_frame']:.2f}µs/frame, "
+              f"pico {audio['peak_alloc_bytes_per_frame']}B asignados/frame, "
+              f"{audio['retained_blocks_per_2000_frames']} bloques retenidos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de los caminos calientes del agente")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Archivo de baseline")
+    parser.add_argument("--save", action="store_true", help="Guardar este resultado como baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Empeoramiento relativo que cuenta como regresión (0.25 = 25%%); "
+                             "se amplía en los benchmarks ruidosos")
+    parser.add_argument("--only", help="Correr solo los benchmarks cuyo nombre contiene este texto")
+    parser.add_argument("--history", help="Agregar el resultado a este archivo JSONL")
+    parser.add_argument("--json", action="store_true", help="Imprimir el reporte en JSON")
+    args = parser.parse_args()
+
+    # The tools log every call; the benchmark measures the code, not the log handler
+    agent.logger.setLevel(logging.WARNING)
+
+    report = run(args.only)
+    regressions: Dict[str, str] = {}
+    if not args.save:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"⚠️  No hay baseline en {args.baseline}; usa --save para crearlo")
+        else:
+            regressions = compare(report, baseline, args.threshold)
+            if regressions:
+                if not args.json:
+                    print(f"⏳ Midiendo de nuevo: {', '.join(regressions)}")
+                merge_best(report, run(names=list(regressions)))
+                regressions = compare(report, baseline, args.threshold)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.history:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(report) + "\n")
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Baseline guardado en {args.baseline}")
+        return
+
+    if args.json:
+        sys.exit(1 if regressions else 0)
+    for problem in regressions.values():
+        print(f"⚠️  Regresión: {problem}")
+    if regressions:
+        sys.exit(1)
+    print(f"✅ Sin regresiones de más de {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Per-call cost and resource accounting
+
+Each call gets a CallCost that adds up what the call consumed:
+
+- realtime model audio: seconds sent to the model and seconds of agent speech
+  played, and the tokens billed per response (each response re-bills the
+  whole conversation, so tokens grow faster than audio);
+- the cascaded pipeline's LLM tokens and STT/TTS audio, when it was used;
+- tool invocations and Microsoft Graph requests;
+- SIP leg duration and the job's CPU time.
+
+At hangup the totals are priced (USD, list prices below; the SIP rate depends
+on the trunk and comes from TDX_SIP_USD_PER_MIN), logged, sent to the ops
+dashboard and written to the call's row in the redial database, where
+`python redial_scheduler.py costs` aggregates them by campaign and outcome.
+"""
+import logging
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from livekit import rtc
+from livekit.agents.voice import io
+
+logger = logging.getLogger("call_cost")
+
+SIP_USD_PER_MIN_ENV = "TDX_SIP_USD_PER_MIN"
+
+# USD per 1M tokens, gpt-4o-realtime-preview
+REALTIME_USD_PER_1M = {
+    "audio_in": 40.0,
+    "audio_in_cached": 2.5,
+    "text_in": 5.0,
+    "text_in_cached": 2.5,
+    "audio_out": 80.0,
+    "text_out": 20.0,
+}
+# Cascaded pipeline (cascade_pipeline.py): gpt-4o-mini per 1M tokens, STT/TTS per audio minute
+LLM_USD_PER_1M = {"in": 0.15, "in_cached": 0.075, "out": 0.6}
+STT_USD_PER_MIN = 0.003
+TTS_USD_PER_MIN = 0.015
+
+
+class MeteredAudioInput(io.AudioInput):
+    """Pass-through AudioInput that counts the seconds of audio handed to the model"""
+
+    def __init__(self, source: io.AudioInput):
+        self._source = source
+        self.seconds = 0.0
+
+    def on_attached(self) -> None:
+        self._source.on_attached()
+
+    def on_detached(self) -> None:
+        self._source.on_detached()
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        frame = await self._source.__anext__()
+        self.seconds += frame.duration
+        return frame
+
+
+class CallCost:
+    """What one call consumed; one instance per call, priced once at hangup"""
+
+    __slots__ = ("call_id", "campaign_id", "realtime_tokens", "llm_tokens", "stt_audio_s", "tts_audio_s",
+                 "output_audio_s", "tools", "graph_requests", "input_meter", "sip_s", "cpu_s", "_cpu_started")
+
+    def __init__(self, call_id: str, campaign_id: Optional[str] = None):
+        self.call_id = call_id
+        self.campaign_id = campaign_id
+        self.realtime_tokens: Counter = Counter()
+        self.llm_tokens: Counter = Counter()
+        self.stt_audio_s = 0.0
+        self.tts_audio_s = 0.0
+        # Agent speech actually played (interrupted replies count up to the interruption)
+        self.output_audio_s = 0.0
+        self.tools: Counter = Counter()
+        self.graph_requests: Counter = Counter()
+        # Installed around the session's audio input by the agent; None = not metered
+        self.input_meter: Optional[MeteredAudioInput] = None
+        self.sip_s = 0.0
+        self.cpu_s = 0.0
+        # Each job runs in its own process, so process CPU time is the call's
+        self._cpu_started = time.process_time()
+
+    def on_metrics(self, metrics: Any) -> None:
+        """AgentSession metrics_collected: realtime, LLM, STT and TTS usage"""
+        kind = getattr(metrics, "type", None)
+        if kind == "realtime_model_metrics":
+            inp, out = metrics.input_token_details, metrics.output_token_details
+            cached = inp.cached_tokens_details
+            cached_audio = cached.audio_tokens if cached else 0
+            cached_text = cached.text_tokens if cached else 0
+            self.realtime_tokens["audio_in"] += inp.audio_tokens - cached_audio
+            self.realtime_tokens["audio_in_cached"] += cached_audio
+            self.realtime_tokens["text_in"] += inp.text_tokens - cached_text
+            self.realtime_tokens["text_in_cached"] += cached_text
+            self.realtime_tokens["audio_out"] += out.audio_tokens
+            self.realtime_tokens["text_out"] += out.text_tokens
+        elif kind == "llm_metrics":
+            self.llm_tokens["in"] += metrics.prompt_tokens - metrics.prompt_cached_tokens
+            self.llm_tokens["in_cached"] += metrics.prompt_cached_tokens
+            self.llm_tokens["out"] += metrics.completion_tokens
+        elif kind == "stt_metrics":
+            self.stt_audio_s += metrics.audio_duration
+        elif kind == "tts_metrics":
+            self.tts_audio_s += metrics.audio_duration
+
+    def on_tools(self, names) -> None:
+        self.tools.update(names)
+
+    def on_graph(self, op: str) -> None:
+        self.graph_requests[op] += 1
+
+    def on_playback(self, playback_position: float) -> None:
+        self.output_audio_s += playback_position
+
+    def finish(self, sip_s: float) -> None:
+        """Close the books at hangup: SIP leg duration and the CPU used so far"""
+        self.sip_s = sip_s
+        self.cpu_s = time.process_time() - self._cpu_started
+
+    def usd(self) -> Dict[str, float]:
+        sip_rate = float(os.getenv(SIP_USD_PER_MIN_ENV, "0") or 0)
+        costs = {
+            "realtime": sum(REALTIME_USD_PER_1M[k] * n for k, n in self.realtime_tokens.items()) / 1e6,
+            "llm": sum(LLM_USD_PER_1M[k] * n for k, n in self.llm_tokens.items()) / 1e6,
+            "stt": STT_USD_PER_MIN * self.stt_audio_s / 60,
+            "tts": TTS_USD_PER_MIN * self.tts_audio_s / 60,
+            "sip": sip_rate * self.sip_s / 60,
+        }
+        costs["total"] = sum(costs.values())
+        return {k: round(v, 5) for k, v in costs.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "campaign_id": self.campaign_id,
+            "input_audio_s": round(self.input_meter.seconds, 1) if self.input_meter is not None else None,
+            "output_audio_s": round(self.output_audio_s, 1),
+            "realtime_tokens": dict(self.realtime_tokens),
+            "llm_tokens": dict(self.llm_tokens),
+            "stt_audio_s": round(self.stt_audio_s, 1),
+            "tts_audio_s": round(self.tts_audio_s, 1),
+            "tools": dict(self.tools),
+            "graph_requests": dict(self.graph_requests),
+            "sip_s": round(self.sip_s, 1),
+            "cpu_s": round(self.cpu_s, 2),
+            "usd": self.usd(),
+        }
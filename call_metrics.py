@@ -0,0 +1,112 @@
+"""
+Per-call timing metrics for TDX SDR Bot
+
+Each call gets a CallTimings instance that records monotonic timestamps for
+the call milestones (dial, ringing, answer, greeting...) and derives the
+latencies we care about from them.
+"""
+import logging
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("call_metrics")
+
+# SIP participant attribute LiveKit updates as the outbound call progresses
+SIP_CALL_STATUS_ATTRIBUTE = "sip.callStatus"
+
+# Derived latencies: name -> (from milestone, to milestone)
+DERIVED_LATENCIES = {
+    "post_dial_delay": ("dial_started", "ringing"),
+    "ring_time": ("ringing", "answered"),
+    "dial_to_answer": ("dial_started", "answered"),
+    "session_setup": ("session_starting", "session_ready"),
+    "answer_to_greeting": ("answered", "first_agent_speech"),
+}
+
+
+class CallTimings:
+    """Records call milestones once each and reports the latencies between them"""
+
+    __slots__ = ("call_id", "marks", "_reported")
+
+    def __init__(self, call_id: str):
+        self.call_id = call_id
+        self.marks: Dict[str, float] = {}
+        self._reported = False
+
+    def mark(self, milestone: str) -> None:
+        """Record a milestone; only the first occurrence counts"""
+        if milestone not in self.marks:
+            self.marks[milestone] = time.monotonic()
+
+    def latency(self, start: str, end: str) -> Optional[float]:
+        if start in self.marks and end in self.marks:
+            return self.marks[end] - self.marks[start]
+        return None
+
+    def latencies(self) -> Dict[str, float]:
+        result = {}
+        for name, (start, end) in DERIVED_LATENCIES.items():
+            value = self.latency(start, end)
+            if value is not None:
+                result[name] = value
+        return result
+
+    def on_sip_call_status(self, status: str) -> None:
+        """Map LiveKit's sip.callStatus values (dialing, ringing, active, hangup) to milestones"""
+        if status == "ringing":
+            self.mark("ringing")
+        elif status == "active":
+            self.mark("answered")
+
+    def report(self) -> Dict[str, float]:
+        """Log the derived latencies once per call"""
+        latencies = self.latencies()
+        if not self._reported:
+            self._reported = True
+            summary = " ".join(f"{k}={v * 1000:.0f}ms" for k, v in latencies.items())
+            logger.info(f"📊 [{self.call_id}] Call timings: {summary or 'no milestones'}")
+        return latencies
+
+
+class TurnLatencyTracker:
+    """Time from the caller finishing a turn to the agent starting to speak
+
+    Fed from AgentSession's user_state_changed / agent_state_changed events.
+    Samples are also kept per conversation phase, so a change to one phase's
+    turn detection shows up on its own.
+    """
+
+    __slots__ = ("_user_stopped_at", "samples", "by_phase")
+
+    def __init__(self):
+        self._user_stopped_at: Optional[float] = None
+        self.samples: List[float] = []
+        self.by_phase: Dict[str, List[float]] = {}
+
+    def on_user_state(self, old_state: str, new_state: str) -> None:
+        if old_state == "speaking" and new_state == "listening":
+            self._user_stopped_at = time.monotonic()
+        elif new_state == "speaking":
+            self._user_stopped_at = None
+
+    def on_agent_state(self, new_state: str, phase: Optional[str] = None) -> Optional[float]:
+        """Returns the turn latency when the agent starts answering a finished user turn"""
+        if new_state != "speaking" or self._user_stopped_at is None:
+            return None
+        latency = time.monotonic() - self._user_stopped_at
+        self._user_stopped_at = None
+        self.samples.append(latency)
+        if phase is not None:
+            self.by_phase.setdefault(phase, []).append(latency)
+        return latency
+
+    def report(self, call_id: str) -> Dict[str, float]:
+        """Log the median turn latency of each phase; returns it in seconds"""
+        medians = {phase: sorted(s)[len(s) // 2] for phase, s in self.by_phase.items()}
+        if medians:
+            summary = " ".join(
+                f"{phase}={medians[phase] * 1000:.0f}ms({len(self.by_phase[phase])})" for phase in medians
+            )
+            logger.info(f"🗣️ [{call_id}] Turn latency by phase: {summary}")
+        return medians
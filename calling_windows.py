@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Calling windows per prospect timezone
+
+Each prospect's timezone comes from prospect_info["timezone"] (IANA name) or
+from the number: +52 and +1 are resolved by area code, other countries by
+their country code (COUNTRY_ZONES). US/Canada numbers with an unknown area
+code go to a conservative bucket that is only open when the window is open on
+both coasts; countries not in the table use TDX_DEFAULT_TIMEZONE. A timezone
+column that isn't a valid IANA name is logged and ignored.
+
+The campaign queue is split into one FIFO bucket per timezone, and open
+buckets take turns (round-robin), so one zone's backlog never holds the others
+past their window. Each bucket caches whether it is open and until when, so
+releasing the next prospect only looks at the bucket heads and recomputes a
+bucket's state when that time is passed; nothing scans the prospect list.
+
+Uso:
+    python calling_windows.py --window "mon-fri 09:00-12:00,14:00-18:00"
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from datetime import time as dtime
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dnc_index import DEFAULT_COUNTRY_CODE, DEFAULT_COUNTRY_CODE_ENV, normalize_e164
+
+logger = logging.getLogger("calling_windows")
+
+DEFAULT_TIMEZONE_ENV = "TDX_DEFAULT_TIMEZONE"
+# Countries missing from COUNTRY_ZONES: the campaigns' home market
+DEFAULT_TIMEZONE = "America/Bogota"
+
+DEFAULT_WINDOW_SPEC = "mon-fri 09:00-18:00"
+# Prospects read ahead of the dialer while every bucket with work is closed
+DEFAULT_READ_AHEAD = 10000
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+US_EASTERN = "America/New_York"
+US_PACIFIC = "America/Los_Angeles"
+# Unknown +1 area codes: open only while both coasts are inside the window
+NANP_UNKNOWN = (US_EASTERN, US_PACIFIC)
+
+_NANP_ZONES = {
+    "America/Los_Angeles": """
+        209 213 279 310 323 341 350 408 415 424 442 510 530 559 562 619 626 628 650 657 661
+        669 707 714 747 760 805 818 820 831 840 858 909 916 925 949 951 206 253 360 425 509
+        564 458 503 541 971 702 725 775 604 778 236 250 672""",
+    "America/Denver": "303 719 720 970 983 385 435 801 505 575 406 307 208 986 403 587 780 825",
+    "America/Phoenix": "480 520 602 623 928",
+    "America/Chicago": """
+        205 251 256 334 659 938 479 501 870 217 224 309 312 331 447 464 618 630 708 773 779
+        815 847 872 319 515 563 641 712 316 620 785 913 225 318 337 504 985 218 320 507 612
+        651 763 952 228 601 662 769 314 417 557 573 636 660 816 975 308 402 531 701 405 539
+        572 580 918 605 615 629 731 901 931 210 214 254 281 325 346 361 409 430 432 469 512
+        682 713 726 737 806 817 830 832 903 936 940 945 956 972 979 262 274 353 414 534 608
+        715 920 204 431""",
+    "America/New_York": """
+        201 202 203 207 212 215 216 220 223 227 229 231 234 239 240 248 252 260 267 269 272
+        276 283 301 302 304 305 313 315 317 321 326 330 332 336 339 347 351 352 380 386 401
+        404 407 410 412 413 419 423 434 440 443 445 463 470 475 478 484 502 508 513 516 517
+        518 540 551 561 567 570 571 574 585 586 603 607 609 610 614 616 617 631 646 656 667
+        678 680 681 689 703 704 706 716 717 718 724 727 732 734 740 743 754 757 762 765 770
+        772 774 781 786 802 803 804 810 812 813 814 828 838 839 843 845 848 850 856 857 859
+        860 862 863 864 865 878 904 906 908 910 912 914 917 919 929 934 937 941 947 954 959
+        973 978 980 984 989 416 437 647 905 289 365 613 343 514 438 450 579 418 581 819 873""",
+    "America/Anchorage": "907",
+    "Pacific/Honolulu": "808",
+    # Caribbean countries inside +1
+    "America/Santo_Domingo": "809 829 849",
+    "America/Puerto_Rico": "787 939",
+}
+NANP_AREA_CODES: Dict[str, str] = {
+    code: zone for zone, codes in _NANP_ZONES.items() for code in codes.split()
+}
+
+# Mexico has used a single offset per region since DST ended in 2022
+MEXICO_AREA_CODES: Dict[str, str] = {
+    **{code: "America/Tijuana" for code in ("664", "665", "686", "646", "616", "658", "661")},
+    **{code: "America/Cancun" for code in ("998", "983", "984", "987")},
+    **{code: "America/Hermosillo" for code in ("662", "631", "633", "644", "647", "653")},
+    **{code: "America/Mazatlan" for code in ("669", "612", "624", "667", "668", "311", "687")},
+}
+MEXICO_DEFAULT = "America/Mexico_City"
+
+# Country code -> zone, for countries with one zone (or one zone for most of the population)
+COUNTRY_ZONES = {
+    "57": "America/Bogota",
+    "51": "America/Lima",
+    "593": "America/Guayaquil",
+    "58": "America/Caracas",
+    "56": "America/Santiago",
+    "54": "America/Argentina/Buenos_Aires",
+    "55": "America/Sao_Paulo",
+    "591": "America/La_Paz",
+    "595": "America/Asuncion",
+    "598": "America/Montevideo",
+    "502": "America/Guatemala",
+    "503": "America/El_Salvador",
+    "504": "America/Tegucigalpa",
+    "505": "America/Managua",
+    "506": "America/Costa_Rica",
+    "507": "America/Panama",
+    "34": "Europe/Madrid",
+}
+
+
+def prospect_zones(phone_number: str, prospect_info: Optional[Dict[str, Any]] = None) -> Tuple[str, ...]:
+    """IANA zone(s) a prospect must be inside the window in"""
+    explicit = (prospect_info or {}).get("timezone")
+    if explicit:
+        try:
+            ZoneInfo(explicit)
+            return (explicit,)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning(f"Unknown timezone {explicit!r} for {phone_number}, using the number's zone")
+
+    digits = normalize_e164(phone_number, os.getenv(DEFAULT_COUNTRY_CODE_ENV, DEFAULT_COUNTRY_CODE))[1:]
+    if digits.startswith("1") and len(digits) == 11:
+        zone = NANP_AREA_CODES.get(digits[1:4])
+        return (zone,) if zone else NANP_UNKNOWN
+    if digits.startswith("52"):
+        national = digits[2:]
+        if len(national) == 11 and national.startswith("1"):
+            # Old mobile prefix: +52 1 <10 digits>
+            national = national[1:]
+        return (MEXICO_AREA_CODES.get(national[:3], MEXICO_DEFAULT),)
+    # Country codes are prefix-free: at most one of the 3/2/1-digit prefixes is a code
+    for length in (3, 2, 1):
+        zone = COUNTRY_ZONES.get(digits[:length])
+        if zone:
+            return (zone,)
+    return (default_timezone(),)
+
+
+def default_timezone() -> str:
+    zone = os.getenv(DEFAULT_TIMEZONE_ENV, DEFAULT_TIMEZONE)
+    try:
+        ZoneInfo(zone)
+        return zone
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Unknown {DEFAULT_TIMEZONE_ENV}={zone!r}, using {DEFAULT_TIMEZONE}")
+        return DEFAULT_TIMEZONE
+
+
+class CallingWindow:
+    """Local-time window on some weekdays, e.g. mon-fri 09:00-12:00"""
+
+    __slots__ = ("days", "start", "end")
+
+    def __init__(self, days: List[int], start: dtime, end: dtime):
+        self.days = set(days)
+        self.start = start
+        self.end = end
+
+
+def parse_windows(spec: str) -> List[CallingWindow]:
+    """Parse "mon-fri 09:00-12:00,14:00-18:00; sat 10:00-13:00" """
+    windows = []
+    for part in spec.split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        day_spec, ranges = part.split(None, 1)
+        days: List[int] = []
+        for chunk in day_spec.lower().split(","):
+            first, _, last = chunk.partition("-")
+            a, b = DAYS.index(first), DAYS.index(last or first)
+            days.extend(range(a, b + 1))
+        for rng in ranges.split(","):
+            start, end = rng.strip().split("-")
+            windows.append(CallingWindow(days, dtime.fromisoformat(start), dtime.fromisoformat(end)))
+    return windows
+
+
+def window_state(zone: ZoneInfo, windows: List[CallingWindow], now: float) -> Tuple[bool, float]:
+    """(open, until): whether `now` is inside a window in `zone`, and when that changes"""
+    local = datetime.fromtimestamp(now, zone)
+    next_open = None
+    # A week ahead always contains the next boundary when any window is configured
+    for offset in range(8):
+        day = local.date() + timedelta(days=offset)
+        for window in windows:
+            if day.weekday() not in window.days:
+                continue
+            start = datetime.combine(day, window.start, zone).timestamp()
+            end = datetime.combine(day, window.end, zone).timestamp()
+            if start <= now < end:
+                return True, end
+            if start > now and (next_open is None or start < next_open):
+                next_open = start
+        if next_open is not None:
+            return False, next_open
+    return False, float("inf")
+
+
+class _Bucket:
+    __slots__ = ("zones", "queue", "is_open", "until")
+
+    def __init__(self, zones: Tuple[str, ...]):
+        self.zones = [ZoneInfo(z) for z in zones]
+        self.queue: Deque[Dict[str, Any]] = deque()
+        self.is_open = False
+        self.until = 0.0
+
+    def refresh(self, windows: List[CallingWindow], now: float) -> None:
+        """Recompute open/until; only called once the cached state has expired"""
+        states = [window_state(zone, windows, now) for zone in self.zones]
+        if all(is_open for is_open, _ in states):
+            self.is_open, self.until = True, min(until for _, until in states)
+        elif len(states) == 1:
+            self.is_open, self.until = states[0]
+        else:
+            # Closed somewhere: re-check at the earliest change in any zone
+            self.is_open = False
+            self.until = min(until for _, until in states)
+
+
+class WindowScheduler:
+    """Buckets prospects by timezone and releases them only inside their calling windows"""
+
+    def __init__(self, windows: List[CallingWindow], read_ahead: int = DEFAULT_READ_AHEAD):
+        if not windows:
+            raise ValueError("at least one calling window is required")
+        self.windows = windows
+        self.read_ahead = read_ahead
+        self.buckets: Dict[Tuple[str, ...], _Bucket] = {}
+        # Buckets in creation order, and where the next round-robin scan starts
+        self._order: List[_Bucket] = []
+        self._next = 0
+        self.pending = 0
+
+    def add(self, prospect: Dict[str, Any]) -> None:
+        zones = prospect_zones(str(prospect.get("phone_number", "")), prospect)
+        bucket = self.buckets.get(zones)
+        if bucket is None:
+            bucket = self.buckets[zones] = _Bucket(zones)
+            self._order.append(bucket)
+        bucket.queue.append(prospect)
+        self.pending += 1
+
+    def pop_eligible(self, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next prospect whose local time is inside a window; open buckets take turns"""
+        now = now if now is not None else time.time()
+        count = len(self._order)
+        for step in range(count):
+            i = (self._next + step) % count
+            bucket = self._order[i]
+            if not bucket.queue:
+                continue
+            if now >= bucket.until:
+                bucket.refresh(self.windows, now)
+            if bucket.is_open:
+                self._next = i + 1
+                self.pending -= 1
+                return bucket.queue.popleft()
+        return None
+
+    def next_release_at(self) -> float:
+        """Earliest time a bucket with prospects opens"""
+        closed = [b.until for b in self.buckets.values() if b.queue and not b.is_open]
+        return min(closed, default=float("inf"))
+
+    async def release(self, source: Iterator[Dict[str, Any]], stop: asyncio.Event) -> AsyncIterator[Dict[str, Any]]:
+        """Yield prospects from `source` as their windows allow, reading ahead up to read_ahead"""
+        exhausted = False
+        while not stop.is_set():
+            prospect = self.pop_eligible()
+            if prospect is not None:
+                yield prospect
+                continue
+            if not exhausted and self.pending < self.read_ahead:
+                try:
+                    self.add(next(source))
+                    continue
+                except StopIteration:
+                    exhausted = True
+            if exhausted and self.pending == 0:
+                return
+            wait = max(0.0, self.next_release_at() - time.time())
+            opens = datetime.fromtimestamp(time.time() + wait).strftime("%Y-%m-%d %H:%M") if wait != float("inf") else "nunca"
+            print(f"🕘 {self.pending} prospectos fuera de horario, próxima ventana: {opens}")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=min(wait, 3600.0))
+            except asyncio.TimeoutError:
+                pass
+
+    def summary(self, now: Optional[float] = None) -> List[Tuple[str, int, bool, float]]:
+        now = now if now is not None else time.time()
+        rows = []
+        for zones, bucket in self.buckets.items():
+            if now >= bucket.until:
+                bucket.refresh(self.windows, now)
+            rows.append(("+".join(zones), len(bucket.queue), bucket.is_open, bucket.until))
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estado de las ventanas de llamada por zona horaria")
+    parser.add_argument("--window", default=DEFAULT_WINDOW_SPEC, help='Ej: "mon-fri 09:00-12:00,14:00-18:00"')
+    parser.add_argument("numbers", nargs="*", default=["+573108777663", "+525512345678", "+18632190153",
+                                                        "+14155550100", "+526645550100", "+19995550100"])
+    args = parser.parse_args()
+
+    scheduler = WindowScheduler(parse_windows(args.window))
+    for number in args.numbers:
+        scheduler.add({"phone_number": number})
+
+    print(f"🕘 CALLING WINDOWS - {args.window}")
+    print("=" * 70)
+    for zones, queued, is_open, until in scheduler.summary():
+        state = "abierta " if is_open else "cerrada "
+        local = ZoneInfo(zones.split("+")[0])
+        change = datetime.fromtimestamp(until, local).strftime("%a %H:%M") if until != float("inf") else "-"
+        print(f"   {zones:<42} {queued:>3}  {state} hasta {change}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Dialer de campañas outbound basado en create_outbound_call.py
+
+Lee prospectos de un CSV o JSONL (en streaming), crea un dispatch de
+tdx-sdr-bot por cada uno con concurrencia acotada y un límite de llamadas por
+segundo por trunk, y guarda el estado de cada prospecto en un journal para
+poder pausar (Ctrl+C o --pause-file) y reanudar la campaña.
+
+Con --pacing predictive el ritmo lo decide PredictivePacer (pacer.py) a partir
+de la tasa de respuesta, la duración media y los workers libres observados en
+LiveKit (--workers menos las llamadas de otras campañas o entrantes), en lugar
+de un máximo fijo de llamadas activas.
+
+Con --window solo se marca a prospectos cuya hora local (según su número o
+prospect_info.timezone) está dentro de la ventana; ver calling_windows.py.
+
+Columnas reconocidas: phone_number (obligatoria), company_name, contact_name,
+transfer_to, sip_trunk_id. El resto de columnas se agregan a prospect_info.
+
+Uso:
+    python campaign_dialer.py prospects.csv --campaign demo --cps 1 --max-active-calls 5
+    python campaign_dialer.py prospects.csv --campaign demo --pacing predictive --workers 10
+    python campaign_dialer.py prospects.csv --campaign demo --window "mon-fri 09:00-12:00,14:00-18:00"
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import signal
+import string
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from dotenv import load_dotenv
+from livekit import api
+
+from call_metrics import SIP_CALL_STATUS_ATTRIBUTE
+from calling_windows import DEFAULT_READ_AHEAD, WindowScheduler, parse_windows
+from dnc_index import DialGuard, guard_from_env, normalize_e164
+from pacer import (
+    DEFAULT_MAX_ABANDON_RATE,
+    DEFAULT_PICKUP_TIMEOUT_S,
+    DEFAULT_TARGET_UTILIZATION,
+    PACING_INTERVAL_S,
+    PredictivePacer,
+)
+from rate_limiter import KeyedRateLimiter
+
+load_dotenv(dotenv_path=".env.local")
+
+AGENT_NAME = "tdx-sdr-bot"  # Debe coincidir con agent_name en agent.py
+DEFAULT_TRANSFER_TO = "+18632190153"
+
+# Known columns; everything else in a row goes to prospect_info as-is
+DIAL_COLUMNS = {"phone_number", "transfer_to", "sip_trunk_id"}
+
+# How often the number of active campaign rooms is refreshed from LiveKit
+ACTIVE_CALLS_REFRESH_S = 2.0
+PAUSE_POLL_S = 1.0
+
+# The agent places the SIP call itself once a worker takes the dispatch, so
+# over-dialing shows up as dispatches no worker picks up: after this long the
+# pacer counts one as abandoned
+PICKUP_TIMEOUT_S = DEFAULT_PICKUP_TIMEOUT_S
+# Rooms of calls that hold an agent worker, whoever started them (sip_probe uses the same prefixes)
+CALL_ROOM_PREFIXES = ("call-", "outbound-")
+
+# Prospect states kept in the journal
+STATUS_DISPATCHED = "dispatched"
+STATUS_FAILED = "failed"
+STATUS_BLOCKED = "blocked"
+
+
+def iter_prospects(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream prospects from a .csv or .jsonl file without loading it in memory"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def build_metadata(prospect: Dict[str, Any], campaign: str, default_trunk: Optional[str],
+                   default_transfer_to: str) -> Dict[str, Any]:
+    """Build the dispatch metadata in the same shape create_outbound_call.py uses"""
+    # A row without a number normalizes to "" and is skipped by the caller
+    phone_number = normalize_e164(str(prospect.get("phone_number") or ""))
+    dial_info = {
+        "phone_number": phone_number,
+        "transfer_to": prospect.get("transfer_to") or default_transfer_to,
+    }
+    trunk = prospect.get("sip_trunk_id") or default_trunk
+    if trunk:
+        dial_info["sip_trunk_id"] = trunk
+
+    prospect_info = {k: v for k, v in prospect.items() if k not in DIAL_COLUMNS and v not in (None, "")}
+    prospect_info.setdefault("company_name", "Unknown Company")
+    prospect_info.setdefault("contact_name", "there")
+
+    return {
+        "phone_number": phone_number,
+        "dial_info": dial_info,
+        "prospect_info": prospect_info,
+        "call_direction": "outbound",
+        "campaign_id": campaign,
+    }
+
+
+async def _as_async(prospects: Iterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    for prospect in prospects:
+        yield prospect
+
+
+class CampaignState:
+    """Append-only journal of per-prospect state, replayed on start to resume a campaign"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.statuses: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.statuses[entry["phone_number"]] = entry["status"]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._journal = open(path, "a", encoding="utf-8")
+
+    def should_dial(self, phone_number: str, retry_failed: bool) -> bool:
+        status = self.statuses.get(phone_number)
+        if status is None:
+            return True
+        return retry_failed and status == STATUS_FAILED
+
+    def record(self, phone_number: str, status: str, **fields: Any) -> None:
+        self.statuses[phone_number] = status
+        entry = {"phone_number": phone_number, "status": status, "at": time.time(), **fields}
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+
+    def close(self) -> None:
+        self._journal.close()
+
+
+class _PacedCall:
+    """What the pacer has seen of one dispatched room"""
+
+    __slots__ = ("dispatched_at", "seen", "picked_up", "answered_at", "abandoned")
+
+    def __init__(self, dispatched_at: float):
+        self.dispatched_at = dispatched_at
+        self.seen = False
+        self.picked_up = False
+        self.answered_at: Optional[float] = None
+        self.abandoned = False
+
+
+class CampaignDialer:
+    """Creates one agent dispatch per prospect with bounded concurrency and per-trunk CPS"""
+
+    def __init__(
+        self,
+        lk_api: api.LiveKitAPI,
+        campaign: str,
+        state: CampaignState,
+        *,
+        cps: float,
+        max_in_flight: int,
+        max_active_calls: int,
+        default_trunk: Optional[str],
+        default_transfer_to: str = DEFAULT_TRANSFER_TO,
+        pause_file: Optional[str] = None,
+        retry_failed: bool = False,
+        pacer: Optional[PredictivePacer] = None,
+        guard: Optional[DialGuard] = None,
+    ):
+        self.lk_api = lk_api
+        self.campaign = campaign
+        self.state = state
+        self.default_trunk = default_trunk
+        self.default_transfer_to = default_transfer_to
+        self.pause_file = pause_file
+        self.retry_failed = retry_failed
+        self.max_active_calls = max_active_calls
+        self.pacer = pacer
+        self.guard = guard
+
+        self.room_prefix = f"outbound-{campaign}-"
+        self._limiter = KeyedRateLimiter(rate=cps, capacity=1)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._stop = asyncio.Event()
+        self._active_calls = 0
+        self._active_refreshed_at = 0.0
+        self.stats = {"dispatched": 0, "failed": 0, "skipped": 0, "blocked": 0}
+        self._paced_calls: Dict[str, _PacedCall] = {}
+        self._pace_credits = 0
+        self._paced_at = 0.0
+        # Launched but not dispatched yet: a duplicate row for one of these is skipped
+        self._pending: set[str] = set()
+
+    def stop(self) -> None:
+        """Stop launching new calls; in-flight dispatches finish and are journaled"""
+        if not self._stop.is_set():
+            print("\n⏸️  Pausando campaña... (las llamadas en curso continúan)")
+        self._stop.set()
+
+    async def _wait_if_paused(self) -> None:
+        announced = False
+        while self.pause_file and os.path.exists(self.pause_file) and not self._stop.is_set():
+            if not announced:
+                print(f"⏸️  Pausa activa mientras exista {self.pause_file}")
+                announced = True
+            await asyncio.sleep(PAUSE_POLL_S)
+
+    async def _refresh_active_calls(self) -> None:
+        rooms = await self.lk_api.room.list_rooms(api.ListRoomsRequest())
+        self._active_calls = sum(1 for r in rooms.rooms if r.name.startswith(self.room_prefix))
+        self._active_refreshed_at = time.monotonic()
+
+    async def _wait_for_capacity(self) -> None:
+        if self.max_active_calls <= 0:
+            return
+        while not self._stop.is_set():
+            if time.monotonic() - self._active_refreshed_at >= ACTIVE_CALLS_REFRESH_S:
+                try:
+                    await self._refresh_active_calls()
+                except Exception as e:
+                    print(f"⚠️  No se pudo consultar rooms activos: {e}")
+            if self._active_calls < self.max_active_calls:
+                return
+            await asyncio.sleep(ACTIVE_CALLS_REFRESH_S)
+
+    async def _observe_call(self, room: api.Room, call: _PacedCall, now: float) -> None:
+        """Update a ringing call from its participants: agent joined, callee answered"""
+        call.seen = True
+        if room.num_participants == 0:
+            return
+        participants = await self.lk_api.room.list_participants(api.ListParticipantsRequest(room=room.name))
+        for p in participants.participants:
+            if p.kind == api.ParticipantInfo.Kind.AGENT:
+                if not call.picked_up and not call.abandoned:
+                    # A worker took the dispatch in time
+                    self.pacer.record_connected(now)
+                call.picked_up = True
+            elif p.kind == api.ParticipantInfo.Kind.SIP and p.attributes.get(SIP_CALL_STATUS_ATTRIBUTE) == "active":
+                call.answered_at = now
+                self.pacer.record_answered(now - call.dispatched_at, now)
+
+    async def _observe_calls(self) -> Tuple[int, int, int]:
+        """Feed the pacer from LiveKit and return (busy, ringing) calls and the live worker capacity"""
+        rooms = await self.lk_api.room.list_rooms(api.ListRoomsRequest())
+        present = {r.name: r for r in rooms.rooms if r.name in self._paced_calls}
+        # Inbound calls, other campaigns and manual calls hold workers too
+        others = sum(1 for r in rooms.rooms if r.name.startswith(CALL_ROOM_PREFIXES) and r.name not in present)
+        capacity = max(0, self.pacer.workers - others)
+        now = time.monotonic()
+
+        ringing = []
+        for name, call in list(self._paced_calls.items()):
+            room = present.get(name)
+            if room is None:
+                if call.seen or now - call.dispatched_at > PICKUP_TIMEOUT_S:
+                    # Room closed (or never came up): the call is over
+                    if call.answered_at is not None:
+                        self.pacer.record_handle_time(now - call.answered_at, now)
+                    elif call.picked_up:
+                        self.pacer.record_unanswered(now - call.dispatched_at, now)
+                    elif not call.abandoned:
+                        self.pacer.record_abandoned(now)
+                    del self._paced_calls[name]
+                continue
+            if call.answered_at is None:
+                ringing.append((room, call))
+
+        # Participants are only needed for rooms still ringing; fetch them in parallel
+        await asyncio.gather(*(self._observe_call(room, call, now) for room, call in ringing))
+        for _, call in ringing:
+            if not call.picked_up and not call.abandoned and now - call.dispatched_at > PICKUP_TIMEOUT_S:
+                call.abandoned = True
+                self.pacer.record_abandoned(now)
+
+        busy = sum(1 for c in self._paced_calls.values() if c.answered_at is not None)
+        return busy, len(self._paced_calls) - busy, capacity
+
+    async def _wait_for_pacing(self) -> None:
+        """Take one dispatch from the pacer's budget for the current interval"""
+        while not self._stop.is_set():
+            if self._pace_credits > 0:
+                self._pace_credits -= 1
+                return
+            elapsed = time.monotonic() - self._paced_at
+            if elapsed < PACING_INTERVAL_S:
+                await asyncio.sleep(PACING_INTERVAL_S - elapsed)
+                continue
+            try:
+                busy, ringing, capacity = await self._observe_calls()
+            except Exception as e:
+                print(f"⚠️  No se pudo consultar el estado de las llamadas: {e}")
+                busy, ringing, capacity = self.pacer.workers, 0, self.pacer.workers
+            self._paced_at = time.monotonic()
+            self._pace_credits = self.pacer.dispatches(busy, ringing, self._paced_at, capacity)
+
+    async def _dispatch(self, metadata: Dict[str, Any]) -> None:
+        phone_number = metadata["phone_number"]
+        suffix = "".join(random.choices(string.ascii_letters + string.digits, k=8))
+        room_name = f"{self.room_prefix}{suffix}"
+        try:
+            dispatch = await self.lk_api.agent_dispatch.create_dispatch(
+                api.CreateAgentDispatchRequest(
+                    agent_name=AGENT_NAME,
+                    room=room_name,
+                    metadata=json.dumps(metadata),
+                )
+            )
+            self.state.record(phone_number, STATUS_DISPATCHED, room=room_name, dispatch_id=dispatch.id)
+            if self.guard:
+                # Only a dispatched call counts as dialed; a failed one stays retryable
+                self.guard.record_dial(phone_number)
+            if self.pacer:
+                self._paced_calls[room_name] = _PacedCall(time.monotonic())
+            self.stats["dispatched"] += 1
+            print(f"📞 {phone_number} -> {room_name}")
+        except Exception as e:
+            self.state.record(phone_number, STATUS_FAILED, room=room_name, error=str(e))
+            self.stats["failed"] += 1
+            # The room may not exist yet; don't count it as an active call
+            self._active_calls = max(0, self._active_calls - 1)
+            print(f"❌ {phone_number}: {e}")
+        finally:
+            self._pending.discard(phone_number)
+            self._in_flight.release()
+
+    async def run(
+        self,
+        prospects: Iterator[Dict[str, Any]],
+        windows: Optional[WindowScheduler] = None,
+    ) -> Dict[str, int]:
+        tasks: set[asyncio.Task] = set()
+
+        # With calling windows, prospects come out of their timezone bucket once it opens
+        source = windows.release(prospects, self._stop) if windows else _as_async(prospects)
+        async for prospect in source:
+            if self._stop.is_set():
+                break
+
+            metadata = build_metadata(prospect, self.campaign, self.default_trunk, self.default_transfer_to)
+            phone_number = metadata["phone_number"]
+            if (
+                not phone_number
+                or phone_number in self._pending
+                or not self.state.should_dial(phone_number, self.retry_failed)
+            ):
+                self.stats["skipped"] += 1
+                continue
+            reason = self.guard.check(phone_number) if self.guard else None
+            if reason:
+                self.state.record(phone_number, STATUS_BLOCKED, reason=reason)
+                self.stats["blocked"] += 1
+                print(f"🚫 {phone_number}: {reason}")
+                continue
+
+            await self._wait_if_paused()
+            if self.pacer:
+                await self._wait_for_pacing()
+            else:
+                await self._wait_for_capacity()
+            if self._stop.is_set():
+                break
+
+            await self._in_flight.acquire()
+            await self._limiter.acquire(metadata["dial_info"].get("sip_trunk_id", ""))
+            # Count the call right away; the next refresh replaces it with LiveKit's view
+            self._active_calls += 1
+            self._pending.add(phone_number)
+
+            task = asyncio.create_task(self._dispatch(metadata))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        if self.pacer:
+            snapshot = self.pacer.snapshot(time.monotonic())
+            print(f"📈 Pacer: respuesta {snapshot['answer_rate']:.0%}, abandono {snapshot['abandon_rate']:.1%}, "
+                  f"duración media {snapshot['handle_time_s']:.0f}s")
+        return self.stats
+
+
+def build_pacer(args: argparse.Namespace) -> Optional[PredictivePacer]:
+    if args.pacing != "predictive":
+        return None
+    return PredictivePacer(
+        args.workers or args.max_active_calls,
+        target_utilization=args.target_utilization,
+        max_abandon_rate=args.max_abandon_rate,
+        pickup_timeout_s=PICKUP_TIMEOUT_S,
+    )
+
+
+async def run_campaign(args: argparse.Namespace) -> Dict[str, int]:
+    state = CampaignState(os.path.join(args.state_dir, f"{args.campaign}.state.jsonl"))
+    print(f"📋 Campaña: {args.campaign} ({len(state.statuses)} prospectos ya procesados)")
+
+    # One client (and one HTTP connection pool) for the whole campaign
+    async with api.LiveKitAPI(
+        url=os.getenv("LIVEKIT_URL"),
+        api_key=os.getenv("LIVEKIT_API_KEY"),
+        api_secret=os.getenv("LIVEKIT_API_SECRET"),
+    ) as lk_api:
+        dialer = CampaignDialer(
+            lk_api,
+            args.campaign,
+            state,
+            cps=args.cps,
+            max_in_flight=args.max_in_flight,
+            max_active_calls=args.max_active_calls,
+            default_trunk=os.getenv("SIP_OUTBOUND_TRUNK_ID"),
+            pause_file=args.pause_file,
+            retry_failed=args.retry_failed,
+            pacer=build_pacer(args),
+            guard=guard_from_env(),
+        )
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, dialer.stop)
+
+        try:
+            windows = WindowScheduler(parse_windows(args.window), args.read_ahead) if args.window else None
+            return await dialer.run(iter_prospects(args.prospects), windows)
+        finally:
+            state.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dialer de campañas outbound para tdx-sdr-bot")
+    parser.add_argument("prospects", help="Archivo .csv o .jsonl con prospectos")
+    parser.add_argument("--campaign", required=True, help="Identificador de la campaña")
+    parser.add_argument("--cps", type=float, default=1.0, help="Llamadas por segundo por trunk")
+    parser.add_argument("--max-in-flight", type=int, default=10, help="Dispatches simultáneos en curso")
+    parser.add_argument("--max-active-calls", type=int, default=5, help="Llamadas activas máximas (0 = sin límite)")
+    parser.add_argument("--state-dir", default="campaigns", help="Directorio del journal de estado")
+    parser.add_argument("--pause-file", help="Mientras exista este archivo la campaña queda en pausa")
+    parser.add_argument("--retry-failed", action="store_true", help="Reintentar prospectos cuyo dispatch falló")
+    parser.add_argument("--window", help='Ventanas de llamada en hora local, ej. "mon-fri 09:00-18:00"')
+    parser.add_argument("--read-ahead", type=int, default=DEFAULT_READ_AHEAD,
+                        help="Prospectos en espera de ventana que se leen por adelantado")
+    parser.add_argument("--pacing", choices=["fixed", "predictive"], default="fixed",
+                        help="fixed: --max-active-calls; predictive: pacer según tasa de respuesta")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Llamadas simultáneas que atienden todos los workers (predictive; por defecto "
+                             "--max-active-calls); las llamadas de otros rooms se descuentan en vivo")
+    parser.add_argument("--target-utilization", type=float, default=DEFAULT_TARGET_UTILIZATION, help="Parte de los workers que se liberan en la ventana de pickup que se marca por adelantado")
+    parser.add_argument("--max-abandon-rate", type=float, default=DEFAULT_MAX_ABANDON_RATE, help="Tasa máxima de abandono")
+    args = parser.parse_args()
+
+    stats = asyncio.run(run_campaign(args))
+    print(f"\n🎯 Campaña {args.campaign}: {stats['dispatched']} llamadas, "
+          f"{stats['failed']} fallidas, {stats['skipped']} omitidas, {stats['blocked']} bloqueadas (DNC/duplicadas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Cascaded STT -> LLM -> TTS pipeline and the realtime latency supervisor
+
+The agent normally talks through one gpt-4o-realtime session. When that
+endpoint is slow or rate-limited a call just hangs: the caller finishes a
+sentence and nothing comes back. This module provides the alternative path,
+built from the OpenAI plugin's separate endpoints:
+
+- streaming STT (gpt-4o-mini-transcribe over the realtime transcription API,
+  which also ends turns when no local VAD is loaded);
+- a text LLM (gpt-4o-mini), with the same tools and the conversation so far;
+- TTS (gpt-4o-mini-tts), synthesized sentence by sentence as the LLM streams.
+
+A call can start on it (TDX_PIPELINE=cascade), or LatencySupervisor moves a
+live call to it when the realtime model breaches the response-time SLO
+(TDX_REALTIME_SLO_MS): BREACHES_TO_SWITCH slow turns in a row, one turn left
+unanswered for STALL_FACTOR x the SLO, or a realtime error. The switch is
+one-way for the rest of the call.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("cascade_pipeline")
+
+PIPELINE_ENV = "TDX_PIPELINE"
+PIPELINE_REALTIME = "realtime"
+PIPELINE_CASCADE = "cascade"
+REALTIME_SLO_ENV = "TDX_REALTIME_SLO_MS"
+
+LANGUAGE = "es"
+STT_MODEL = "gpt-4o-mini-transcribe"
+LLM_MODEL = "gpt-4o-mini"
+TTS_MODEL = "gpt-4o-mini-tts"
+# Same voice as the realtime model, so a switch mid-call is not a new person
+TTS_VOICE = "echo"
+TTS_INSTRUCTIONS = "Habla en español latinoamericano, rápido, claro y con energía, como un vendedor experto."
+# Turn end for the streaming STT when no local VAD is loaded
+STT_SILENCE_MS = 500
+
+# Slow turns in a row (end of caller speech -> agent audio) before switching
+BREACHES_TO_SWITCH = 2
+# A turn with no answer at all for this many SLOs switches right away
+STALL_FACTOR = 2.0
+
+
+def pipeline_from_env() -> str:
+    pipeline = os.getenv(PIPELINE_ENV, PIPELINE_REALTIME).lower()
+    if pipeline not in (PIPELINE_REALTIME, PIPELINE_CASCADE):
+        logger.warning(f"Unknown {PIPELINE_ENV}={pipeline}, using {PIPELINE_REALTIME}")
+        return PIPELINE_REALTIME
+    return pipeline
+
+
+def build_cascade(vad: Any = None) -> Dict[str, Any]:
+    """STT/LLM/TTS (and turn detection) for an Agent; `vad` is prewarm's optional Silero VAD"""
+    # Imported here for the same reason as in agent.build_realtime_model
+    from livekit.plugins import openai
+    from openai.types.beta.realtime.transcription_session_update_param import SessionTurnDetection
+
+    return {
+        "stt": openai.STT(
+            model=STT_MODEL,
+            language=LANGUAGE,
+            use_realtime=True,
+            turn_detection=SessionTurnDetection(type="server_vad", silence_duration_ms=STT_SILENCE_MS),
+        ),
+        "llm": openai.LLM(model=LLM_MODEL, temperature=0.6),
+        "tts": openai.TTS(model=TTS_MODEL, voice=TTS_VOICE, instructions=TTS_INSTRUCTIONS),
+        "vad": vad,
+        # Without a local VAD the STT's end-of-speech events end the turn
+        "turn_detection": "vad" if vad is not None else "stt",
+    }
+
+
+class LatencySupervisor:
+    """Watches realtime turn latency and calls `on_breach(reason)` once when it breaks the SLO"""
+
+    __slots__ = ("slo_s", "breaches_to_switch", "on_breach", "breaches", "turns", "reason", "switched_at",
+                 "_started_at", "_stall")
+
+    def __init__(self, slo_ms: float, on_breach: Callable[[str], None], *, breaches_to_switch: int = BREACHES_TO_SWITCH):
+        self.slo_s = slo_ms / 1000
+        self.breaches_to_switch = breaches_to_switch
+        self.on_breach = on_breach
+        # Consecutive turns over the SLO
+        self.breaches = 0
+        self.turns = 0
+        self.reason: Optional[str] = None
+        self.switched_at: Optional[float] = None
+        self._started_at = time.monotonic()
+        self._stall: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def switched(self) -> bool:
+        return self.reason is not None
+
+    def on_user_turn_ended(self) -> None:
+        """Caller stopped speaking: the answer has STALL_FACTOR x the SLO to start"""
+        if self.switched:
+            return
+        self._cancel_stall()
+        self._stall = asyncio.get_running_loop().call_later(
+            self.slo_s * STALL_FACTOR, self._switch, "no_response"
+        )
+
+    def on_user_speaking(self) -> None:
+        # They kept talking: the turn wasn't over yet
+        self._cancel_stall()
+
+    def on_turn_latency(self, latency_s: float) -> None:
+        """A realtime answer started latency_s after the caller's turn ended"""
+        self._cancel_stall()
+        if self.switched:
+            return
+        self.turns += 1
+        self.breaches = self.breaches + 1 if latency_s > self.slo_s else 0
+        if self.breaches >= self.breaches_to_switch:
+            self._switch("slo_breach")
+
+    def on_realtime_error(self, error: Any) -> None:
+        if not self.switched:
+            logger.warning(f"Realtime model error: {error}")
+            self._switch("realtime_error")
+
+    def _cancel_stall(self) -> None:
+        if self._stall is not None:
+            self._stall.cancel()
+            self._stall = None
+
+    def _switch(self, reason: str) -> None:
+        self._stall = None
+        if self.switched:
+            return
+        self.reason = reason
+        self.switched_at = time.monotonic()
+        self.on_breach(reason)
+
+    def close(self) -> None:
+        self._cancel_stall()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "reason": self.reason,
+            "after_s": round(self.switched_at - self._started_at, 1) if self.switched_at else None,
+            "realtime_turns": self.turns,
+            "slo_ms": round(self.slo_s * 1000),
+        }
+
+
+def supervisor_from_env(on_breach: Callable[[str], None]) -> Optional[LatencySupervisor]:
+    """LatencySupervisor for TDX_REALTIME_SLO_MS, or None when no SLO is configured"""
+    slo_ms = os.getenv(REALTIME_SLO_ENV)
+    if not slo_ms:
+        return None
+    return LatencySupervisor(float(slo_ms), on_breach)
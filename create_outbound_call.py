@@ -11,6 +11,8 @@ import string
 from dotenv import load_dotenv
 from livekit import api
 
+from dnc_index import default_guard
+
 load_dotenv(dotenv_path=".env.local")
 
 async def create_outbound_call():
@@ -39,6 +41,12 @@ async def create_outbound_call():
         "call_direction": "outbound"
     }
     
+    guard = default_guard()
+    reason = guard.check(phone_number)
+    if reason:
+        print(f"🚫 {phone_number} bloqueado: {reason}")
+        return None
+    
     try:
         # 1. Crear room único para la llamada
         random_suffix = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
@@ -56,6 +64,8 @@ async def create_outbound_call():
                 metadata=json.dumps(metadata)
             )
         )
+        # Only a call that actually went out counts for the dedupe window
+        guard.record_dial(phone_number)
         
         print(f"✅ Dispatch creado exitosamente!")
         print(f"📋 Dispatch: {dispatch}")
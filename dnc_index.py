@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Do-not-call and dedupe index for outbound dialing
+
+Numbers are normalized to E.164 and stored as 64-bit integers in a sorted
+array, with a bloom filter in front: most numbers a dialer checks are not on
+the list, and the bloom filter rejects those with two bit probes before the
+binary search runs. DialGuard combines the DNC index with the numbers dialed
+in the last hours, so the same prospect is not called twice in a day.
+
+Every script consults the guard before create_dispatch/create_sip_participant
+and records the dial only once that call succeeded, so a failed attempt can
+be retried right away.
+DNC files (one number per line, or a CSV whose first column is the number)
+come from TDX_DNC_FILES and are reloaded when they change. Dials are shared
+between scripts through the TDX_DIALED_LOG file.
+
+The agent's job processes don't build the index: their last-line check maps
+TDX_DNC_SORTED_FILE, the sorted keys exported by --export, on the first
+outbound dial. The pages live in the OS page cache, shared by every process
+on the host, and a new export is picked up when the file is replaced.
+
+Run it directly for the memory/throughput report, or to export the list:
+    python dnc_index.py --entries 10000000
+    python dnc_index.py --export dnc.sorted
+"""
+import argparse
+import array
+import bisect
+import logging
+import mmap
+import os
+import random
+import threading
+import time
+import tracemalloc
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger("dnc_index")
+
+DNC_FILES_ENV = "TDX_DNC_FILES"
+DIALED_LOG_ENV = "TDX_DIALED_LOG"
+DEDUPE_WINDOW_ENV = "TDX_DEDUPE_WINDOW_H"
+DEFAULT_COUNTRY_CODE_ENV = "TDX_DEFAULT_COUNTRY_CODE"
+DNC_SORTED_FILE_ENV = "TDX_DNC_SORTED_FILE"
+
+DEFAULT_DEDUPE_WINDOW_H = 24.0
+# 10-digit numbers without a country code are national numbers of the target market:
+# Colombia, like calling_windows' default zone (TDX_DEFAULT_COUNTRY_CODE=1 for US/Canada lists)
+DEFAULT_COUNTRY_CODE = "57"
+RELOAD_CHECK_S = 30.0
+
+# E.164: country code + subscriber number, at most 15 digits
+E164_MIN_DIGITS = 8
+E164_MAX_DIGITS = 15
+
+# Bloom filter: 16 bits per entry and two probes is ~1.4% false positives
+BLOOM_BITS_PER_ENTRY = 16
+_MIX = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+# Reasons DialGuard.check returns
+BLOCKED_INVALID = "invalid_number"
+BLOCKED_DNC = "do_not_call"
+BLOCKED_DIALED = "dialed_recently"
+
+
+def normalize_e164(raw: str, default_country_code: str = DEFAULT_COUNTRY_CODE) -> str:
+    """Normalize a phone number to E.164 (+<digits>); returns "" when it can't be one"""
+    raw = raw.strip()
+    if raw.startswith("+"):
+        # Already E.164 is the common case for dialer input; skip the digit filter then
+        digits = raw[1:] if raw[1:].isdigit() else "".join(ch for ch in raw if ch.isdigit())
+    else:
+        digits = "".join(ch for ch in raw if ch.isdigit())
+        if digits.startswith("00"):
+            # International dialing prefix
+            digits = digits[2:]
+        elif len(digits) == 10:
+            digits = default_country_code + digits
+    if not E164_MIN_DIGITS <= len(digits) <= E164_MAX_DIGITS or digits.startswith("0"):
+        return ""
+    return f"+{digits}"
+
+
+def e164_key(e164: str) -> int:
+    """Integer key of an E.164 number (country codes never start with 0, so it's lossless)"""
+    return int(e164[1:])
+
+
+class DNCIndex:
+    """Immutable set of E.164 numbers: bloom filter in front of a sorted int64 array"""
+
+    def __init__(self, sorted_keys: Iterable[int]):
+        numbers = array.array("q")
+        previous = None
+        for key in sorted_keys:
+            if key != previous:
+                numbers.append(key)
+                previous = key
+        self._numbers = numbers
+
+        bits = 1 << max(3, (len(numbers) * BLOOM_BITS_PER_ENTRY - 1).bit_length())
+        self._bloom_mask = bits - 1
+        bloom = bytearray(bits // 8)
+        mask = self._bloom_mask
+        for key in numbers:
+            h = (key * _MIX) & _MASK64
+            a, b = h & mask, (h >> 32) & mask
+            bloom[a >> 3] |= 1 << (a & 7)
+            bloom[b >> 3] |= 1 << (b & 7)
+        self._bloom = bloom
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    def __contains__(self, key: int) -> bool:
+        h = (key * _MIX) & _MASK64
+        a = h & self._bloom_mask
+        if not (self._bloom[a >> 3] >> (a & 7)) & 1:
+            return False
+        b = (h >> 32) & self._bloom_mask
+        if not (self._bloom[b >> 3] >> (b & 7)) & 1:
+            return False
+        i = bisect.bisect_left(self._numbers, key)
+        return i < len(self._numbers) and self._numbers[i] == key
+
+    def contains_sorted_only(self, key: int) -> bool:
+        """Lookup without the bloom filter (for the benchmark)"""
+        i = bisect.bisect_left(self._numbers, key)
+        return i < len(self._numbers) and self._numbers[i] == key
+
+    def memory_bytes(self) -> Dict[str, int]:
+        return {
+            "sorted_array": self._numbers.itemsize * len(self._numbers),
+            "bloom_filter": len(self._bloom),
+        }
+
+
+def read_number_file(path: str, default_country_code: str = DEFAULT_COUNTRY_CODE) -> Iterable[int]:
+    """Yield the keys of the numbers in a DNC file; blank lines, comments and headers are skipped"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            value = line.split(",", 1)[0].strip()
+            if not value or value.startswith("#"):
+                continue
+            e164 = normalize_e164(value, default_country_code)
+            if e164:
+                yield e164_key(e164)
+
+
+def load_dnc_index(paths: List[str], default_country_code: str = DEFAULT_COUNTRY_CODE) -> DNCIndex:
+    keys = array.array("q")
+    for path in paths:
+        keys.extend(read_number_file(path, default_country_code))
+    # The sort briefly needs ~40 B/number as Python ints; the index itself keeps ~11 B
+    return DNCIndex(sorted(keys))
+
+
+def write_sorted_file(index: DNCIndex, path: str) -> None:
+    """Export the index's sorted keys (native int64) for MappedDNCIndex; replaces `path` atomically"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        index._numbers.tofile(f)
+    # A new inode: processes that mapped the old file keep reading it until they remap
+    os.replace(tmp, path)
+
+
+class MappedDNCIndex:
+    """Sorted int64 keys read through mmap: no load time and no per-process copy"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.inode = stat.st_ino
+            if stat.st_size:
+                self._keys = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast("q")
+            else:
+                # mmap can't map an empty file
+                self._keys = array.array("q")
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: int) -> bool:
+        i = bisect.bisect_left(self._keys, key)
+        return i < len(self._keys) and self._keys[i] == key
+
+
+_mapped_index: Optional[MappedDNCIndex] = None
+_mapped_checked_at = 0.0
+
+
+def mapped_dnc_check(phone_number: str) -> Optional[str]:
+    """DialGuard.check(dedupe=False) against TDX_DNC_SORTED_FILE, mapped on first use"""
+    global _mapped_index, _mapped_checked_at
+    path = os.getenv(DNC_SORTED_FILE_ENV)
+    if not path:
+        return None
+    e164 = normalize_e164(phone_number, os.getenv(DEFAULT_COUNTRY_CODE_ENV, DEFAULT_COUNTRY_CODE))
+    if not e164:
+        return BLOCKED_INVALID
+    now = time.monotonic()
+    if _mapped_index is None or now - _mapped_checked_at >= RELOAD_CHECK_S:
+        _mapped_checked_at = now
+        try:
+            if _mapped_index is None or os.stat(path).st_ino != _mapped_index.inode:
+                _mapped_index = MappedDNCIndex(path)
+                logger.info(f"📵 DNC file mapped: {len(_mapped_index)} numbers from {path}")
+        except OSError as e:
+            # Keep the previous mapping if there is one; the dispatchers checked the number too
+            logger.error(f"Could not map the DNC file {path}: {e}")
+    if _mapped_index is not None and e164_key(e164) in _mapped_index:
+        return BLOCKED_DNC
+    return None
+
+
+class DialGuard:
+    """DNC check plus "already dialed within the window" dedupe, consulted before every dial"""
+
+    def __init__(
+        self,
+        dnc_files: Optional[List[str]] = None,
+        *,
+        dialed_log: Optional[str] = None,
+        dedupe_window_h: float = DEFAULT_DEDUPE_WINDOW_H,
+        default_country_code: str = DEFAULT_COUNTRY_CODE,
+    ):
+        self.dnc_files = dnc_files or []
+        self.dialed_log = dialed_log
+        self.dedupe_window_s = dedupe_window_h * 3600
+        self.default_country_code = default_country_code
+
+        self._mtimes = self._file_mtimes()
+        self._index = load_dnc_index(self.dnc_files, default_country_code)
+        self._reloading = False
+        self._checked_at = time.monotonic()
+
+        # Numbers dialed in the window -> wall-clock time of the last dial
+        self._dialed: Dict[int, float] = {}
+        self._log_offset = 0
+        self._read_dialed_log()
+        logger.info(f"📵 DNC index: {len(self._index)} numbers, {len(self._dialed)} dialed in window")
+
+    # --- hot reload ---------------------------------------------------------
+
+    def _file_mtimes(self) -> Dict[str, float]:
+        mtimes = {}
+        for path in self.dnc_files:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = 0.0
+        return mtimes
+
+    def _rebuild(self, mtimes: Dict[str, float]) -> None:
+        try:
+            started = time.perf_counter()
+            index = load_dnc_index(self.dnc_files, self.default_country_code)
+            # Swap in one assignment: lookups keep using the old index until then
+            self._index = index
+            self._mtimes = mtimes
+            logger.info(f"📵 DNC index reloaded: {len(index)} numbers in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"DNC reload failed, keeping the previous index: {e}")
+        finally:
+            self._reloading = False
+
+    def maybe_reload(self) -> None:
+        """Pick up changed DNC files and new dials from other scripts, at most every RELOAD_CHECK_S"""
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_S:
+            return
+        self._checked_at = now
+        self._read_dialed_log()
+        mtimes = self._file_mtimes()
+        if mtimes != self._mtimes and not self._reloading:
+            self._reloading = True
+            # Large lists take seconds to load; build the new index off the caller's thread
+            threading.Thread(target=self._rebuild, args=(mtimes,), daemon=True).start()
+
+    # --- dedupe -------------------------------------------------------------
+
+    def _read_dialed_log(self) -> None:
+        if not self.dialed_log or not os.path.exists(self.dialed_log):
+            return
+        horizon = time.time() - self.dedupe_window_s
+        with open(self.dialed_log, encoding="utf-8") as f:
+            f.seek(self._log_offset)
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and float(parts[0]) >= horizon:
+                    self._dialed[int(parts[1])] = float(parts[0])
+            self._log_offset = f.tell()
+
+    def record_dial(self, phone_number: str) -> None:
+        e164 = normalize_e164(phone_number, self.default_country_code)
+        if not e164:
+            return
+        now = time.time()
+        key = e164_key(e164)
+        self._dialed[key] = now
+        if self.dialed_log:
+            with open(self.dialed_log, "a", encoding="utf-8") as f:
+                f.write(f"{now:.0f} {key}\n")
+                self._log_offset = max(self._log_offset, f.tell())
+
+    # --- lookups ------------------------------------------------------------
+
+    def check(self, phone_number: str, *, dedupe: bool = True) -> Optional[str]:
+        """Reason the number must not be dialed, or None if it can be"""
+        self.maybe_reload()
+        e164 = normalize_e164(phone_number, self.default_country_code)
+        if not e164:
+            return BLOCKED_INVALID
+        key = e164_key(e164)
+        if key in self._index:
+            return BLOCKED_DNC
+        if dedupe:
+            dialed_at = self._dialed.get(key)
+            if dialed_at is not None and time.time() - dialed_at < self.dedupe_window_s:
+                return BLOCKED_DIALED
+        return None
+
+
+def guard_from_env() -> DialGuard:
+    """DialGuard configured from TDX_DNC_FILES / TDX_DIALED_LOG / TDX_DEDUPE_WINDOW_H"""
+    files = [p for p in os.getenv(DNC_FILES_ENV, "").split(os.pathsep) if p]
+    return DialGuard(
+        files,
+        dialed_log=os.getenv(DIALED_LOG_ENV) or None,
+        dedupe_window_h=float(os.getenv(DEDUPE_WINDOW_ENV, DEFAULT_DEDUPE_WINDOW_H)),
+        default_country_code=os.getenv(DEFAULT_COUNTRY_CODE_ENV, DEFAULT_COUNTRY_CODE),
+    )
+
+
+_default_guard: Optional[DialGuard] = None
+
+
+def default_guard() -> DialGuard:
+    """Process-wide guard, loaded on first use"""
+    global _default_guard
+    if _default_guard is None:
+        _default_guard = guard_from_env()
+    return _default_guard
+
+
+# --- memory / throughput report ---------------------------------------------
+
+def _synthetic_keys(entries: int, seed: int) -> Iterable[int]:
+    """Sorted unique US-style numbers, generated without materializing a list"""
+    rng = random.Random(seed)
+    key = 12_000_000_000
+    gap = max(2, 8_000_000_000 // entries)
+    for _ in range(entries):
+        key += rng.randint(1, gap)
+        yield key
+
+
+def _throughput(fn, keys: List[int]) -> float:
+    started = time.perf_counter()
+    for key in keys:
+        fn(key)
+    return len(keys) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de memoria y throughput del índice DNC")
+    parser.add_argument("--entries", type=int, default=10_000_000, help="Números en la lista sintética")
+    parser.add_argument("--lookups", type=int, default=1_000_000, help="Consultas por medición")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--export", metavar="PATH",
+                        help=f"Exporta la lista de {DNC_FILES_ENV} como archivo ordenado para {DNC_SORTED_FILE_ENV}")
+    args = parser.parse_args()
+
+    if args.export:
+        started = time.perf_counter()
+        files = [p for p in os.getenv(DNC_FILES_ENV, "").split(os.pathsep) if p]
+        index = load_dnc_index(files, os.getenv(DEFAULT_COUNTRY_CODE_ENV, DEFAULT_COUNTRY_CODE))
+        write_sorted_file(index, args.export)
+        print(f"📵 {len(index):,} números exportados a {args.export} en {time.perf_counter() - started:.1f}s")
+        return
+
+    print("📵 DNC INDEX - MEMORY / THROUGHPUT")
+    print("=" * 60)
+
+    started = time.perf_counter()
+    index = DNCIndex(_synthetic_keys(args.entries, args.seed))
+    build_s = time.perf_counter() - started
+    memory = index.memory_bytes()
+    total = sum(memory.values())
+    print(f"   entries:        {len(index):,} (built in {build_s:.1f}s)")
+    print(f"   sorted array:   {memory['sorted_array'] / 1e6:8.1f} MB")
+    print(f"   bloom filter:   {memory['bloom_filter'] / 1e6:8.1f} MB")
+    print(f"   total:          {total / 1e6:8.1f} MB ({total / len(index):.1f} B/entry)")
+
+    # A Python set of ints for comparison, measured on a sample and scaled
+    sample = min(args.entries, 1_000_000)
+    tracemalloc.start()
+    as_set = set(_synthetic_keys(sample, args.seed))
+    set_bytes = tracemalloc.get_traced_memory()[0] / sample * args.entries
+    tracemalloc.stop()
+    del as_set
+    print(f"   set[int]:       {set_bytes / 1e6:8.1f} MB (estimated from {sample:,} entries)")
+
+    rng = random.Random(args.seed + 1)
+    hits = [index._numbers[rng.randrange(len(index))] for _ in range(args.lookups // 10)]
+    misses = [rng.randrange(12_000_000_000, 20_000_000_000) for _ in range(args.lookups)]
+    strings = [f"+{k}" for k in misses[: args.lookups // 10]]
+    guard = DialGuard()
+    guard._index = index
+
+    print(f"   miss, bloom:    {_throughput(index.__contains__, misses) / 1e6:8.2f} M lookups/s")
+    print(f"   miss, no bloom: {_throughput(index.contains_sorted_only, misses) / 1e6:8.2f} M lookups/s")
+    print(f"   hit:            {_throughput(index.__contains__, hits) / 1e6:8.2f} M lookups/s")
+    print(f"   guard.check():  {_throughput(guard.check, strings) / 1e6:8.2f} M lookups/s (incl. normalization)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Shared LiveKit API client for the ops scripts
+
+livekit_api() opens one LiveKitAPI (one aiohttp connection pool) configured
+from .env.local and always closes it on exit. fan_out() runs independent
+queries in parallel, each with its own timeout, and returns every result or
+error instead of failing on the first one.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+from livekit import api
+
+load_dotenv(dotenv_path=".env.local")
+
+DEFAULT_TIMEOUT_S = 10.0
+
+
+@asynccontextmanager
+async def livekit_api(timeout_s: float = DEFAULT_TIMEOUT_S) -> AsyncIterator[api.LiveKitAPI]:
+    """LiveKitAPI client from LIVEKIT_URL / LIVEKIT_API_KEY / LIVEKIT_API_SECRET, closed on exit"""
+    lk_api = api.LiveKitAPI(
+        url=os.getenv("LIVEKIT_URL"),
+        api_key=os.getenv("LIVEKIT_API_KEY"),
+        api_secret=os.getenv("LIVEKIT_API_SECRET"),
+        timeout=aiohttp.ClientTimeout(total=timeout_s),
+    )
+    try:
+        yield lk_api
+    finally:
+        await lk_api.aclose()
+
+
+class QueryResult:
+    """Outcome of one fanned-out query"""
+
+    __slots__ = ("value", "error", "elapsed_s")
+
+    def __init__(self, value: Any = None, error: Optional[str] = None, elapsed_s: float = 0.0):
+        self.value = value
+        self.error = error
+        self.elapsed_s = elapsed_s
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def _timed(coro: Awaitable[Any], timeout_s: float) -> QueryResult:
+    started = time.perf_counter()
+    try:
+        value = await asyncio.wait_for(coro, timeout=timeout_s)
+        return QueryResult(value=value, elapsed_s=time.perf_counter() - started)
+    except asyncio.TimeoutError:
+        return QueryResult(error=f"timeout after {timeout_s:.0f}s", elapsed_s=time.perf_counter() - started)
+    except Exception as e:
+        return QueryResult(error=str(e) or type(e).__name__, elapsed_s=time.perf_counter() - started)
+
+
+async def fan_out(queries: Dict[str, Awaitable[Any]], timeout_s: float = DEFAULT_TIMEOUT_S) -> Dict[str, QueryResult]:
+    """Run independent queries concurrently; one failing or timing out doesn't affect the others"""
+    names = list(queries)
+    results = await asyncio.gather(*(_timed(queries[name], timeout_s) for name in names))
+    return dict(zip(names, results))
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga: llamadas simultáneas contra un LiveKit local
+
+Levanta N "prospectos" sintéticos, cada uno en su propio room, que publican
+audio pregrabado en español y conversan con tdx-sdr-bot (despachado a cada
+room como llamada inbound, así que no se marca ningún teléfono). N sube por
+escalones (--ramp) y en cada escalón se reporta:
+
+    CPU y RSS del worker (árbol de procesos de agent.py, vía psutil)
+    lag del event loop de los jobs y latencia de turno del lado del agente
+      (heartbeats de worker_metrics, recibidos por este script)
+    latencia de respuesta del lado del prospecto: fin de su frase -> primer
+      audio del agente
+
+Con --pipeline both la rampa se corre dos veces, con el modelo realtime y con
+el pipeline en cascada STT -> LLM -> TTS (TDX_PIPELINE=cascade), y al final se
+comparan las latencias de ambos caminos por escalón.
+
+Requiere un servidor local (livekit-server --dev: ws://localhost:7880,
+devkey/secret) y OPENAI_API_KEY para el modelo realtime. Los WAV deben ser
+mono de 16 bits, todos con la misma frecuencia; sin --audio se usa una señal
+sintética tipo voz que solo sirve para probar la plomería.
+
+Uso:
+    python loadtest.py --spawn-worker --audio "loadtest_audio/*.wav" --ramp 1,2,4,8 --step 60
+    python loadtest.py --worker-pid 4242 --ramp 2,4,6,8,10 --slo-ms 1500 --json
+    python loadtest.py --spawn-worker --audio "loadtest_audio/*.wav" --ramp 1,4,8 --pipeline both
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import uuid
+import wave
+from array import array
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import psutil
+from aiohttp import web
+from livekit import api, rtc
+
+from cascade_pipeline import PIPELINE_CASCADE, PIPELINE_ENV, PIPELINE_REALTIME
+from ops_dashboard import percentile
+from worker_metrics import EVENT_TURN, METRICS_URL_ENV
+
+AGENT_NAME = "tdx-sdr-bot"
+DEFAULT_URL = "ws://localhost:7880"
+DEFAULT_API_KEY = "devkey"
+DEFAULT_API_SECRET = "secret"
+DEFAULT_METRICS_PORT = 8092
+
+FRAME_MS = 10
+# The caller answers once the agent has been quiet this long
+AGENT_QUIET_S = 1.0
+RESPONSE_TIMEOUT_S = 15.0
+# Agent audio louder than this RMS (int16) counts as speech
+SPEECH_RMS = 500.0
+CALLER_START_STAGGER_S = 0.2
+
+
+def load_utterances(pattern: Optional[str]) -> Tuple[int, List[array]]:
+    """(sample_rate, utterances) from mono 16-bit WAVs, or a synthetic voice-like burst"""
+    paths = sorted(glob.glob(pattern)) if pattern else []
+    if not paths:
+        rate = 16000
+        samples = array("h")
+        for i in range(int(rate * 1.6)):
+            t = i / rate
+            envelope = 0.5 * (1 - math.cos(2 * math.pi * 4 * t))  # ~4 syllables/s
+            tone = sum(math.sin(2 * math.pi * 140 * k * t) / k for k in range(1, 6))
+            samples.append(int(6000 * envelope * tone))
+        return rate, [samples]
+
+    rate = None
+    utterances = []
+    for path in paths:
+        with wave.open(path, "rb") as w:
+            if w.getnchannels() != 1 or w.getsampwidth() != 2:
+                raise ValueError(f"{path}: se requiere WAV mono de 16 bits")
+            if rate is None:
+                rate = w.getframerate()
+            elif w.getframerate() != rate:
+                raise ValueError(f"{path}: {w.getframerate()} Hz, los demás son {rate} Hz")
+            samples = array("h")
+            samples.frombytes(w.readframes(w.getnframes()))
+            utterances.append(samples)
+    return rate, utterances
+
+
+def rms(samples: memoryview) -> float:
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class SyntheticCaller:
+    """One prospect: own room, agent dispatched, speaks a line every time the agent goes quiet"""
+
+    def __init__(self, index: int, run_id: str, args: argparse.Namespace, sample_rate: int, utterances: List[array]):
+        self.index = index
+        self.room_name = f"load-{run_id}-{index:03d}"
+        self.identity = f"caller-{index:03d}"
+        self.args = args
+        self.sample_rate = sample_rate
+        self.utterances = utterances
+        self.room = rtc.Room()
+        self.source = rtc.AudioSource(sample_rate, 1, queue_size_ms=100)
+        self.latencies: Deque[Tuple[float, float]] = deque(maxlen=10000)
+        self.timeouts = 0
+        self._agent_voice_at = 0.0
+        self._agent_started_at = 0.0
+        self._agent_spoke = False
+        self._tasks: List[asyncio.Task] = []
+
+    def _token(self) -> str:
+        return (
+            api.AccessToken(self.args.api_key, self.args.api_secret)
+            .with_identity(self.identity)
+            .with_grants(api.VideoGrants(room_join=True, room=self.room_name))
+            .to_jwt()
+        )
+
+    async def start(self, lk_api: api.LiveKitAPI) -> None:
+        metadata = {
+            "call_direction": "inbound",
+            "prospect_info": {"company_name": f"Carga {self.index}", "contact_name": "Prueba"},
+        }
+        await lk_api.room.create_room(api.CreateRoomRequest(name=self.room_name))
+        await lk_api.agent_dispatch.create_dispatch(
+            api.CreateAgentDispatchRequest(agent_name=AGENT_NAME, room=self.room_name, metadata=json.dumps(metadata))
+        )
+
+        @self.room.on("track_subscribed")
+        def _on_track(track: rtc.Track, publication, participant: rtc.RemoteParticipant):
+            if track.kind == rtc.TrackKind.KIND_AUDIO:
+                self._tasks.append(asyncio.create_task(self._listen(track)))
+
+        await self.room.connect(self.args.url, self._token())
+        track = rtc.LocalAudioTrack.create_audio_track("microphone", self.source)
+        await self.room.local_participant.publish_track(
+            track, rtc.TrackPublishOptions(source=rtc.TrackSource.SOURCE_MICROPHONE)
+        )
+        self._tasks.append(asyncio.create_task(self._talk()))
+
+    async def _listen(self, track: rtc.Track) -> None:
+        async for event in rtc.AudioStream(track, sample_rate=self.sample_rate, num_channels=1):
+            if rms(event.frame.data) >= SPEECH_RMS:
+                self._agent_voice_at = time.monotonic()
+                if not self._agent_spoke:
+                    self._agent_started_at = self._agent_voice_at
+                    self._agent_spoke = True
+
+    async def _send(self, samples: memoryview) -> None:
+        """Real-time paced 10 ms frames; capture_frame blocks once the small queue is full"""
+        step = self.sample_rate * FRAME_MS // 1000
+        for offset in range(0, len(samples) - step + 1, step):
+            chunk = samples[offset:offset + step]
+            await self.source.capture_frame(rtc.AudioFrame(chunk.tobytes(), self.sample_rate, 1, step))
+
+    async def _talk(self) -> None:
+        silence = memoryview(array("h", bytes(2 * self.sample_rate * FRAME_MS // 1000)))
+        turn = 0
+        while True:
+            # Line silence until the agent has spoken and gone quiet (greeting or answer)
+            while not self._agent_spoke or time.monotonic() - self._agent_voice_at < AGENT_QUIET_S:
+                await self._send(silence)
+            await self._send(memoryview(self.utterances[turn % len(self.utterances)]))
+            # Only agent audio that starts after the line counts as the answer
+            self._agent_spoke = False
+            ended_at = time.monotonic()
+            turn += 1
+            while not self._agent_spoke:
+                if time.monotonic() - ended_at > RESPONSE_TIMEOUT_S:
+                    self.timeouts += 1
+                    # Prompt again as if the agent had answered
+                    self._agent_spoke = True
+                    self._agent_voice_at = 0.0
+                    break
+                await self._send(silence)
+            else:
+                self.latencies.append((time.time(), self._agent_started_at - ended_at))
+
+    async def stop(self, lk_api: api.LiveKitAPI) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.room.disconnect()
+        try:
+            await lk_api.room.delete_room(api.DeleteRoomRequest(room=self.room_name))
+        except Exception:
+            pass
+
+
+class MetricsCollector:
+    """Receives the worker's metric batches (TDX_METRICS_URL) and slices them by time"""
+
+    def __init__(self):
+        self.batches: Deque[Tuple[float, Dict[str, Any]]] = deque(maxlen=200000)
+
+    def app(self) -> web.Application:
+        async def metrics(request: web.Request) -> web.Response:
+            self.batches.append((time.time(), await request.json()))
+            return web.Response(status=204)
+
+        app = web.Application()
+        app.router.add_post("/metrics", metrics)
+        return app
+
+    def window(self, start: float, end: float) -> Dict[str, List[float]]:
+        turns, lag, rss = [], [], {}
+        for received_at, batch in self.batches:
+            if not start <= received_at < end:
+                continue
+            load = batch.get("load", {})
+            lag.append(float(load.get("loop_lag_ms", 0.0)))
+            rss[batch.get("call")] = float(load.get("rss_mb", 0.0))
+            turns.extend(e["latency_s"] for e in batch.get("events", []) if e.get("type") == EVENT_TURN)
+        return {"turns": turns, "loop_lag_ms": lag, "job_rss_mb": list(rss.values())}
+
+
+class ProcessTreeSampler:
+    """CPU (percent of one core) and RSS of the worker and its job processes, sampled every second"""
+
+    def __init__(self, pid: int):
+        self.root = psutil.Process(pid)
+        self._cpu: Dict[int, float] = {}
+        self.cpu_s = 0.0
+        self.peak_rss_mb = 0.0
+
+    def sample(self) -> None:
+        rss = 0
+        for proc in [self.root] + self.root.children(recursive=True):
+            try:
+                times = proc.cpu_times()
+                rss += proc.memory_info().rss
+            except psutil.Error:
+                continue
+            total = times.user + times.system
+            self.cpu_s += total - self._cpu.get(proc.pid, total)
+            self._cpu[proc.pid] = total
+        self.peak_rss_mb = max(self.peak_rss_mb, rss / (1024 * 1024))
+
+    def reset(self) -> None:
+        self.cpu_s = 0.0
+        self.peak_rss_mb = 0.0
+
+
+def summary_ms(values: List[float], scale: float = 1000.0) -> Dict[str, Optional[float]]:
+    ordered = sorted(values)
+    p50, p95 = percentile(ordered, 50), percentile(ordered, 95)
+    return {
+        "count": len(ordered),
+        "p50": round(p50 * scale) if p50 is not None else None,
+        "p95": round(p95 * scale) if p95 is not None else None,
+    }
+
+
+async def run(args: argparse.Namespace, pipeline: str) -> List[Dict[str, Any]]:
+    sample_rate, utterances = load_utterances(args.audio)
+    run_id = uuid.uuid4().hex[:6]
+    http_url = args.url.replace("ws://", "http://").replace("wss://", "https://")
+
+    collector = MetricsCollector()
+    runner = web.AppRunner(collector.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.metrics_port).start()
+
+    worker: Optional[subprocess.Popen] = None
+    pid = args.worker_pid
+    if args.spawn_worker:
+        env = {
+            **os.environ,
+            "LIVEKIT_URL": args.url,
+            "LIVEKIT_API_KEY": args.api_key,
+            "LIVEKIT_API_SECRET": args.api_secret,
+            METRICS_URL_ENV: f"http://127.0.0.1:{args.metrics_port}/metrics",
+            "TDX_WORKER_ID": f"loadtest-{run_id}",
+            PIPELINE_ENV: pipeline,
+        }
+        worker = subprocess.Popen([sys.executable, "agent.py", "start"], env=env)
+        pid = worker.pid
+        print(f"🚀 Worker lanzado (pid {pid}), esperando {args.worker_warmup:.0f}s a que se registre...")
+        await asyncio.sleep(args.worker_warmup)
+    sampler = ProcessTreeSampler(pid) if pid else None
+
+    lk_api = api.LiveKitAPI(url=http_url, api_key=args.api_key, api_secret=args.api_secret)
+    callers: List[SyntheticCaller] = []
+    rows: List[Dict[str, Any]] = []
+    try:
+        for target in args.ramp:
+            while len(callers) < target:
+                caller = SyntheticCaller(len(callers), run_id, args, sample_rate, utterances)
+                await caller.start(lk_api)
+                callers.append(caller)
+                await asyncio.sleep(CALLER_START_STAGGER_S)
+
+            print(f"\n📈 {target} llamadas simultáneas durante {args.step:.0f}s...")
+            # Skip the first part of the step: greetings and connection setup
+            await asyncio.sleep(args.settle)
+            step_start = time.time()
+            if sampler:
+                sampler.sample()
+                sampler.reset()
+            while time.time() - step_start < args.step:
+                await asyncio.sleep(1.0)
+                if sampler:
+                    sampler.sample()
+            step_end = time.time()
+
+            worker_side = collector.window(step_start, step_end)
+            caller_side = [v for c in callers for at, v in c.latencies if step_start <= at < step_end]
+            row = {
+                "pipeline": pipeline,
+                "calls": target,
+                "worker_cpu_pct": round(100 * sampler.cpu_s / (step_end - step_start), 1) if sampler else None,
+                "worker_rss_mb": round(sampler.peak_rss_mb) if sampler else round(sum(worker_side["job_rss_mb"])),
+                "loop_lag_ms": summary_ms(worker_side["loop_lag_ms"], scale=1.0),
+                "turn_latency_ms": summary_ms(worker_side["turns"]),
+                "response_latency_ms": summary_ms(caller_side),
+                "timeouts": sum(c.timeouts for c in callers),
+            }
+            rows.append(row)
+            print_row(row)
+            p95 = row["response_latency_ms"]["p95"]
+            if args.slo_ms and p95 is not None and p95 > args.slo_ms:
+                print(f"🛑 p95 {p95}ms > SLO {args.slo_ms:.0f}ms con {target} llamadas, deteniendo la rampa")
+                break
+    finally:
+        await asyncio.gather(*(c.stop(lk_api) for c in callers), return_exceptions=True)
+        await lk_api.aclose()
+        await runner.cleanup()
+        if worker is not None:
+            worker.terminate()
+            try:
+                worker.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+    return rows
+
+
+def print_row(row: Dict[str, Any]) -> None:
+    def ms(summary: Dict[str, Any]) -> str:
+        return f"p50 {summary['p50']}ms / p95 {summary['p95']}ms ({summary['count']})" if summary["count"] else "-"
+
+    cpu = f"{row['worker_cpu_pct']}%" if row["worker_cpu_pct"] is not None else "-"
+    print(f"   🖥️  CPU worker: {cpu}   RSS: {row['worker_rss_mb']} MB   timeouts: {row['timeouts']}")
+    print(f"   ⏱️  Lag event loop: {ms(row['loop_lag_ms'])}")
+    print(f"   🤖 Latencia turno (agente): {ms(row['turn_latency_ms'])}")
+    print(f"   📞 Latencia respuesta (prospecto): {ms(row['response_latency_ms'])}")
+
+
+def print_comparison(rows: List[Dict[str, Any]]) -> None:
+    """Caller-side response latency of both pipelines, step by step"""
+    by_calls: Dict[int, Dict[str, Dict[str, Any]]] = {}
+    for row in rows:
+        by_calls.setdefault(row["calls"], {})[row["pipeline"]] = row["response_latency_ms"]
+    print(f"\n⚖️  Latencia de respuesta (prospecto): {PIPELINE_REALTIME} vs {PIPELINE_CASCADE}")
+    for calls, latency in sorted(by_calls.items()):
+        cells = [
+            f"p50 {s['p50']}ms / p95 {s['p95']}ms" if s and s["count"] else "-"
+            for s in (latency.get(PIPELINE_REALTIME), latency.get(PIPELINE_CASCADE))
+        ]
+        print(f"   {calls:>3} llamadas   {cells[0]:<26} {cells[1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de llamadas simultáneas contra LiveKit local")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--api-key", default=DEFAULT_API_KEY)
+    parser.add_argument("--api-secret", default=DEFAULT_API_SECRET)
+    parser.add_argument("--audio", help='WAVs del prospecto, ej: "loadtest_audio/*.wav"')
+    parser.add_argument("--ramp", type=lambda s: [int(n) for n in s.split(",")], default=[1, 2, 4, 8],
+                        help="Llamadas simultáneas por escalón, ej: 1,2,4,8")
+    parser.add_argument("--step", type=float, default=60, help="Segundos medidos por escalón")
+    parser.add_argument("--settle", type=float, default=10, help="Segundos sin medir al subir de escalón")
+    parser.add_argument("--slo-ms", type=float, help="Detener la rampa si la latencia p95 de respuesta lo supera")
+    parser.add_argument("--spawn-worker", action="store_true", help="Lanzar agent.py start contra el servidor local")
+    parser.add_argument("--worker-warmup", type=float, default=15)
+    parser.add_argument("--worker-pid", type=int, help="PID de un worker ya corriendo (para CPU/RSS)")
+    parser.add_argument("--metrics-port", type=int, default=DEFAULT_METRICS_PORT,
+                        help=f"Puerto donde el worker envía {METRICS_URL_ENV}")
+    parser.add_argument("--json", action="store_true", help="Imprimir el reporte final en JSON")
+    parser.add_argument("--pipeline", choices=[PIPELINE_REALTIME, PIPELINE_CASCADE, "both"], default=PIPELINE_REALTIME,
+                        help="Camino de voz del worker lanzado (TDX_PIPELINE); both compara los dos")
+    args = parser.parse_args()
+    if args.pipeline != PIPELINE_REALTIME and not args.spawn_worker:
+        parser.error("--pipeline solo aplica con --spawn-worker (el worker lee TDX_PIPELINE al arrancar)")
+
+    print(f"🔥 PRUEBA DE CARGA - {AGENT_NAME} @ {args.url}")
+    pipelines = [PIPELINE_REALTIME, PIPELINE_CASCADE] if args.pipeline == "both" else [args.pipeline]
+    rows = []
+    for pipeline in pipelines:
+        print(f"\n🧪 Pipeline: {pipeline}")
+        rows += asyncio.run(run(args, pipeline))
+    if len(pipelines) > 1:
+        print_comparison(rows)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ import json
 import os
 from dotenv import load_dotenv
 from livekit import api
+from dnc_index import default_guard
 from agent import entrypoint, JobContext
 
 load_dotenv(dotenv_path=".env.local")
@@ -34,6 +35,12 @@ async def manual_outbound_call():
         "call_direction": "outbound"
     }
     
+    guard = default_guard()
+    reason = guard.check(metadata['dial_info']['phone_number'])
+    if reason:
+        print(f"🚫 {metadata['dial_info']['phone_number']} bloqueado: {reason}")
+        return None
+    
     try:
         # 1. Crear room
         import time
@@ -59,6 +66,8 @@ async def manual_outbound_call():
                 participant_identity=f"sip_{metadata['dial_info']['phone_number'].replace('+', '')}"
             )
         )
+        # Only a call that actually went out counts for the dedupe window
+        guard.record_dial(metadata['dial_info']['phone_number'])
         print(f"✅ SIP participant creado: {sip_participant.participant_identity}")
         
         # 3. Simular JobContext y ejecutar entrypoint manualmente
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Memory profiling for TDX SDR Bot job processes
+
+Enable it on the worker with TDX_MEMORY_PROFILE=1: every call then logs a
+tracemalloc snapshot and the process RSS at each call phase, plus the top
+allocation sites between the first and the last phase.
+
+Run it directly to get the MB per concurrent call report:
+    python memory_profiler.py --calls 50
+"""
+import argparse
+import gc
+import logging
+import math
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("memory_profiler")
+
+MEMORY_PROFILE_ENABLED = os.getenv("TDX_MEMORY_PROFILE", "0") == "1"
+
+# How many allocation sites to log in the per-call report
+TOP_ALLOCATIONS = 10
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    # Fallback for non-Linux hosts: peak RSS (KB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class CallMemoryProfiler:
+    """Takes tracemalloc snapshots and RSS readings per call phase"""
+
+    __slots__ = ("call_id", "enabled", "phases", "_first_snapshot", "_last_snapshot")
+
+    def __init__(self, call_id: str, enabled: bool = MEMORY_PROFILE_ENABLED):
+        self.call_id = call_id
+        self.enabled = enabled
+        self.phases: List[Dict[str, Any]] = []
+        self._first_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+
+    def snapshot(self, phase: str) -> None:
+        """Record memory usage at the given call phase"""
+        if not self.enabled:
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        snap = tracemalloc.take_snapshot()
+        if self._first_snapshot is None:
+            self._first_snapshot = snap
+        self._last_snapshot = snap
+
+        self.phases.append({
+            "phase": phase,
+            "at": time.time(),
+            "traced_mb": current / (1024 * 1024),
+            "traced_peak_mb": peak / (1024 * 1024),
+            "rss_mb": rss_mb(),
+        })
+        logger.info(
+            f"🧠 [{self.call_id}] {phase}: traced={current / (1024 * 1024):.1f} MB "
+            f"peak={peak / (1024 * 1024):.1f} MB rss={self.phases[-1]['rss_mb']:.1f} MB"
+        )
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Log the per-phase table and the top allocation sites for this call"""
+        if not self.enabled or not self.phases:
+            return self.phases
+
+        base_rss = self.phases[0]["rss_mb"]
+        for p in self.phases:
+            logger.info(
+                f"🧠 [{self.call_id}] {p['phase']:<20} rss={p['rss_mb']:.1f} MB "
+                f"(+{p['rss_mb'] - base_rss:.1f} MB) traced={p['traced_mb']:.1f} MB"
+            )
+
+        if self._first_snapshot is not None and self._last_snapshot is not self._first_snapshot:
+            stats = self._last_snapshot.compare_to(self._first_snapshot, "lineno")
+            for stat in stats[:TOP_ALLOCATIONS]:
+                logger.info(f"🧠 [{self.call_id}] {stat}")
+
+        # Snapshots are large, drop them once reported
+        self._first_snapshot = None
+        self._last_snapshot = None
+        return self.phases
+
+
+def measure_per_call_state(calls: int) -> Dict[str, float]:
+    """Build the per-call agent objects for N concurrent calls and measure their footprint"""
+    from agent import TDXSDRBot
+
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    rss_before = rss_mb()
+
+    agents = []
+    for i in range(calls):
+        agents.append(TDXSDRBot(
+            company_name=f"Empresa {i}",
+            contact_name=f"Contacto {i}",
+            prospect_info={"company_name": f"Empresa {i}", "contact_name": f"Contacto {i}"},
+            dial_info={"phone_number": f"+5731000{i:05d}", "transfer_to": "+18632190153"},
+            call_direction="outbound",
+        ))
+
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "calls": calls,
+        "traced_mb_total": (current - baseline) / (1024 * 1024),
+        "traced_mb_per_call": (current - baseline) / (1024 * 1024) / calls,
+        "rss_mb_delta": rss_mb() - rss_before,
+        "rss_mb_process": rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MB per concurrent call report")
+    parser.add_argument("--calls", type=int, default=50, help="Number of concurrent calls to simulate")
+    args = parser.parse_args()
+
+    print("🧠 MEMORY REPORT - TDX SDR BOT")
+    print("=" * 50)
+
+    result = measure_per_call_state(args.calls)
+    # Every call runs in its own job process, so a call costs a whole interpreter
+    # with agent.py imported plus its own per-call state
+    process_mb = result["rss_mb_process"] - result["rss_mb_delta"]
+    per_call_mb = process_mb + result["traced_mb_per_call"]
+
+    print(f"   RSS de un proceso de job (agent.py importado): {process_mb:.1f} MB")
+    print(f"   Estado por llamada: {result['traced_mb_per_call'] * 1024:.1f} KB ({result['calls']} llamadas simuladas)")
+    print(f"   MB por llamada concurrente: {per_call_mb:.1f} MB")
+
+    # Idle prewarmed processes are paid for even with zero calls; LiveKit's
+    # production default keeps one per CPU it detects
+    from livekit.agents.utils.hw import get_cpu_monitor
+    idle_before = math.ceil(get_cpu_monitor().cpu_count())
+    idle_after = int(os.getenv("TDX_NUM_IDLE_PROCESSES", "1"))
+    print(f"\n   Procesos idle antes (1 por CPU): {idle_before} -> {idle_before * process_mb:.0f} MB")
+    print(f"   Procesos idle ahora (TDX_NUM_IDLE_PROCESSES): {idle_after} -> {idle_after * process_mb:.0f} MB")
+    for calls in (1, 2, 4):
+        before = (calls + idle_before) * process_mb
+        after = (calls + idle_after) * process_mb
+        print(f"   {calls} llamada(s): {before:.0f} MB antes, {after:.0f} MB ahora ({before / calls:.0f} -> {after / calls:.0f} MB por llamada)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,37 +3,50 @@ Microsoft Graph API client for calendar integration
 """
 import os
 import logging
+import importlib.util
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 import asyncio
 
-try:
-    from msgraph import GraphServiceClient
-    from azure.identity import ClientSecretCredential
-    GRAPH_AVAILABLE = True
-    logging.info("✅ Microsoft Graph SDK imported successfully")
-except ImportError as e:
-    GRAPH_AVAILABLE = False
-    logging.error(f"❌ Microsoft Graph SDK import failed: {e}")
+# The SDK is heavy (several seconds of imports), so only check it is installed
+# here and import it the first time the client is actually needed
+GRAPH_AVAILABLE = (
+    importlib.util.find_spec("msgraph") is not None
+    and importlib.util.find_spec("azure.identity") is not None
+)
+if not GRAPH_AVAILABLE:
+    logging.error("❌ Microsoft Graph SDK not installed")
     logging.error("Install with: pip install msgraph-sdk==1.5.4 azure-identity==1.19.0")
 
 logger = logging.getLogger("microsoft_graph_client")
 
+GRAPH_SCOPE = 'https://graph.microsoft.com/.default'
+
 class MicrosoftGraphClient:
     """Microsoft Graph API client for calendar operations"""
     
     def __init__(self):
         self.client = None
+        self.credential = None
         self.user_id = "me"  # Use authenticated user's calendar
-        
-        if GRAPH_AVAILABLE:
-            self._initialize_client()
-        else:
-            logger.warning("Microsoft Graph SDK not installed. Using mock implementation.")
+        self._initialized = False
+    
+    def _ensure_client(self):
+        """Build the Graph client on first use so importing this module stays cheap"""
+        if not self._initialized:
+            self._initialized = True
+            if GRAPH_AVAILABLE:
+                self._initialize_client()
+            else:
+                logger.warning("Microsoft Graph SDK not installed. Using mock implementation.")
+        return self.client
     
     def _initialize_client(self):
         """Initialize Microsoft Graph client with environment credentials"""
         try:
+            from msgraph import GraphServiceClient
+            from azure.identity import ClientSecretCredential
+            
             client_id = os.getenv("MICROSOFT_GRAPH_CLIENT_ID")
             client_secret = os.getenv("MICROSOFT_GRAPH_CLIENT_SECRET") 
             tenant_id = os.getenv("MICROSOFT_GRAPH_TENANT_ID")
@@ -61,8 +74,9 @@ class MicrosoftGraphClient:
             # Create Graph client
             self.client = GraphServiceClient(
                 credentials=credential,
-                scopes=['https://graph.microsoft.com/.default']
+                scopes=[GRAPH_SCOPE]
             )
+            self.credential = credential
             
             logger.info("✅ Microsoft Graph client initialized successfully with REAL credentials")
             
@@ -70,10 +84,28 @@ class MicrosoftGraphClient:
             logger.error(f"Failed to initialize Microsoft Graph client: {e}")
             self.client = None
     
+    def warm_up(self) -> bool:
+        """Acquire an access token ahead of the first call so the credential's token cache is hot"""
+        if not self._ensure_client():
+            return False
+        
+        try:
+            # Import the request builder and models used per call so the first call doesn't pay for them
+            from msgraph.generated.users.item.calendar.events.events_request_builder import EventsRequestBuilder  # noqa: F401
+            from msgraph.generated.models.event import Event  # noqa: F401
+            from msgraph.generated.models.attendee import Attendee  # noqa: F401
+            
+            self.credential.get_token(GRAPH_SCOPE)
+            logger.info("✅ Microsoft Graph token acquired during prewarm")
+            return True
+        except Exception as e:
+            logger.warning(f"Could not prewarm Microsoft Graph token: {e}")
+            return False
+    
     async def check_availability(self, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
         """Check calendar availability and return available slots"""
         
-        if not self.client:
+        if not self._ensure_client():
             # Return mock availability if Graph client not available
             return self._get_mock_availability()
         
@@ -166,7 +198,7 @@ class MicrosoftGraphClient:
                            contact_name: str, company_name: str, meeting_type: str = "discovery_call") -> Dict[str, Any]:
         """Create a Teams meeting with the specified details using REAL Microsoft Graph API"""
         
-        if not self.client:
+        if not self._ensure_client():
             logger.warning("Microsoft Graph client not available - using mock data")
             return self._create_mock_meeting(attendee_email, meeting_date, meeting_time, contact_name)
         
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+CLI de operaciones para TDX SDR Bot
+
+Reúne los diagnósticos de check_room.py, quick_check.py,
+check_worker_status.py, simple_debug.py y trigger_job.py en un solo comando. Usa un único
+cliente de LiveKit que se cierra al salir, lanza en paralelo las consultas
+independientes (rooms, participantes, trunks SIP, dispatch rules) con
+timeout, y con --json imprime el resultado para scripts.
+
+Uso:
+    python ops_cli.py status              # rooms + participantes + SIP
+    python ops_cli.py rooms [--room NAME] # rooms y detalle de participantes
+    python ops_cli.py sip                 # trunks y dispatch rules
+    python ops_cli.py worker-check        # ¿el worker toma un dispatch?
+    python ops_cli.py dispatch --room call-573153041548 --phone +573153041548
+    python ops_cli.py dial-test --phone +573153041548   # SIP directo, sin agente
+    python ops_cli.py --json status | jq '.rooms[].name'
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import string
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from google.protobuf.json_format import MessageToDict
+from livekit import api
+
+from dnc_index import default_guard
+from livekit_client import DEFAULT_TIMEOUT_S, QueryResult, fan_out, livekit_api
+
+AGENT_NAME = "tdx-sdr-bot"  # Debe coincidir con agent_name en agent.py
+DEFAULT_TRANSFER_TO = "+18632190153"
+WORKER_CHECK_WAIT_S = 5.0
+
+
+def to_dict(message) -> Dict[str, Any]:
+    return MessageToDict(message, preserving_proto_field_name=True)
+
+
+def participant_summary(p: api.ParticipantInfo) -> Dict[str, Any]:
+    return {
+        "identity": p.identity,
+        "kind": api.ParticipantInfo.Kind.Name(p.kind),
+        "state": api.ParticipantInfo.State.Name(p.state),
+        "joined_at": p.joined_at,
+        "tracks": len(p.tracks),
+        "attributes": dict(p.attributes),
+    }
+
+
+def errors_of(results: Dict[str, QueryResult]) -> Dict[str, str]:
+    return {name: r.error for name, r in results.items() if not r.ok}
+
+
+def sip_participants_of(rooms: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """SIP participants across rooms; the SIP service has no list call of its own"""
+    return [{"room": r["name"], **p} for r in rooms for p in r["participants"] if p["kind"] == "SIP"]
+
+
+# --- queries ---------------------------------------------------------------
+
+async def collect_rooms(lk_api: api.LiveKitAPI, timeout_s: float, room: Optional[str] = None) -> Dict[str, Any]:
+    """Rooms, then the participants of every non-empty room in parallel"""
+    request = api.ListRoomsRequest(names=[room]) if room else api.ListRoomsRequest()
+    listed = await fan_out({"rooms": lk_api.room.list_rooms(request)}, timeout_s)
+    if not listed["rooms"].ok:
+        return {"rooms": [], "errors": errors_of(listed)}
+
+    rooms = listed["rooms"].value.rooms
+    participants = await fan_out(
+        {
+            r.name: lk_api.room.list_participants(api.ListParticipantsRequest(room=r.name))
+            for r in rooms
+            if r.num_participants > 0
+        },
+        timeout_s,
+    )
+
+    result = []
+    for r in rooms:
+        entry = {
+            "name": r.name,
+            "num_participants": r.num_participants,
+            "creation_time": r.creation_time,
+            "metadata": r.metadata,
+            "participants": [],
+        }
+        query = participants.get(r.name)
+        if query and query.ok:
+            entry["participants"] = [participant_summary(p) for p in query.value.participants]
+        result.append(entry)
+    return {"rooms": result, "errors": errors_of(participants)}
+
+
+async def collect_sip(lk_api: api.LiveKitAPI, timeout_s: float) -> Dict[str, Any]:
+    results = await fan_out(
+        {
+            "outbound_trunks": lk_api.sip.list_outbound_trunk(api.ListSIPOutboundTrunkRequest()),
+            "inbound_trunks": lk_api.sip.list_inbound_trunk(api.ListSIPInboundTrunkRequest()),
+            "dispatch_rules": lk_api.sip.list_dispatch_rule(api.ListSIPDispatchRuleRequest()),
+        },
+        timeout_s,
+    )
+    sip: Dict[str, Any] = {"configured_outbound_trunk": os.getenv("SIP_OUTBOUND_TRUNK_ID")}
+    for name, r in results.items():
+        sip[name] = [to_dict(item) for item in r.value.items] if r.ok else []
+    sip["errors"] = errors_of(results)
+    return sip
+
+
+async def cmd_status(lk_api: api.LiveKitAPI, args: argparse.Namespace) -> Dict[str, Any]:
+    rooms, sip = await asyncio.gather(collect_rooms(lk_api, args.timeout), collect_sip(lk_api, args.timeout))
+    return {
+        "livekit_url": os.getenv("LIVEKIT_URL"),
+        "rooms": rooms["rooms"],
+        "sip_participants": sip_participants_of(rooms["rooms"]),
+        "sip": sip,
+        "errors": {**rooms["errors"], **sip["errors"]},
+    }
+
+
+async def cmd_rooms(lk_api: api.LiveKitAPI, args: argparse.Namespace) -> Dict[str, Any]:
+    return await collect_rooms(lk_api, args.timeout, args.room)
+
+
+async def cmd_sip(lk_api: api.LiveKitAPI, args: argparse.Namespace) -> Dict[str, Any]:
+    return await collect_sip(lk_api, args.timeout)
+
+
+async def cmd_worker_check(lk_api: api.LiveKitAPI, args: argparse.Namespace) -> Dict[str, Any]:
+    """Create a throwaway room with a dispatch and see whether a worker joins it"""
+    suffix = "".join(random.choices(string.ascii_lowercase + string.digits, k=6))
+    room_name = f"test-worker-response-{suffix}"
+    await lk_api.room.create_room(api.CreateRoomRequest(name=room_name))
+    try:
+        # Metadata without a phone number: the agent takes the inbound path and dials nobody
+        await lk_api.agent_dispatch.create_dispatch(
+            api.CreateAgentDispatchRequest(agent_name=AGENT_NAME, room=room_name, metadata="{}")
+        )
+        await asyncio.sleep(args.wait)
+        participants = await lk_api.room.list_participants(api.ListParticipantsRequest(room=room_name))
+        agents = [p.identity for p in participants.participants if p.kind == api.ParticipantInfo.Kind.AGENT]
+        return {"room": room_name, "waited_s": args.wait, "agent_joined": bool(agents), "agents": agents}
+    finally:
+        await lk_api.room.delete_room(api.DeleteRoomRequest(room=room_name))
+
+
+async def cmd_dispatch(lk_api: api.LiveKitAPI, args: argparse.Namespace) -> Dict[str, Any]:
+    metadata = {
+        "dial_info": {"phone_number": args.phone, "transfer_to": args.transfer_to},
+        "prospect_info": {"company_name": args.company, "contact_name": args.contact},
+        "call_direction": "outbound",
+    }
+    guard = default_guard()
+    reason = guard.check(args.phone)
+    if reason:
+        return {"dispatched": False, "phone": args.phone, "reason": reason}
+    room_name = args.room or "outbound-" + "".join(random.choices(string.ascii_letters + string.digits, k=8))
+    await lk_api.room.create_room(api.CreateRoomRequest(name=room_name, metadata=json.dumps(metadata)))
+    dispatch = await lk_api.agent_dispatch.create_dispatch(
+        api.CreateAgentDispatchRequest(agent_name=AGENT_NAME, room=room_name, metadata=json.dumps(metadata))
+    )
+    # Only a dispatch that went through counts as dialed
+    guard.record_dial(args.phone)
+    return {"dispatched": True, "room": room_name, "dispatch": to_dict(dispatch)}
+
+
+async def cmd_dial_test(lk_api: api.LiveKitAPI, args: argparse.Namespace) -> Dict[str, Any]:
+    """Dial a number straight from a fresh room (no agent) and report the SIP participants around it"""
+    guard = default_guard()
+    reason = guard.check(args.phone)
+    if reason:
+        return {"dialed": False, "phone": args.phone, "reason": reason}
+    before = await collect_rooms(lk_api, args.timeout)
+    room_name = f"call-debug-{int(time.time()) % 10000:04d}"
+    metadata = {
+        "dial_info": {"phone_number": args.phone},
+        "prospect_info": {"company_name": "Debug Test", "contact_name": "Test"},
+    }
+    await lk_api.room.create_room(api.CreateRoomRequest(name=room_name, metadata=json.dumps(metadata)))
+    try:
+        sip_participant = await lk_api.sip.create_sip_participant(
+            api.CreateSIPParticipantRequest(
+                sip_trunk_id=os.getenv("SIP_OUTBOUND_TRUNK_ID"),
+                sip_call_to=f"tel:{args.phone}",
+                room_name=room_name,
+                participant_identity=f"sip_{args.phone.replace('+', '')}",
+            )
+        )
+        guard.record_dial(args.phone)
+        await asyncio.sleep(args.wait)
+        after = await collect_rooms(lk_api, args.timeout)
+        ours = [p for p in sip_participants_of(after["rooms"]) if p["room"] == room_name]
+        return {
+            "dialed": True,
+            "room": room_name,
+            "sip_call_id": sip_participant.sip_call_id,
+            "sip_participants_before": sip_participants_of(before["rooms"]),
+            "sip_participants_after": sip_participants_of(after["rooms"]),
+            "connected": bool(ours),
+            "errors": {**before["errors"], **after["errors"]},
+        }
+    finally:
+        await lk_api.room.delete_room(api.DeleteRoomRequest(room=room_name))
+
+
+async def cmd_dispatches(lk_api: api.LiveKitAPI, args: argparse.Namespace) -> Dict[str, Any]:
+    dispatches = await lk_api.agent_dispatch.list_dispatch(room_name=args.room)
+    return {"room": args.room, "dispatches": [to_dict(d) for d in dispatches]}
+
+
+# --- text output ------------------------------------------------------------
+
+def print_rooms(rooms: List[Dict[str, Any]]) -> None:
+    print(f"🏠 Rooms activos: {len(rooms)}")
+    for room in rooms:
+        state = "🟢 Activo" if room["num_participants"] > 0 else "🔴 Sin participantes"
+        print(f"\n📋 Room: {room['name']}  ({state}, {room['num_participants']} participantes)")
+        if room["metadata"]:
+            print(f"   Metadata: {room['metadata'][:100]}")
+        for p in room["participants"]:
+            status = p["attributes"].get("sip.callStatus")
+            print(f"   👤 {p['identity']} [{p['kind']}] {p['state']}, tracks: {p['tracks']}"
+                  + (f", sip.callStatus={status}" if status else ""))
+
+
+def print_sip(sip: Dict[str, Any]) -> None:
+    print(f"\n📡 CONFIGURACIÓN SIP (SIP_OUTBOUND_TRUNK_ID={sip['configured_outbound_trunk']})")
+    for trunk in sip["outbound_trunks"]:
+        print(f"   ↗️  {trunk.get('sip_trunk_id')} {trunk.get('name', '')} -> {trunk.get('address', '')}")
+    for trunk in sip["inbound_trunks"]:
+        print(f"   ↘️  {trunk.get('sip_trunk_id')} {trunk.get('name', '')} {trunk.get('numbers', [])}")
+    for rule in sip["dispatch_rules"]:
+        print(f"   📜 {rule.get('sip_dispatch_rule_id')} {rule.get('name', '')} trunks={rule.get('trunk_ids', [])}")
+
+
+def print_result(command: str, result: Dict[str, Any]) -> None:
+    if command == "status":
+        print("🔍 ESTADO DEL SISTEMA")
+        print("=" * 50)
+        print_rooms(result["rooms"])
+        print(f"\n📞 Participantes SIP: {len(result['sip_participants'])}")
+        print_sip(result["sip"])
+    elif command == "rooms":
+        print_rooms(result["rooms"])
+    elif command == "sip":
+        print_sip(result)
+    elif command == "worker-check":
+        mark = "✅" if result["agent_joined"] else "❌"
+        print(f"{mark} Worker {'respondió' if result['agent_joined'] else 'NO respondió'} "
+              f"en {result['waited_s']:.0f}s ({result['room']}) {result['agents']}")
+    elif command == "dial-test":
+        if result["dialed"]:
+            mark = "✅" if result["connected"] else "❌"
+            print(f"📊 Participantes SIP antes: {len(result['sip_participants_before'])}, "
+                  f"después: {len(result['sip_participants_after'])}")
+            print(f"{mark} {result['room']} (call id {result['sip_call_id']}) "
+                  f"{'en curso' if result['connected'] else 'NO encontrada'}")
+        else:
+            print(f"🚫 {result['phone']} bloqueado: {result['reason']}")
+    elif command == "dispatch":
+        if result["dispatched"]:
+            print(f"✅ Dispatch creado en {result['room']}: {result['dispatch'].get('id')}")
+        else:
+            print(f"🚫 {result['phone']} bloqueado: {result['reason']}")
+    else:
+        print(json.dumps(result, indent=2))
+    for name, error in result.get("errors", {}).items():
+        print(f"⚠️  {name}: {error}")
+
+
+COMMANDS = {
+    "status": cmd_status,
+    "rooms": cmd_rooms,
+    "sip": cmd_sip,
+    "worker-check": cmd_worker_check,
+    "dispatch": cmd_dispatch,
+    "dispatches": cmd_dispatches,
+    "dial-test": cmd_dial_test,
+}
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    async with livekit_api(args.timeout) as lk_api:
+        return await COMMANDS[args.command](lk_api, args)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="CLI de operaciones para tdx-sdr-bot")
+    parser.add_argument("--json", action="store_true", help="Salida JSON")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_S, help="Timeout por consulta (s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("status", help="Rooms, participantes y configuración SIP")
+    rooms = sub.add_parser("rooms", help="Rooms y participantes")
+    rooms.add_argument("--room", help="Solo este room")
+    sub.add_parser("sip", help="Trunks SIP y dispatch rules")
+    check = sub.add_parser("worker-check", help="Verificar que un worker toma dispatches")
+    check.add_argument("--wait", type=float, default=WORKER_CHECK_WAIT_S)
+
+    dispatch = sub.add_parser("dispatch", help="Crear un dispatch outbound del agente")
+    dispatch.add_argument("--phone", required=True)
+    dispatch.add_argument("--room", help="Nombre del room (por defecto outbound-<random>)")
+    dispatch.add_argument("--transfer-to", default=DEFAULT_TRANSFER_TO)
+    dispatch.add_argument("--company", default="Empresa Test")
+    dispatch.add_argument("--contact", default="Contacto Prueba")
+
+    dispatches = sub.add_parser("dispatches", help="Dispatches de un room")
+    dispatches.add_argument("--room", required=True)
+
+    dial = sub.add_parser("dial-test", help="Llamada SIP directa sin agente (simple_debug)")
+    dial.add_argument("--phone", required=True)
+    dial.add_argument("--wait", type=float, default=15.0)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        result = asyncio.run(run(args))
+    except Exception as e:
+        if args.json:
+            print(json.dumps({"error": str(e)}))
+        else:
+            print(f"❌ Error: {e}")
+        return 1
+    if args.json:
+        print(json.dumps(result, indent=2, default=str))
+    else:
+        print_result(args.command, result)
+    return 1 if result.get("errors") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Dashboard de operaciones en vivo para TDX SDR Bot
+
+Los jobs del agente envían sus métricas (worker_metrics.py, TDX_METRICS_URL)
+a este servicio: llamadas iniciadas/terminadas, resultado del marcado,
+latencia de cada turno y de Microsoft Graph, y la carga de cada worker. El
+servicio las agrega en ventanas móviles acotadas (por tiempo y por número de
+muestras, así que puede quedarse abierto todo el día) y recalcula la vista
+una vez por segundo:
+
+    GET /               página web que se refresca cada segundo
+    GET /api/snapshot   vista actual en JSON
+    POST /metrics       endpoint para los workers (TDX_METRICS_URL)
+
+Uso:
+    python ops_dashboard.py serve --port 8091 --tui
+    python ops_dashboard.py watch --url http://localhost:8091   # TUI remota
+    python ops_dashboard.py simulate --url http://localhost:8091/metrics --calls 40
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from aiohttp import web, ClientSession
+from dotenv import load_dotenv
+
+from worker_metrics import (
+    EVENT_ANSWER_CACHE,
+    EVENT_AUDIO_GATE,
+    EVENT_BARGE_IN,
+    EVENT_CALL_COST,
+    EVENT_CALL_ENDED,
+    EVENT_CALL_STARTED,
+    EVENT_DIAL,
+    EVENT_FALLBACK,
+    EVENT_GRAPH,
+    EVENT_TURN,
+    METRICS_TOKEN_ENV,
+)
+
+load_dotenv(dotenv_path=".env.local")
+
+DEFAULT_PORT = 8091
+REFRESH_INTERVAL_S = 1.0
+# Latency percentiles and dial outcomes cover the last LATENCY_WINDOW_S seconds
+LATENCY_WINDOW_S = 300.0
+OUTCOME_WINDOW_S = 900.0
+CALLS_PER_MIN_WINDOW_S = 60.0
+# Hard cap on samples per window so a burst can't grow memory
+MAX_WINDOW_SAMPLES = 5000
+# A call whose job stopped sending heartbeats is considered gone
+CALL_STALE_S = 15.0
+WORKER_STALE_S = 300.0
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class RollingSamples:
+    """(timestamp, value) samples kept for window_s seconds and at most max_samples"""
+
+    def __init__(self, window_s: float, max_samples: int = MAX_WINDOW_SAMPLES):
+        self.window_s = window_s
+        self._samples: Deque[Tuple[float, Any]] = deque(maxlen=max_samples)
+
+    def add(self, value: Any, at: float) -> None:
+        self._samples.append((at, value))
+
+    def values(self, now: float) -> List[Any]:
+        horizon = now - self.window_s
+        while self._samples and self._samples[0][0] < horizon:
+            self._samples.popleft()
+        return [value for _, value in self._samples]
+
+
+class ActiveCall:
+    __slots__ = ("worker", "started_at", "last_seen", "rss_mb", "cpu_s")
+
+    def __init__(self, worker: str, started_at: float):
+        self.worker = worker
+        self.started_at = started_at
+        self.last_seen = started_at
+        self.rss_mb = 0.0
+        self.cpu_s = 0.0
+
+
+class DashboardState:
+    """Aggregates the workers' metric batches into the live view"""
+
+    def __init__(self):
+        self.calls: Dict[str, ActiveCall] = {}
+        self.workers: Dict[str, Dict[str, float]] = {}
+        self.call_starts = RollingSamples(CALLS_PER_MIN_WINDOW_S)
+        self.turn_latency = RollingSamples(LATENCY_WINDOW_S)
+        # End of the caller's speech (VAD silence included) to agent voice, per phase
+        self.turn_latency_by_phase: Dict[str, RollingSamples] = {}
+        self.graph_latency = RollingSamples(LATENCY_WINDOW_S)
+        # Per call p50: how long before the server's interruption the local barge-in paused the agent
+        self.barge_in_lead = RollingSamples(LATENCY_WINDOW_S)
+        self.graph_errors = RollingSamples(LATENCY_WINDOW_S)
+        self.dial_outcomes = RollingSamples(OUTCOME_WINDOW_S)
+        self.totals: Counter = Counter()
+        self.snapshot: Dict[str, Any] = {}
+
+    def ingest(self, batch: Dict[str, Any], now: Optional[float] = None) -> None:
+        now = now if now is not None else time.time()
+        worker = str(batch.get("worker", "unknown"))
+        call_id = str(batch.get("call", ""))
+        load = batch.get("load") or {}
+        self.workers[worker] = {"loadavg_1m": float(load.get("loadavg_1m", 0.0)), "last_seen": now}
+        self.totals["batches"] += 1
+
+        call = self.calls.get(call_id)
+        if call is None and call_id:
+            call = self.calls[call_id] = ActiveCall(worker, now)
+        if call is not None:
+            call.last_seen = now
+            call.rss_mb = float(load.get("rss_mb", call.rss_mb))
+            call.cpu_s = float(load.get("cpu_s", call.cpu_s))
+
+        for event in batch.get("events", []):
+            at = float(event.get("t", now))
+            kind = event.get("type")
+            self.totals[kind] += 1
+            if kind == EVENT_CALL_STARTED:
+                self.call_starts.add(1, at)
+                if call is not None:
+                    call.started_at = at
+            elif kind == EVENT_CALL_ENDED:
+                self.calls.pop(call_id, None)
+                call = None
+            elif kind == EVENT_DIAL:
+                self.dial_outcomes.add(str(event.get("outcome", "unknown")), at)
+            elif kind == EVENT_TURN:
+                self.turn_latency.add(float(event["latency_s"]), at)
+                if "phase" in event:
+                    by_phase = self.turn_latency_by_phase.get(event["phase"])
+                    if by_phase is None:
+                        by_phase = self.turn_latency_by_phase[event["phase"]] = RollingSamples(LATENCY_WINDOW_S)
+                    by_phase.add(float(event["latency_s"]) + float(event.get("silence_ms", 0)) / 1000, at)
+            elif kind == EVENT_AUDIO_GATE:
+                # Counter sums the floats too: audio seconds across all finished calls
+                self.totals["audio_input_s"] += float(event.get("input_s", 0.0))
+                self.totals["audio_saved_s"] += float(event.get("saved_s", 0.0))
+            elif kind == EVENT_BARGE_IN:
+                self.totals["barge_in_confirmed"] += int(event.get("confirmed", 0))
+                self.totals["barge_in_cancelled"] += int(event.get("cancelled", 0))
+                if event.get("server_ms_p50") is not None:
+                    self.barge_in_lead.add(float(event["server_ms_p50"]) / 1000, at)
+            elif kind == EVENT_ANSWER_CACHE:
+                self.totals["answer_lookups"] += int(event.get("lookups", 0))
+                self.totals["answer_hits"] += int(event.get("hits", 0))
+                self.totals["answer_saved_s"] += float(event.get("saved_ms") or 0.0) / 1000
+            elif kind == EVENT_CALL_COST:
+                self.totals["cost_usd"] += float((event.get("usd") or {}).get("total", 0.0))
+                self.totals["cost_sip_s"] += float(event.get("sip_s", 0.0))
+            elif kind == EVENT_GRAPH:
+                self.graph_latency.add(float(event["latency_s"]), at)
+                if not event.get("ok", True):
+                    self.graph_errors.add(1, at)
+
+    def refresh(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Expire stale calls/workers and rebuild the cached view (once per tick, not per request)"""
+        now = now if now is not None else time.time()
+        for call_id in [c for c, call in self.calls.items() if now - call.last_seen > CALL_STALE_S]:
+            self.calls.pop(call_id)
+            self.totals["stale_calls"] += 1
+        for worker in [w for w, info in self.workers.items() if now - info["last_seen"] > WORKER_STALE_S]:
+            self.workers.pop(worker)
+
+        per_worker: Dict[str, Dict[str, Any]] = {
+            w: {"active_calls": 0, "rss_mb": 0.0, "loadavg_1m": info["loadavg_1m"]}
+            for w, info in self.workers.items()
+        }
+        for call in self.calls.values():
+            entry = per_worker.setdefault(call.worker, {"active_calls": 0, "rss_mb": 0.0, "loadavg_1m": 0.0})
+            entry["active_calls"] += 1
+            entry["rss_mb"] += call.rss_mb
+
+        turns = sorted(self.turn_latency.values(now))
+        graph = sorted(self.graph_latency.values(now))
+        self.snapshot = {
+            "at": now,
+            "active_calls": len(self.calls),
+            "calls_per_min": len(self.call_starts.values(now)) * 60.0 / CALLS_PER_MIN_WINDOW_S,
+            "turn_latency_ms": latency_summary(turns),
+            "turn_latency_by_phase_ms": {
+                phase: latency_summary(sorted(samples.values(now)))
+                for phase, samples in sorted(self.turn_latency_by_phase.items())
+            },
+            "graph_latency_ms": {**latency_summary(graph), "errors": len(self.graph_errors.values(now))},
+            "barge_in_lead_ms": latency_summary(sorted(self.barge_in_lead.values(now))),
+            "dial_outcomes": dict(Counter(self.dial_outcomes.values(now)).most_common()),
+            "workers": dict(sorted(per_worker.items())),
+            "totals": dict(self.totals),
+        }
+        return self.snapshot
+
+
+def latency_summary(sorted_s: List[float]) -> Dict[str, Any]:
+    p50, p95 = percentile(sorted_s, 50), percentile(sorted_s, 95)
+    return {
+        "count": len(sorted_s),
+        "p50": round(p50 * 1000) if p50 is not None else None,
+        "p95": round(p95 * 1000) if p95 is not None else None,
+    }
+
+
+def render_text(snapshot: Dict[str, Any]) -> str:
+    """Terminal view of a snapshot"""
+    if not snapshot:
+        return "⏳ Esperando métricas..."
+    turn, graph = snapshot["turn_latency_ms"], snapshot["graph_latency_ms"]
+
+    def ms(value: Optional[int]) -> str:
+        return f"{value}ms" if value is not None else "-"
+
+    lines = [
+        f"📊 TDX SDR BOT - {time.strftime('%H:%M:%S', time.localtime(snapshot['at']))}",
+        "=" * 64,
+        f"📞 Llamadas activas: {snapshot['active_calls']:<6} 📈 Llamadas/min: {snapshot['calls_per_min']:.1f}",
+        f"🗣️  Latencia turno  p50 {ms(turn['p50']):>7}  p95 {ms(turn['p95']):>7}  ({turn['count']} turnos, {LATENCY_WINDOW_S / 60:.0f} min)",
+        *(
+            f"   {phase:<14} p50 {ms(s['p50']):>7}  p95 {ms(s['p95']):>7}  ({s['count']}, fin de voz -> respuesta)"
+            for phase, s in snapshot.get("turn_latency_by_phase_ms", {}).items() if s["count"]
+        ),
+        f"📅 Latencia Graph  p50 {ms(graph['p50']):>7}  p95 {ms(graph['p95']):>7}  ({graph['count']} req, {graph['errors']} errores)",
+        *(
+            [f"🔇 Audio no enviado al modelo: {snapshot['totals']['audio_saved_s'] / 60:.1f} de "
+             f"{snapshot['totals']['audio_input_s'] / 60:.1f} min "
+             f"({snapshot['totals']['audio_saved_s'] / snapshot['totals']['audio_input_s']:.0%})"]
+            if snapshot["totals"].get("audio_input_s") else []
+        ),
+        *(
+            [f"✋ Barge-in local: {snapshot['totals'].get('barge_in_confirmed', 0)} confirmados, "
+             f"{snapshot['totals'].get('barge_in_cancelled', 0)} falsas alarmas, "
+             f"pausa p50 {ms(snapshot['barge_in_lead_ms']['p50'])} antes que el servidor"]
+            if snapshot["totals"].get(EVENT_BARGE_IN) else []
+        ),
+        *(
+            [f"🗃️  Respuestas en caché: {snapshot['totals'].get('answer_hits', 0)} de "
+             f"{snapshot['totals']['answer_lookups']} turnos "
+             f"({snapshot['totals'].get('answer_hits', 0) / snapshot['totals']['answer_lookups']:.0%}), "
+             f"~{snapshot['totals'].get('answer_saved_s', 0.0):.1f} s de espera ahorrados"]
+            if snapshot["totals"].get("answer_lookups") else []
+        ),
+        *(
+            [f"💵 Costo: US$ {snapshot['totals']['cost_usd']:.2f} en {snapshot['totals'][EVENT_CALL_COST]} llamadas "
+             f"(US$ {snapshot['totals']['cost_usd'] / snapshot['totals'][EVENT_CALL_COST]:.3f}/llamada, "
+             f"{snapshot['totals'].get('cost_sip_s', 0) / 60:.1f} min de SIP)"]
+            if snapshot["totals"].get(EVENT_CALL_COST) else []
+        ),
+        *(
+            [f"🔀 Llamadas pasadas del modelo realtime al pipeline en cascada: {snapshot['totals'][EVENT_FALLBACK]}"]
+            if snapshot["totals"].get(EVENT_FALLBACK) else []
+        ),
+        "",
+        f"☎️  Resultados de marcado ({OUTCOME_WINDOW_S / 60:.0f} min):",
+    ]
+    outcomes = snapshot["dial_outcomes"]
+    total = sum(outcomes.values())
+    for outcome, count in outcomes.items():
+        bar = "█" * round(30 * count / total)
+        lines.append(f"   {outcome:<12} {count:>5} {count / total:>6.1%} {bar}")
+    if not outcomes:
+        lines.append("   -")
+    lines += ["", f"🖥️  Workers ({len(snapshot['workers'])}):", f"   {'worker':<28} {'llamadas':>8} {'RSS MB':>8} {'load':>6}"]
+    for worker, load in snapshot["workers"].items():
+        lines.append(f"   {worker[:28]:<28} {load['active_calls']:>8} {load['rss_mb']:>8.0f} {load['loadavg_1m']:>6.2f}")
+    return "\n".join(lines)
+
+
+PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>TDX SDR Bot - Operaciones</title>
+<style>body{font-family:monospace;background:#111;color:#ddd;margin:2em}pre{font-size:15px}</style>
+</head><body><pre id="view">⏳</pre>
+<script>
+async function tick() {
+  try {
+    const r = await fetch("api/snapshot?format=text");
+    document.getElementById("view").textContent = await r.text();
+  } catch (e) {
+    document.getElementById("view").textContent = "❌ " + e;
+  }
+}
+tick(); setInterval(tick, 1000);
+</script></body></html>
+"""
+
+
+def create_app(state: DashboardState, token: Optional[str] = None) -> web.Application:
+    async def metrics(request: web.Request) -> web.Response:
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return web.Response(status=401)
+        try:
+            state.ingest(await request.json())
+        except (ValueError, KeyError, TypeError) as e:
+            return web.Response(status=400, text=str(e))
+        return web.Response(status=204)
+
+    async def snapshot(request: web.Request) -> web.Response:
+        if request.query.get("format") == "text":
+            return web.Response(text=render_text(state.snapshot))
+        return web.json_response(state.snapshot)
+
+    async def index(request: web.Request) -> web.Response:
+        return web.Response(text=PAGE, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_post("/metrics", metrics)
+    app.router.add_get("/api/snapshot", snapshot)
+    app.router.add_get("/", index)
+    return app
+
+
+async def refresh_loop(state: DashboardState, tui: bool) -> None:
+    while True:
+        state.refresh()
+        if tui:
+            print("\033[2J\033[H" + render_text(state.snapshot), flush=True)
+        await asyncio.sleep(REFRESH_INTERVAL_S)
+
+
+async def serve(host: str, port: int, tui: bool) -> None:
+    state = DashboardState()
+    runner = web.AppRunner(create_app(state, os.getenv(METRICS_TOKEN_ENV)))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"📊 Dashboard en http://{host}:{port} (workers: TDX_METRICS_URL=http://<host>:{port}/metrics)")
+    try:
+        await refresh_loop(state, tui)
+    finally:
+        await runner.cleanup()
+
+
+async def watch(url: str) -> None:
+    """Terminal view of a remote dashboard"""
+    async with ClientSession() as http:
+        while True:
+            try:
+                async with http.get(url.rstrip("/") + "/api/snapshot", params={"format": "text"}) as resp:
+                    text = await resp.text()
+            except Exception as e:
+                text = f"❌ {e}"
+            print("\033[2J\033[H" + text, flush=True)
+            await asyncio.sleep(REFRESH_INTERVAL_S)
+
+
+async def simulate(url: str, calls: int, workers: int, seed: int) -> None:
+    """Post synthetic call metrics, the way agent jobs would, to a running dashboard"""
+    rng = random.Random(seed)
+    headers = {"Authorization": f"Bearer {os.getenv(METRICS_TOKEN_ENV)}"} if os.getenv(METRICS_TOKEN_ENV) else {}
+
+    async with ClientSession() as http:
+        async def post(worker: str, call: str, events: List[Dict[str, Any]]) -> None:
+            load = {"loadavg_1m": rng.uniform(0.2, 1.5), "cpu_s": rng.uniform(1, 20), "rss_mb": rng.uniform(150, 260)}
+            async with http.post(url, json={"worker": worker, "call": call, "load": load, "events": events},
+                                 headers=headers) as resp:
+                resp.raise_for_status()
+
+        async def call_lifecycle(n: int) -> None:
+            await asyncio.sleep(rng.uniform(0, 20))
+            worker, call = f"worker-{n % workers}", f"outbound-sim-{n:04d}"
+            await post(worker, call, [{"t": time.time(), "type": EVENT_CALL_STARTED}])
+            await asyncio.sleep(rng.uniform(1, 4))
+            outcome = rng.choices(["answered", "no_answer", "busy", "sip_error"], [0.35, 0.5, 0.1, 0.05])[0]
+            await post(worker, call, [{"t": time.time(), "type": EVENT_DIAL, "outcome": outcome}])
+            if outcome == "answered":
+                for turn in range(rng.randrange(3, 12)):
+                    await asyncio.sleep(1)
+                    phase, silence_ms = ("greeting", 400) if turn == 0 else rng.choice(
+                        [("discovery", 500), ("discovery", 500), ("email", 1000), ("scheduling", 600)])
+                    events = [{"t": time.time(), "type": EVENT_TURN, "latency_s": rng.lognormvariate(-0.4, 0.35),
+                               "phase": phase, "silence_ms": silence_ms}]
+                    if rng.random() < 0.15:
+                        events.append({"t": time.time(), "type": EVENT_GRAPH, "op": "check_availability",
+                                       "latency_s": rng.lognormvariate(-1.0, 0.5), "ok": rng.random() > 0.05})
+                    await post(worker, call, events)
+            await post(worker, call, [{"t": time.time(), "type": EVENT_CALL_ENDED}])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(call_lifecycle(n) for n in range(calls)))
+        print(f"✅ {calls} llamadas simuladas en {time.perf_counter() - started:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard de operaciones en vivo")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    srv = sub.add_parser("serve", help="Recibir métricas de los workers y servir el dashboard")
+    srv.add_argument("--host", default="0.0.0.0")
+    srv.add_argument("--port", type=int, default=int(os.getenv("PORT", DEFAULT_PORT)))
+    srv.add_argument("--tui", action="store_true", help="Mostrar también la vista en esta terminal")
+
+    w = sub.add_parser("watch", help="Vista en terminal de un dashboard remoto")
+    w.add_argument("--url", default=f"http://localhost:{DEFAULT_PORT}")
+
+    sim = sub.add_parser("simulate", help="Enviar métricas sintéticas a un dashboard")
+    sim.add_argument("--url", default=f"http://localhost:{DEFAULT_PORT}/metrics")
+    sim.add_argument("--calls", type=int, default=40)
+    sim.add_argument("--workers", type=int, default=3)
+    sim.add_argument("--seed", type=int, default=7)
+
+    args = parser.parse_args()
+    try:
+        if args.command == "serve":
+            asyncio.run(serve(args.host, args.port, args.tui))
+        elif args.command == "watch":
+            asyncio.run(watch(args.url))
+        else:
+            asyncio.run(simulate(args.url, args.calls, args.workers, args.seed))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Predictive dialing pacer for outbound campaigns
+
+Every dispatch is an agent job: it holds a worker slot from the moment a
+worker picks it up, while the agent dials and the phone rings, until the call
+ends. A dispatch that finds no free slot waits for one, and after
+DEFAULT_PICKUP_TIMEOUT_S it counts as abandoned. So calls in flight (talking
+or ringing) are counted against the live capacity, and the pacer always fills
+the free slots (progressive dialing).
+
+On top of that it dials ahead into slots expected to free up within the
+pickup window. PredictivePacer tracks the rolling answer rate, handle time and
+time to answer. From those, the number of slots that free up is binomial: talking calls
+that end, ringing calls that give up. The pacer launches extra dispatches only
+while the expected share of them left without a worker stays under the abandon
+cap. A small pool rarely frees enough slots for that, so it stays progressive.
+So does any pool while the rolling abandon rate is over the cap.
+
+Run it directly to simulate the pacer against a synthetic call model and
+compare it with progressive and fixed-ratio dialing, or sweep pool sizes and
+answer rates to check the cap holds:
+    python pacer.py --workers 10 --answer-rate 0.3 --minutes 120
+    python pacer.py --sweep
+"""
+import argparse
+import heapq
+import math
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+DEFAULT_TARGET_UTILIZATION = 0.85
+DEFAULT_MAX_ABANDON_RATE = 0.03
+DEFAULT_WINDOW_S = 900.0
+PACING_INTERVAL_S = 1.0
+
+# Until the window has this many samples the pacer uses the defaults below
+MIN_SAMPLES = 20
+DEFAULT_ANSWER_RATE = 0.3
+DEFAULT_HANDLE_TIME_S = 180.0
+DEFAULT_TIME_TO_ANSWER_S = 15.0
+DEFAULT_NO_ANSWER_TIMEOUT_S = 30.0
+# A dispatch no worker picks up within this long is abandoned
+DEFAULT_PICKUP_TIMEOUT_S = 10.0
+
+
+def pool_size_for_rate(calls_per_second: float, setup_s: float, workers: int = 1) -> int:
+    """Little's law: sessions being set up at once per worker for the dialer rate, plus one spare"""
+    per_worker_rate = calls_per_second / max(1, workers)
+    return math.ceil(per_worker_rate * setup_s) + 1
+
+
+class RollingWindow:
+    """Timestamped samples kept for `window_s` seconds, with a running sum"""
+
+    def __init__(self, window_s: float):
+        self.window_s = window_s
+        self._samples: Deque[Tuple[float, float]] = deque()
+        self._sum = 0.0
+
+    def add(self, value: float, at: float) -> None:
+        self._samples.append((at, value))
+        self._sum += value
+
+    def _evict(self, now: float) -> None:
+        horizon = now - self.window_s
+        while self._samples and self._samples[0][0] < horizon:
+            self._sum -= self._samples.popleft()[1]
+
+    def count(self, now: float) -> int:
+        self._evict(now)
+        return len(self._samples)
+
+    def mean(self, now: float, default: float) -> float:
+        self._evict(now)
+        if len(self._samples) < MIN_SAMPLES:
+            return default
+        return self._sum / len(self._samples)
+
+
+class PredictivePacer:
+    """Decides how many calls to dispatch per interval from live answer rates and worker capacity"""
+
+    def __init__(
+        self,
+        workers: int,
+        *,
+        target_utilization: float = DEFAULT_TARGET_UTILIZATION,
+        max_abandon_rate: float = DEFAULT_MAX_ABANDON_RATE,
+        window_s: float = DEFAULT_WINDOW_S,
+        max_dispatch_per_interval: Optional[int] = None,
+        pickup_timeout_s: float = DEFAULT_PICKUP_TIMEOUT_S,
+    ):
+        if workers <= 0:
+            raise ValueError("workers must be greater than 0")
+        self.workers = workers
+        # Share of the slots expected to free up in the pickup window that is dialed ahead
+        self.target_utilization = target_utilization
+        self.max_abandon_rate = max_abandon_rate
+        self.pickup_timeout_s = pickup_timeout_s
+        self.max_dispatch_per_interval = max_dispatch_per_interval or workers
+        # 1.0 per answered call, 0.0 per unanswered one
+        self._answered = RollingWindow(window_s)
+        # 1.0 per dispatch no worker picked up in time, 0.0 per picked up one
+        self._abandoned = RollingWindow(window_s)
+        self._handle_time = RollingWindow(window_s)
+        self._time_to_answer = RollingWindow(window_s)
+        self._time_to_give_up = RollingWindow(window_s)
+
+    # --- observations -------------------------------------------------------
+
+    def record_answered(self, time_to_answer_s: float, now: float) -> None:
+        self._answered.add(1.0, now)
+        self._time_to_answer.add(time_to_answer_s, now)
+
+    def record_unanswered(self, ring_time_s: float, now: float) -> None:
+        self._answered.add(0.0, now)
+        self._time_to_give_up.add(ring_time_s, now)
+
+    def record_connected(self, now: float) -> None:
+        """A dispatch got a worker"""
+        self._abandoned.add(0.0, now)
+
+    def record_abandoned(self, now: float) -> None:
+        """A dispatch found no free worker within the pickup timeout"""
+        self._abandoned.add(1.0, now)
+
+    def record_handle_time(self, seconds: float, now: float) -> None:
+        self._handle_time.add(seconds, now)
+
+    # --- rolling estimates --------------------------------------------------
+
+    def answer_rate(self, now: float) -> float:
+        # Never assume less than 5%: a short streak of no-answers would explode the ratio
+        return max(0.05, self._answered.mean(now, DEFAULT_ANSWER_RATE))
+
+    def abandon_rate(self, now: float) -> float:
+        return self._abandoned.mean(now, 0.0)
+
+    def handle_time_s(self, now: float) -> float:
+        return self._handle_time.mean(now, DEFAULT_HANDLE_TIME_S)
+
+    def time_to_answer_s(self, now: float) -> float:
+        return self._time_to_answer.mean(now, DEFAULT_TIME_TO_ANSWER_S)
+
+    def time_to_give_up_s(self, now: float) -> float:
+        return self._time_to_give_up.mean(now, DEFAULT_NO_ANSWER_TIMEOUT_S)
+
+    def ringing_answer_rate(self, now: float) -> float:
+        """Share of the calls ringing right now that will be answered
+
+        Unanswered calls ring until the timeout while answered ones are picked up
+        early, so at any instant the ringing set is weighted towards no-answers
+        (Little's law: each group's share is its rate times its ring time).
+        """
+        p = self.answer_rate(now)
+        answered_load = p * self.time_to_answer_s(now)
+        unanswered_load = (1 - p) * self.time_to_give_up_s(now)
+        return answered_load / (answered_load + unanswered_load)
+
+    # --- pacing -------------------------------------------------------------
+
+    def releases(self, busy: int, ringing: int, now: float) -> List[float]:
+        """Distribution of the slots that free up within the pickup window (index = slots)
+
+        Talking calls end with the chance an exponential handle time does; ringing
+        calls that will not be answered give up spread over their ring time.
+        """
+        window = self.pickup_timeout_s
+        ends = 1 - math.exp(-window / self.handle_time_s(now))
+        gives_up = (1 - self.ringing_answer_rate(now)) * min(1.0, window / self.time_to_give_up_s(now))
+        return _convolve(_binomial(busy, ends), _binomial(ringing, gives_up))
+
+    def dispatches(self, busy: int, ringing: int, now: float, capacity: Optional[int] = None) -> int:
+        """Calls to launch now, given `busy` calls talking, `ringing` dispatches not answered yet
+        (dialing or still waiting for a worker) and the live worker `capacity` (default: workers)"""
+        capacity = self.workers if capacity is None else capacity
+        # Every call in flight holds (or is waiting for) a worker slot
+        free = capacity - busy - ringing
+        progressive = max(0, min(free, self.max_dispatch_per_interval))
+        if self.abandon_rate(now) > self.max_abandon_rate or progressive >= self.max_dispatch_per_interval:
+            # Over the abandon cap: progressive dialing until the window recovers
+            return progressive
+
+        # Ease off once the abandon rate is past half the cap instead of only after crossing it
+        pressure = max(0.0, self.abandon_rate(now) / self.max_abandon_rate - 0.5)
+        budget = self.max_abandon_rate * (1 - pressure)
+        pmf = self.releases(busy, ringing, now)
+        reach = self.target_utilization * sum(r * p for r, p in enumerate(pmf))
+        # Dispatches already waiting for a worker get the first slots that free up
+        waiting = max(0, -free)
+        below = sum(pmf[:waiting])
+        shortfall_waiting = sum((waiting - r) * p for r, p in enumerate(pmf[:waiting]))
+        shortfall = shortfall_waiting
+        extra = 0
+        while progressive + extra < self.max_dispatch_per_interval and extra + 1 <= reach:
+            # E[max(0, waiting + k - R)] grows by P(R < waiting + k) for each extra dispatch
+            below += pmf[waiting + extra] if waiting + extra < len(pmf) else 0.0
+            shortfall += below
+            if shortfall - shortfall_waiting > budget * (progressive + extra + 1):
+                break
+            extra += 1
+        return progressive + extra
+
+    def snapshot(self, now: float) -> Dict[str, float]:
+        return {
+            "answer_rate": self.answer_rate(now),
+            "abandon_rate": self.abandon_rate(now),
+            "handle_time_s": self.handle_time_s(now),
+            "time_to_answer_s": self.time_to_answer_s(now),
+            "samples": self._answered.count(now),
+        }
+
+
+def _binomial(n: int, p: float) -> List[float]:
+    pmf = [1.0] if n <= 0 or p <= 0 else [0.0] * (n + 1)
+    if n > 0 and p >= 1:
+        pmf[n] = 1.0
+    elif n > 0 and p > 0:
+        pmf[0] = (1 - p) ** n
+        for k in range(1, n + 1):
+            pmf[k] = pmf[k - 1] * (n - k + 1) / k * p / (1 - p)
+    return pmf
+
+
+def _convolve(a: List[float], b: List[float]) -> List[float]:
+    out = [0.0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                out[i + j] += x * y
+    return out
+
+
+# --- synthetic simulation ---------------------------------------------------
+
+class _Policy:
+    """Pacing policy interface used by the simulation"""
+
+    name = "policy"
+
+    def dispatches(self, busy: int, ringing: int, now: float) -> int:
+        raise NotImplementedError
+
+
+class ProgressivePolicy(_Policy):
+    """One call per free worker: never abandons, leaves workers idle while calls ring"""
+
+    name = "progressive"
+
+    def __init__(self, workers: int):
+        self.workers = workers
+
+    def dispatches(self, busy: int, ringing: int, now: float) -> int:
+        return max(0, self.workers - busy - ringing)
+
+
+class FixedRatioPolicy(_Policy):
+    """Keeps `ratio` calls ringing per free worker, regardless of answer rate"""
+
+    def __init__(self, workers: int, ratio: float):
+        self.workers = workers
+        self.ratio = ratio
+        self.name = f"fixed {ratio:g}:1"
+
+    def dispatches(self, busy: int, ringing: int, now: float) -> int:
+        return max(0, int((self.workers - busy) * self.ratio) - ringing)
+
+
+class PacerPolicy(_Policy):
+    name = "predictive"
+
+    def __init__(self, pacer: PredictivePacer):
+        self.pacer = pacer
+
+    def dispatches(self, busy: int, ringing: int, now: float) -> int:
+        return self.pacer.dispatches(busy, ringing, now)
+
+
+def simulate(
+    policy: _Policy,
+    *,
+    workers: int,
+    answer_rate: float,
+    handle_time_s: float,
+    time_to_answer_s: float,
+    no_answer_timeout_s: float,
+    duration_s: float,
+    pickup_timeout_s: float = DEFAULT_PICKUP_TIMEOUT_S,
+    seed: int = 7,
+) -> Dict[str, float]:
+    """Run a pacing policy against a synthetic call population and return its outcomes
+
+    Like the agent workers, a dispatch takes a slot when one is free and holds it
+    while the call rings and while it lasts; otherwise it waits for a slot and is
+    abandoned after pickup_timeout_s.
+    """
+    rng = random.Random(seed)
+    pacer = policy.pacer if isinstance(policy, PacerPolicy) else None
+    # (time, kind, dialed_at) events: kind is "answer", "no_answer", "hangup" or "pickup_timeout"
+    events: List[Tuple[float, str, float]] = []
+    # Dispatches waiting for a slot, by dispatch time (at most one per instant per tick)
+    waiting: Deque[float] = deque()
+    busy = ringing = 0
+    dialed = answered = abandoned = 0
+    busy_time = 0.0
+    decision_s = 0.0
+    decisions = 0
+
+    def start_ringing(dialed_at: float, now: float) -> None:
+        nonlocal ringing
+        ringing += 1
+        if pacer:
+            pacer.record_connected(now)
+        if rng.random() < answer_rate:
+            ring = min(no_answer_timeout_s, rng.expovariate(1.0 / time_to_answer_s))
+            heapq.heappush(events, (now + ring, "answer", dialed_at))
+        else:
+            heapq.heappush(events, (now + no_answer_timeout_s, "no_answer", dialed_at))
+
+    def slot_freed(now: float) -> None:
+        if waiting:
+            start_ringing(waiting.popleft(), now)
+
+    now = 0.0
+    while now < duration_s:
+        tick_end = now + PACING_INTERVAL_S
+        while events and events[0][0] <= tick_end:
+            at, kind, dialed_at = heapq.heappop(events)
+            busy_time += busy * (at - now)
+            now = at
+            if kind == "pickup_timeout":
+                if waiting and waiting[0] == dialed_at:
+                    waiting.popleft()
+                    abandoned += 1
+                    if pacer:
+                        pacer.record_abandoned(now)
+                continue
+            if kind == "hangup":
+                busy -= 1
+                slot_freed(now)
+                continue
+            ringing -= 1
+            if kind == "no_answer":
+                if pacer:
+                    pacer.record_unanswered(now - dialed_at, now)
+                slot_freed(now)
+                continue
+            answered += 1
+            busy += 1
+            handle = rng.expovariate(1.0 / handle_time_s)
+            if pacer:
+                pacer.record_answered(now - dialed_at, now)
+                pacer.record_handle_time(handle, now)
+            heapq.heappush(events, (now + handle, "hangup", dialed_at))
+        busy_time += busy * (tick_end - now)
+        now = tick_end
+
+        started = time.perf_counter()
+        launch = policy.dispatches(busy, ringing + len(waiting), now)
+        decision_s += time.perf_counter() - started
+        decisions += 1
+
+        for i in range(launch):
+            dialed += 1
+            if busy + ringing < workers:
+                start_ringing(now, now)
+            else:
+                # Distinct keys so each timeout finds its own dispatch at the head of the queue
+                dialed_at = now + i * 1e-9
+                waiting.append(dialed_at)
+                heapq.heappush(events, (dialed_at + pickup_timeout_s, "pickup_timeout", dialed_at))
+
+    return {
+        "dialed": dialed,
+        "answered": answered,
+        "abandoned": abandoned,
+        "abandon_rate": abandoned / dialed if dialed else 0.0,
+        "utilization": busy_time / (workers * duration_s),
+        "connected_per_hour": answered / duration_s * 3600,
+        "decision_us": decision_s / max(1, decisions) * 1e6,
+    }
+
+
+# Pool sizes and answer rates --sweep runs; small pools are where a predictive pacer abandons most
+SWEEP_WORKERS = (2, 3, 5, 10, 25)
+SWEEP_ANSWER_RATES = (0.15, 0.3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulación del pacer predictivo vs otros métodos de marcación")
+    parser.add_argument("--workers", type=int, default=10, help="Llamadas simultáneas que atienden los workers")
+    parser.add_argument("--answer-rate", type=float, default=0.3, help="Probabilidad de que contesten")
+    parser.add_argument("--handle-time", type=float, default=180.0, help="Duración media de una llamada (s)")
+    parser.add_argument("--time-to-answer", type=float, default=12.0, help="Tiempo medio hasta contestar (s)")
+    parser.add_argument("--no-answer-timeout", type=float, default=30.0, help="Timeout de timbrado (s)")
+    parser.add_argument("--minutes", type=float, default=120.0, help="Duración simulada")
+    parser.add_argument("--target-utilization", type=float, default=DEFAULT_TARGET_UTILIZATION)
+    parser.add_argument("--max-abandon-rate", type=float, default=DEFAULT_MAX_ABANDON_RATE)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--sweep", action="store_true",
+                        help="Correr el pacer sobre varios tamaños de pool y tasas de respuesta")
+    args = parser.parse_args()
+
+    def run(policy: _Policy, workers: int, answer_rate: float) -> Dict[str, float]:
+        return simulate(
+            policy,
+            workers=workers,
+            answer_rate=answer_rate,
+            handle_time_s=args.handle_time,
+            time_to_answer_s=args.time_to_answer,
+            no_answer_timeout_s=args.no_answer_timeout,
+            duration_s=args.minutes * 60,
+            seed=args.seed,
+        )
+
+    def pacer_policy(workers: int) -> PacerPolicy:
+        return PacerPolicy(PredictivePacer(
+            workers,
+            target_utilization=args.target_utilization,
+            max_abandon_rate=args.max_abandon_rate,
+        ))
+
+    print("📈 PREDICTIVE PACER - SIMULATION")
+    print("=" * 78)
+    if args.sweep:
+        print(f"   handle={args.handle_time:.0f}s answer_after={args.time_to_answer:.0f}s "
+              f"cap={args.max_abandon_rate:.0%} duration={args.minutes:.0f}min")
+        print(f"   {'workers':>7}{'answer':>8}{'abandon':>9}{'util':>7}{'conn/h':>8}{'progressive':>13}")
+        breaches = 0
+        for workers in SWEEP_WORKERS:
+            for answer_rate in SWEEP_ANSWER_RATES:
+                result = run(pacer_policy(workers), workers, answer_rate)
+                baseline = run(ProgressivePolicy(workers), workers, answer_rate)
+                over = result["abandon_rate"] > args.max_abandon_rate
+                breaches += over
+                print(f"   {workers:>7}{answer_rate:>8.0%}{result['abandon_rate']:>9.1%}"
+                      f"{result['utilization']:>7.0%}{result['connected_per_hour']:>8.0f}"
+                      f"{baseline['connected_per_hour']:>13.0f}  {'⚠️' if over else '✅'}")
+        if breaches:
+            raise SystemExit(1)
+        return
+
+    print(f"   workers={args.workers} answer_rate={args.answer_rate:.0%} "
+          f"handle={args.handle_time:.0f}s answer_after={args.time_to_answer:.0f}s "
+          f"duration={args.minutes:.0f}min")
+    print(f"   {'policy':<14}{'dialed':>8}{'answered':>10}{'abandon':>9}{'util':>7}"
+          f"{'conn/h':>8}{'µs/decision':>13}")
+    policies: List[_Policy] = [
+        ProgressivePolicy(args.workers),
+        FixedRatioPolicy(args.workers, 1 / args.answer_rate),
+        pacer_policy(args.workers),
+    ]
+    for policy in policies:
+        result = run(policy, args.workers, args.answer_rate)
+        print(f"   {policy.name:<14}{result['dialed']:>8}{result['answered']:>10}"
+              f"{result['abandon_rate']:>9.1%}{result['utilization']:>7.0%}"
+              f"{result['connected_per_hour']:>8.0f}{result['decision_us']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
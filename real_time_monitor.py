@@ -1,109 +1,218 @@
 #!/usr/bin/env python3
 """
 Monitor real-time de llamadas para debugging
+
+Un loop de descubrimiento lista los rooms una vez por segundo y arranca una
+tarea por cada room nuevo. Cada tarea sigue su room mientras existe y reporta
+las transiciones de estado (agente conectado, SIP marcando, llamada
+establecida, colgada). Todas las tareas comparten un único cliente de LiveKit
+con límite de requests por segundo y de requests simultáneos, así que el
+monitor puede seguir cientos de llamadas sin bloquearse en ninguna.
+
+Uso:
+    python real_time_monitor.py --duration 180 --rps 20 --max-in-flight 8
 """
 
+import argparse
 import asyncio
 from dotenv import load_dotenv
 from livekit import api
 import os
 import time
+from typing import Dict, List
+
+from call_metrics import SIP_CALL_STATUS_ATTRIBUTE
+from rate_limiter import TokenBucket
 
 load_dotenv(dotenv_path=".env.local")
 
-async def monitor_call_lifecycle():
+DISCOVERY_INTERVAL_S = 1.0
+# While a call is being set up its participants are polled every second;
+# once connected only when LiveKit reports a different participant count
+SETUP_POLL_S = 1.0
+SETUP_TIMEOUT_S = 30.0
+
+# Room states reported by the watchers
+STATE_NEW = "nuevo"
+STATE_AGENT = "agente conectado"
+STATE_DIALING = "SIP marcando"
+STATE_CONNECTED = "CONEXIÓN ESTABLECIDA"
+STATE_HANGUP = "SIP colgó"
+STATE_CLOSED = "room cerrado"
+
+
+class MonitorAPI:
+    """LiveKit client shared by every watcher: bounded request rate and in-flight requests"""
+
+    def __init__(self, lk_api: api.LiveKitAPI, rps: float, max_in_flight: int):
+        self.lk_api = lk_api
+        self._bucket = TokenBucket(rate=rps, capacity=rps)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self.requests = 0
+
+    async def _call(self, fn, request):
+        await self._bucket.acquire()
+        async with self._in_flight:
+            self.requests += 1
+            return await fn(request)
+
+    async def list_rooms(self) -> List[api.Room]:
+        response = await self._call(self.lk_api.room.list_rooms, api.ListRoomsRequest())
+        return list(response.rooms)
+
+    async def list_participants(self, room: str) -> List[api.ParticipantInfo]:
+        response = await self._call(self.lk_api.room.list_participants, api.ListParticipantsRequest(room=room))
+        return list(response.participants)
+
+
+def describe(p: api.ParticipantInfo) -> str:
+    audio = len([t for t in p.tracks if t.type == api.TrackType.AUDIO])
+    status = p.attributes.get(SIP_CALL_STATUS_ATTRIBUTE)
+    extra = f", {SIP_CALL_STATUS_ATTRIBUTE}={status}" if status else ""
+    return f"{p.identity} ({api.ParticipantInfo.Kind.Name(p.kind)}, audio={audio}{extra})"
+
+
+class RoomWatcher:
+    """Follows one room and reports its state transitions"""
+
+    def __init__(self, monitor_api: MonitorAPI, room: api.Room, started_at: float):
+        self.api = monitor_api
+        self.name = room.name
+        self.state = STATE_NEW
+        self.seen_at = time.monotonic()
+        self.started_at = started_at
+        self.num_participants = room.num_participants
+        self.identities: set[str] = set()
+        # Set by the discovery loop when LiveKit reports a new participant count
+        self.changed = asyncio.Event()
+        print(f"\n🆕 NUEVO ROOM: {room.name}")
+        print(f"   ⏰ Segundo: {self.seen_at - started_at:.0f}")
+        print(f"   📋 Metadata: {room.metadata}")
+        print(f"   👥 Participantes iniciales: {room.num_participants}")
+
+    def _transition(self, state: str, detail: str = "") -> None:
+        if state != self.state:
+            elapsed = time.monotonic() - self.seen_at
+            print(f"   🔄 {self.name} T+{elapsed:.1f}s: {self.state} -> {state}{detail}")
+            self.state = state
+
+    def update_count(self, num_participants: int) -> None:
+        if num_participants != self.num_participants:
+            self.num_participants = num_participants
+            self.changed.set()
+
+    def _apply(self, participants: List[api.ParticipantInfo]) -> None:
+        identities = {p.identity for p in participants}
+        for p in participants:
+            if p.identity not in self.identities:
+                print(f"   👤 {self.name}: + {describe(p)}")
+        for identity in self.identities - identities:
+            print(f"   👋 {self.name}: - {identity}")
+        self.identities = identities
+
+        agent = [p for p in participants if p.kind == api.ParticipantInfo.Kind.AGENT or p.identity.startswith("agent-")]
+        sip = [p for p in participants if p.kind == api.ParticipantInfo.Kind.SIP or p.identity.startswith("sip_")]
+        if sip:
+            answered = sip[0].attributes.get(SIP_CALL_STATUS_ATTRIBUTE) == "active" or any(
+                t.type == api.TrackType.AUDIO for t in sip[0].tracks
+            )
+            if answered and agent:
+                self._transition(STATE_CONNECTED, f" (📞 {sip[0].identity} 🤖 {agent[0].identity})")
+            elif not answered:
+                self._transition(STATE_DIALING)
+        elif self.state in (STATE_DIALING, STATE_CONNECTED):
+            self._transition(STATE_HANGUP)
+        elif agent:
+            self._transition(STATE_AGENT)
+
+    async def run(self) -> None:
+        try:
+            while True:
+                try:
+                    self._apply(await self.api.list_participants(self.name))
+                except Exception as e:
+                    print(f"   ❌ {self.name}: error obteniendo participantes: {e}")
+
+                setting_up = self.state != STATE_CONNECTED and time.monotonic() - self.seen_at < SETUP_TIMEOUT_S
+                self.changed.clear()
+                if setting_up:
+                    try:
+                        await asyncio.wait_for(self.changed.wait(), timeout=SETUP_POLL_S)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await self.changed.wait()
+        except asyncio.CancelledError:
+            self._transition(STATE_CLOSED)
+            raise
+
+
+async def monitor_call_lifecycle(duration_s: float, rps: float, max_in_flight: int):
     """Monitor completo del ciclo de vida de llamadas"""
-    
+
     lk_api = api.LiveKitAPI(
         url=os.getenv("LIVEKIT_URL"),
         api_key=os.getenv("LIVEKIT_API_KEY"),
         api_secret=os.getenv("LIVEKIT_API_SECRET")
     )
-    
+    monitor_api = MonitorAPI(lk_api, rps, max_in_flight)
+
     print("🔍 MONITOR EN TIEMPO REAL - TDX SDR BOT")
     print("📞 LLAMA AHORA AL +18632190153")
     print("=" * 60)
-    
-    rooms_previos = {}
-    
-    for i in range(180):  # Monitor por 3 minutos
-        try:
-            # Obtener rooms
-            rooms = await lk_api.room.list_rooms(api.ListRoomsRequest())
-            
-            for room in rooms.rooms:
-                if room.name not in rooms_previos:
-                    # Nuevo room detectado
-                    print(f"\n🆕 NUEVO ROOM: {room.name}")
-                    print(f"   ⏰ Segundo: {i}")
-                    print(f"   📋 Metadata: {room.metadata}")
-                    print(f"   👥 Participantes iniciales: {room.num_participants}")
-                    
-                    # Monitorear este room por 30 segundos
-                    for j in range(30):
-                        await asyncio.sleep(1)
-                        
-                        try:
-                            participants = await lk_api.room.list_participants(
-                                api.ListParticipantsRequest(room=room.name)
-                            )
-                            
-                            if j == 0 or len(participants.participants) != rooms_previos.get(room.name, {}).get('participant_count', 0):
-                                print(f"   📊 T+{j}s - Participantes: {len(participants.participants)}")
-                                
-                                for p in participants.participants:
-                                    print(f"      👤 {p.identity}")
-                                    print(f"         📱 Kind: {p.kind}")
-                                    print(f"         🔗 State: {p.state}")
-                                    print(f"         🎵 Audio tracks: {len([t for t in p.tracks if t.type == 1])}")
-                                    print(f"         📹 Video tracks: {len([t for t in p.tracks if t.type == 2])}")
-                                    print(f"         📝 Metadata: {p.metadata[:50] if p.metadata else 'None'}")
-                                
-                                # Check if we have both SIP and agent
-                                sip_participants = [p for p in participants.participants if p.identity.startswith('sip_')]
-                                agent_participants = [p for p in participants.participants if p.identity.startswith('agent-')]
-                                
-                                if sip_participants and agent_participants:
-                                    print(f"   ✅ CONEXIÓN ESTABLECIDA!")
-                                    print(f"      📞 SIP: {sip_participants[0].identity}")
-                                    print(f"      🤖 Agent: {agent_participants[0].identity}")
-                                    break
-                                elif len(participants.participants) >= 2:
-                                    print(f"   ⚠️  2 participantes pero roles no identificados")
-                        
-                        except Exception as e:
-                            print(f"   ❌ Error obteniendo participantes: {e}")
-                    
-                    rooms_previos[room.name] = {
-                        'participant_count': len(participants.participants) if 'participants' in locals() else 0,
-                        'monitored': True
-                    }
-                
-                elif room.name in rooms_previos and not rooms_previos[room.name].get('monitored', False):
-                    # Room existente, verificar cambios
-                    if room.num_participants != rooms_previos[room.name]['participant_count']:
-                        participants = await lk_api.room.list_participants(
-                            api.ListParticipantsRequest(room=room.name)
-                        )
-                        print(f"\n🔄 CAMBIO EN {room.name}")
-                        print(f"   👥 Participantes: {room.num_participants}")
-                        
-                        for p in participants.participants:
-                            print(f"      👤 {p.identity} ({p.state})")
-                        
-                        rooms_previos[room.name]['participant_count'] = room.num_participants
-            
-            # Status cada 30 segundos
-            if i % 30 == 0 and i > 0:
-                print(f"\n⏱️  {i}s - Rooms activos: {len(rooms.rooms)}")
-            
-            await asyncio.sleep(1)
-            
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            await asyncio.sleep(1)
-    
-    print("\n✅ Monitor completado")
+
+    started_at = time.monotonic()
+    watchers: Dict[str, RoomWatcher] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+    last_status = started_at
+
+    try:
+        while time.monotonic() - started_at < duration_s:
+            try:
+                rooms = await monitor_api.list_rooms()
+                current = {room.name for room in rooms}
+
+                for room in rooms:
+                    watcher = watchers.get(room.name)
+                    if watcher is None:
+                        watcher = watchers[room.name] = RoomWatcher(monitor_api, room, started_at)
+                        tasks[room.name] = asyncio.create_task(watcher.run())
+                    else:
+                        watcher.update_count(room.num_participants)
+
+                # Rooms that are gone: stop their watcher
+                for name in list(tasks):
+                    if name not in current:
+                        tasks.pop(name).cancel()
+                        watchers.pop(name)
+
+                now = time.monotonic()
+                if now - last_status >= 30:
+                    last_status = now
+                    connected = sum(1 for w in watchers.values() if w.state == STATE_CONNECTED)
+                    print(f"\n⏱️  {now - started_at:.0f}s - Rooms activos: {len(rooms)}, "
+                          f"conectados: {connected}, requests API: {monitor_api.requests}")
+            except Exception as e:
+                print(f"❌ Error: {e}")
+
+            await asyncio.sleep(DISCOVERY_INTERVAL_S)
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        await lk_api.aclose()
+
+    print(f"\n✅ Monitor completado ({monitor_api.requests} requests API)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor en tiempo real de llamadas")
+    parser.add_argument("--duration", type=float, default=180, help="Segundos de monitoreo")
+    parser.add_argument("--rps", type=float, default=20, help="Requests por segundo a LiveKit (todas las tareas)")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="Requests simultáneos a LiveKit")
+    args = parser.parse_args()
+    asyncio.run(monitor_call_lifecycle(args.duration, args.rps, args.max_in_flight))
+
 
 if __name__ == "__main__":
-    asyncio.run(monitor_call_lifecycle())
\ No newline at end of file
+    main()
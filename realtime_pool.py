@@ -0,0 +1,147 @@
+"""
+Warm pool of OpenAI realtime sessions
+
+Opening a realtime session costs a websocket handshake plus the initial
+session.update (voice, turn detection, temperature). PooledRealtimeModel keeps
+a few sessions connected ahead of time so a call can claim one instantly
+instead of paying that on the critical path when the callee answers.
+
+LiveKit runs every job on its own event loop (in its own process by default),
+so sessions cannot be shared across jobs: each job warms its pool as soon as
+it starts, overlapping the handshake with connect/dial, and the number of
+idle job processes is sized from the dialer rate instead (see
+pool_size_for_rate in pacer.py, used by idle_processes_for_dialer in agent.py).
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from livekit.plugins import openai
+
+logger = logging.getLogger("realtime_pool")
+
+# OpenAI closes realtime sessions after 30 minutes; recycle idle ones well before
+DEFAULT_IDLE_TTL_S = 300.0
+EXPIRY_CHECK_S = 15.0
+CLAIM_LATENCY_SAMPLES = 1000
+
+
+class _WarmSession:
+    __slots__ = ("session", "created_at", "ready_at")
+
+    def __init__(self, session: openai.realtime.RealtimeSession):
+        self.session = session
+        self.created_at = time.monotonic()
+        self.ready_at: Optional[float] = None
+
+
+class PooledRealtimeModel(openai.realtime.RealtimeModel):
+    """RealtimeModel whose session() hands out pre-connected sessions when available"""
+
+    def __init__(
+        self,
+        *,
+        pool_size: int = 1,
+        idle_ttl_s: float = DEFAULT_IDLE_TTL_S,
+        refill: bool = True,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.pool_size = pool_size
+        self.idle_ttl_s = idle_ttl_s
+        self.refill = refill
+        self._warm: List[_WarmSession] = []
+        self._expiry_task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "claim_latency_s": deque(maxlen=CLAIM_LATENCY_SAMPLES),
+        }
+
+    def _open(self) -> _WarmSession:
+        warm = _WarmSession(super().session())
+
+        def _on_server_event(event: dict):
+            if warm.ready_at is None and event.get("type") in ("session.created", "session.updated"):
+                warm.ready_at = time.monotonic()
+                logger.debug(f"realtime session ready in {(warm.ready_at - warm.created_at) * 1000:.0f} ms")
+
+        warm.session.on("openai_server_event_received", _on_server_event)
+        # A session that failed while idle must not be handed to a call
+        warm.session.on("error", lambda _: self._discard(warm))
+        return warm
+
+    def _discard(self, warm: _WarmSession) -> None:
+        if warm in self._warm:
+            self._warm.remove(warm)
+            logger.warning("realtime session in pool failed, discarding it")
+
+    def prewarm_sessions(self) -> None:
+        """Top the pool up to pool_size; needs a running event loop"""
+        while len(self._warm) < self.pool_size:
+            self._warm.append(self._open())
+        if self._expiry_task is None:
+            self._expiry_task = asyncio.create_task(self._expire_idle())
+
+    async def _expire_idle(self) -> None:
+        while True:
+            await asyncio.sleep(EXPIRY_CHECK_S)
+            now = time.monotonic()
+            expired = [w for w in self._warm if now - w.created_at > self.idle_ttl_s]
+            for warm in expired:
+                self._warm.remove(warm)
+                self.stats["expired"] += 1
+                await warm.session.aclose()
+            if expired and self.refill:
+                self.prewarm_sessions()
+
+    def session(self) -> openai.realtime.RealtimeSession:
+        claimed_at = time.monotonic()
+        # Prefer the oldest session that is already connected
+        warm = next((w for w in self._warm if w.ready_at is not None), None)
+        if warm is None and self._warm:
+            warm = self._warm[0]
+
+        if warm is None:
+            self.stats["misses"] += 1
+            logger.info("🔌 Realtime pool miss, opening a new session")
+            warm = self._open()
+        else:
+            self._warm.remove(warm)
+            self.stats["hits"] += 1
+            if self.refill:
+                self.prewarm_sessions()
+
+        # Claim latency: how long the call still waits for the session to be usable
+        if warm.ready_at is not None:
+            self._record_claim(0.0)
+        else:
+            def _on_ready(event: dict):
+                if event.get("type") == "session.created":
+                    self._record_claim(time.monotonic() - claimed_at)
+                    warm.session.off("openai_server_event_received", _on_ready)
+
+            warm.session.on("openai_server_event_received", _on_ready)
+        return warm.session
+
+    def _record_claim(self, latency_s: float) -> None:
+        self.stats["claim_latency_s"].append(latency_s)
+        logger.info(
+            f"🔌 Realtime session claimed, ready after {latency_s * 1000:.0f} ms "
+            f"(hits={self.stats['hits']} misses={self.stats['misses']})"
+        )
+
+    async def aclose(self) -> None:
+        if self._expiry_task:
+            self._expiry_task.cancel()
+            self._expiry_task = None
+        warm, self._warm = self._warm, []
+        for w in warm:
+            await w.session.aclose()
+        logger.info(
+            f"🔌 Realtime pool closed: hits={self.stats['hits']} misses={self.stats['misses']} "
+            f"expired={self.stats['expired']} unclaimed={len(warm)}"
+        )
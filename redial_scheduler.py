@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Redial scheduler for outbound calls
+
+Every outbound attempt records its outcome (no-answer, busy, voicemail,
+completed, SIP error) in a SQLite database. Outcomes that deserve another try
+are rescheduled with a per-outcome exponential backoff and attempt cap; the
+scheduler loop pulls the due calls through a partial index on the due time
+and dispatches them again with the metadata of the original call.
+
+A pulled call is leased: if no attempt is recorded within the lease (the agent
+crashed, never dialed, or runs without TDX_REDIAL_DB), the loop counts it as a
+lost attempt and puts it back in the queue.
+
+The agent records attempts when TDX_REDIAL_DB points at the database; answered
+calls carry their cost record (call_cost.CallCost), which `costs` aggregates
+by campaign and outcome.
+
+Uso:
+    python redial_scheduler.py run --db redial.db
+    python redial_scheduler.py stats --db redial.db
+    python redial_scheduler.py costs --db redial.db --since-days 7
+    python redial_scheduler.py bench --calls 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import string
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from livekit import api
+
+from dnc_index import guard_from_env
+
+load_dotenv(dotenv_path=".env.local")
+
+AGENT_NAME = "tdx-sdr-bot"  # Debe coincidir con agent_name en agent.py
+REDIAL_DB_ENV = "TDX_REDIAL_DB"
+
+# Attempt outcomes
+OUTCOME_NO_ANSWER = "no_answer"
+OUTCOME_BUSY = "busy"
+OUTCOME_VOICEMAIL = "voicemail"
+OUTCOME_COMPLETED = "completed"
+OUTCOME_SIP_ERROR = "sip_error"
+# Claimed but no attempt was recorded before the lease ran out
+OUTCOME_LOST = "lost"
+
+# Call states
+STATUS_SCHEDULED = "scheduled"
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_DONE = "done"
+STATUS_EXHAUSTED = "exhausted"
+STATUS_BLOCKED = "blocked"
+
+# SIP responses LiveKit reports in the create_sip_participant error metadata
+SIP_BUSY_CODES = {486, 600}
+SIP_NO_ANSWER_CODES = {408, 480, 487}
+
+POLL_INTERVAL_S = 5.0
+PULL_BATCH = 500
+# Longer than any call: attempts are recorded at hangup
+CLAIM_LEASE_S = 3600.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    phone_number    TEXT PRIMARY KEY,
+    campaign_id     TEXT,
+    metadata        TEXT NOT NULL,
+    status          TEXT NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    last_outcome    TEXT,
+    next_attempt_at REAL,
+    updated_at      REAL NOT NULL,
+    claimed_at      REAL
+);
+-- Only scheduled calls are indexed, so the due-time scan never touches
+-- finished or in-flight rows no matter how large the table grows
+CREATE INDEX IF NOT EXISTS calls_due ON calls (next_attempt_at)
+    WHERE status = 'scheduled';
+CREATE TABLE IF NOT EXISTS attempts (
+    id           INTEGER PRIMARY KEY,
+    phone_number TEXT NOT NULL,
+    campaign_id  TEXT,
+    room         TEXT,
+    outcome      TEXT NOT NULL,
+    sip_status   TEXT,
+    duration_s   REAL,
+    attempted_at REAL NOT NULL,
+    cost         TEXT
+);
+CREATE INDEX IF NOT EXISTS attempts_phone ON attempts (phone_number);
+"""
+
+# Columns added after the first release: (table, column, type)
+MIGRATIONS = [
+    ("attempts", "cost", "TEXT"),
+    ("calls", "claimed_at", "REAL"),
+]
+
+# Indexes on migrated columns, created once the migrations ran
+POST_MIGRATION_SCHEMA = """
+CREATE INDEX IF NOT EXISTS calls_claimed ON calls (claimed_at)
+    WHERE status = 'in_progress';
+"""
+
+# costs: JSON paths in the attempt's cost record summed per campaign and outcome
+COST_FIELDS = {
+    "usd": "$.usd.total",
+    "usd_realtime": "$.usd.realtime",
+    "usd_sip": "$.usd.sip",
+    "input_audio_s": "$.input_audio_s",
+    "output_audio_s": "$.output_audio_s",
+    "audio_in_tokens": "$.realtime_tokens.audio_in",
+    "audio_out_tokens": "$.realtime_tokens.audio_out",
+    "text_in_tokens": "$.realtime_tokens.text_in",
+    "sip_s": "$.sip_s",
+    "cpu_s": "$.cpu_s",
+}
+
+
+class RetryRule:
+    """Backoff for one outcome: base_s * multiplier^(attempt-1), capped, up to max_attempts"""
+
+    __slots__ = ("max_attempts", "base_s", "multiplier", "max_delay_s")
+
+    def __init__(self, max_attempts: int, base_s: float, multiplier: float = 2.0, max_delay_s: float = 86400.0):
+        self.max_attempts = max_attempts
+        self.base_s = base_s
+        self.multiplier = multiplier
+        self.max_delay_s = max_delay_s
+
+    def delay(self, attempts: int) -> Optional[float]:
+        """Seconds until the next try after `attempts` tries, or None when out of attempts"""
+        if attempts >= self.max_attempts:
+            return None
+        return min(self.max_delay_s, self.base_s * self.multiplier ** (attempts - 1))
+
+
+DEFAULT_RETRY_RULES: Dict[str, RetryRule] = {
+    OUTCOME_NO_ANSWER: RetryRule(max_attempts=4, base_s=3600),
+    OUTCOME_BUSY: RetryRule(max_attempts=5, base_s=600),
+    OUTCOME_VOICEMAIL: RetryRule(max_attempts=3, base_s=4 * 3600),
+    OUTCOME_SIP_ERROR: RetryRule(max_attempts=2, base_s=900),
+    # A number that keeps crashing the agent must not be retried forever
+    OUTCOME_LOST: RetryRule(max_attempts=3, base_s=900),
+}
+
+
+def classify_sip_error(error: Exception) -> Tuple[str, Optional[str]]:
+    """Map a create_sip_participant failure to (outcome, SIP status)"""
+    metadata = getattr(error, "metadata", None) or {}
+    status = metadata.get("sip_status_code")
+    try:
+        code = int(status) if status else None
+    except ValueError:
+        code = None
+    if code in SIP_BUSY_CODES:
+        return OUTCOME_BUSY, status
+    if code in SIP_NO_ANSWER_CODES:
+        return OUTCOME_NO_ANSWER, status
+    return OUTCOME_SIP_ERROR, status
+
+
+class RedialScheduler:
+    """SQLite-backed record of attempts and queue of redials"""
+
+    def __init__(self, path: str, rules: Optional[Dict[str, RetryRule]] = None):
+        self.path = path
+        self.rules = rules or DEFAULT_RETRY_RULES
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        # WAL lets the agents write attempts while the scheduler loop reads
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        for table, column, kind in MIGRATIONS:
+            columns = {row[1] for row in self._db.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+        self._db.executescript(POST_MIGRATION_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def record_attempt(
+        self,
+        phone_number: str,
+        outcome: str,
+        *,
+        metadata: Dict[str, Any],
+        room: Optional[str] = None,
+        sip_status: Optional[str] = None,
+        duration_s: Optional[float] = None,
+        cost: Optional[Dict[str, Any]] = None,
+        now: Optional[float] = None,
+    ) -> Optional[float]:
+        """Store an attempt and schedule the redial; returns when it is due (None = no redial)"""
+        now = now if now is not None else time.time()
+        campaign_id = metadata.get("campaign_id")
+
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute(
+                "INSERT INTO attempts (phone_number, campaign_id, room, outcome, sip_status, duration_s, attempted_at,"
+                " cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (phone_number, campaign_id, room, outcome, sip_status, duration_s, now,
+                 json.dumps(cost) if cost is not None else None),
+            )
+            row = self._db.execute("SELECT attempts FROM calls WHERE phone_number = ?", (phone_number,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+
+            rule = self.rules.get(outcome)
+            delay = rule.delay(attempts) if rule else None
+            if outcome == OUTCOME_COMPLETED:
+                status, next_at = STATUS_DONE, None
+            elif delay is None:
+                status, next_at = STATUS_EXHAUSTED, None
+            else:
+                status, next_at = STATUS_SCHEDULED, now + delay
+
+            self._db.execute(
+                "INSERT INTO calls (phone_number, campaign_id, metadata, status, attempts, last_outcome,"
+                " next_attempt_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (phone_number) DO UPDATE SET status = excluded.status,"
+                " attempts = excluded.attempts, last_outcome = excluded.last_outcome,"
+                " next_attempt_at = excluded.next_attempt_at, updated_at = excluded.updated_at, claimed_at = NULL",
+                (phone_number, campaign_id, json.dumps(metadata), status, attempts, outcome, next_at, now),
+            )
+        return next_at
+
+    def pull_due(self, limit: int = PULL_BATCH, now: Optional[float] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """Claim up to `limit` due calls (oldest first) and return (phone_number, metadata)
+
+        The claim is a lease: reap_stale() requeues it unless an attempt is recorded in time.
+        """
+        now = now if now is not None else time.time()
+        # One statement: the claimed rows leave the partial index, so two loops
+        # pulling at the same time never get the same call
+        rows = self._db.execute(
+            "UPDATE calls SET status = ?, updated_at = ?, claimed_at = ? WHERE phone_number IN ("
+            " SELECT phone_number FROM calls WHERE status = 'scheduled' AND next_attempt_at <= ?"
+            " ORDER BY next_attempt_at LIMIT ?)"
+            " RETURNING phone_number, metadata",
+            (STATUS_IN_PROGRESS, now, now, now, limit),
+        ).fetchall()
+        return [(phone_number, json.loads(metadata)) for phone_number, metadata in rows]
+
+    def reap_stale(self, lease_s: float = CLAIM_LEASE_S, now: Optional[float] = None) -> List[str]:
+        """Requeue claimed calls whose lease ran out with no attempt recorded; returns them"""
+        now = now if now is not None else time.time()
+        rule = self.rules.get(OUTCOME_LOST)
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute(
+                "SELECT phone_number, attempts FROM calls WHERE status = 'in_progress' AND claimed_at < ?",
+                (now - lease_s,),
+            ).fetchall()
+            for phone_number, attempts in rows:
+                delay = rule.delay(attempts + 1) if rule else None
+                status = STATUS_EXHAUSTED if delay is None else STATUS_SCHEDULED
+                self._db.execute(
+                    "UPDATE calls SET status = ?, attempts = ?, last_outcome = ?, next_attempt_at = ?,"
+                    " updated_at = ?, claimed_at = NULL WHERE phone_number = ?",
+                    (status, attempts + 1, OUTCOME_LOST, None if delay is None else now + delay, now, phone_number),
+                )
+        return [phone_number for phone_number, _ in rows]
+
+    def release(self, phone_numbers: List[str], delay_s: float = 0.0) -> None:
+        """Put claimed calls back in the queue (e.g. the dispatch itself failed)"""
+        due = time.time() + delay_s
+        self._db.executemany(
+            "UPDATE calls SET status = 'scheduled', next_attempt_at = ?, claimed_at = NULL WHERE phone_number = ?",
+            [(due, phone_number) for phone_number in phone_numbers],
+        )
+
+    def block(self, phone_number: str) -> None:
+        """Take a claimed call out of the queue for good (e.g. added to the DNC list)"""
+        self._db.execute(
+            "UPDATE calls SET status = ?, next_attempt_at = NULL, updated_at = ?, claimed_at = NULL"
+            " WHERE phone_number = ?",
+            (STATUS_BLOCKED, time.time(), phone_number),
+        )
+
+    def next_due_at(self) -> Optional[float]:
+        row = self._db.execute(
+            "SELECT MIN(next_attempt_at) FROM calls WHERE status = 'scheduled'"
+        ).fetchone()
+        return row[0]
+
+    def stats(self) -> Dict[str, Any]:
+        by_status = dict(self._db.execute("SELECT status, COUNT(*) FROM calls GROUP BY status").fetchall())
+        by_outcome = dict(self._db.execute("SELECT outcome, COUNT(*) FROM attempts GROUP BY outcome").fetchall())
+        return {"calls": by_status, "attempts": by_outcome}
+
+    def costs(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Cost records summed per (campaign, outcome), most expensive first"""
+        sums = ", ".join(f"SUM(json_extract(cost, '{path}'))" for path in COST_FIELDS.values())
+        rows = self._db.execute(
+            f"SELECT campaign_id, outcome, COUNT(*), {sums} FROM attempts"
+            " WHERE cost IS NOT NULL AND attempted_at >= ? GROUP BY campaign_id, outcome",
+            (since or 0.0,),
+        ).fetchall()
+        report = []
+        for campaign_id, outcome, calls, *totals in rows:
+            entry = {"campaign_id": campaign_id, "outcome": outcome, "calls": calls}
+            entry.update({name: round(total or 0.0, 4) for name, total in zip(COST_FIELDS, totals)})
+            entry["usd_per_call"] = round(entry["usd"] / calls, 4)
+            report.append(entry)
+        return sorted(report, key=lambda e: e["usd"], reverse=True)
+
+
+def scheduler_from_env() -> Optional[RedialScheduler]:
+    """Scheduler for the agent, or None when TDX_REDIAL_DB is not set"""
+    path = os.getenv(REDIAL_DB_ENV)
+    return RedialScheduler(path) if path else None
+
+
+async def dispatch_redial(lk_api: api.LiveKitAPI, metadata: Dict[str, Any]) -> str:
+    campaign = metadata.get("campaign_id") or "redial"
+    suffix = "".join(random.choices(string.ascii_letters + string.digits, k=8))
+    room_name = f"outbound-{campaign}-{suffix}"
+    await lk_api.agent_dispatch.create_dispatch(
+        api.CreateAgentDispatchRequest(agent_name=AGENT_NAME, room=room_name, metadata=json.dumps(metadata))
+    )
+    return room_name
+
+
+async def run_loop(args: argparse.Namespace) -> None:
+    scheduler = RedialScheduler(args.db)
+    guard = guard_from_env()
+    print(f"🔁 Redial scheduler sobre {args.db}: {scheduler.stats()['calls']}")
+
+    async with api.LiveKitAPI(
+        url=os.getenv("LIVEKIT_URL"),
+        api_key=os.getenv("LIVEKIT_API_KEY"),
+        api_secret=os.getenv("LIVEKIT_API_SECRET"),
+    ) as lk_api:
+        semaphore = asyncio.Semaphore(args.max_in_flight)
+
+        async def redial(phone_number: str, metadata: Dict[str, Any]) -> None:
+            # Redials are expected within the dedupe window; only the DNC list applies
+            reason = guard.check(phone_number, dedupe=False)
+            if reason:
+                print(f"🚫 Redial {phone_number}: {reason}")
+                scheduler.block(phone_number)
+                return
+            async with semaphore:
+                try:
+                    room_name = await dispatch_redial(lk_api, metadata)
+                    print(f"📞 Redial {phone_number} -> {room_name}")
+                except Exception as e:
+                    print(f"❌ Redial {phone_number}: {e}")
+                    scheduler.release([phone_number], delay_s=POLL_INTERVAL_S * 12)
+
+        try:
+            while True:
+                lost = scheduler.reap_stale(args.lease_s)
+                if lost:
+                    print(f"⏰ {len(lost)} llamadas sin resultado tras {args.lease_s / 60:.0f} min, de vuelta a la cola")
+                due = scheduler.pull_due(args.batch)
+                if due:
+                    await asyncio.gather(*(redial(phone, metadata) for phone, metadata in due))
+                    continue
+                next_at = scheduler.next_due_at()
+                wait = POLL_INTERVAL_S if next_at is None else max(0.0, min(POLL_INTERVAL_S, next_at - time.time()))
+                await asyncio.sleep(wait)
+        finally:
+            scheduler.close()
+
+
+def run_bench(calls: int, batch: int) -> None:
+    """Time recording attempts and pulling due calls out of a large queue"""
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = RedialScheduler(os.path.join(tmp, "bench.db"))
+        now = time.time()
+        outcomes = [OUTCOME_NO_ANSWER, OUTCOME_BUSY, OUTCOME_VOICEMAIL, OUTCOME_COMPLETED]
+        metadata = {"campaign_id": "bench", "dial_info": {}, "prospect_info": {}}
+
+        started = time.perf_counter()
+        for i in range(calls):
+            phone = f"+1555{i:07d}"
+            scheduler.record_attempt(phone, outcomes[i % len(outcomes)], metadata=metadata,
+                                     now=now - random.random() * 86400)
+        record_s = time.perf_counter() - started
+
+        pulled = 0
+        pulls = []
+        while True:
+            started = time.perf_counter()
+            due = scheduler.pull_due(batch, now=now)
+            pulls.append(time.perf_counter() - started)
+            if not due:
+                break
+            pulled += len(due)
+
+        plan = scheduler._db.execute(
+            "EXPLAIN QUERY PLAN SELECT phone_number FROM calls WHERE status = 'scheduled'"
+            " AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?", (now, batch)
+        ).fetchall()
+        scheduler.close()
+
+    print("🔁 REDIAL SCHEDULER - BENCHMARK")
+    print("=" * 50)
+    print(f"   record_attempt: {calls} en {record_s:.2f}s ({record_s / calls * 1e6:.0f} µs/intento)")
+    print(f"   pull_due:       {pulled} debidas en {len(pulls)} lotes de {batch}, "
+          f"{sum(pulls) / max(1, pulled) * 1e6:.1f} µs/llamada, lote vacío {pulls[-1] * 1e3:.2f} ms")
+    print(f"   plan:           {plan[0][-1]}")
+
+
+def print_costs(report: List[Dict[str, Any]]) -> None:
+    print(f"💵 {'campaña':<20} {'resultado':<12} {'llamadas':>8} {'USD':>9} {'USD/llam':>9} "
+          f"{'realtime':>9} {'SIP':>8} {'audio in':>9} {'tok in':>9} {'tok out':>9} {'CPU s':>7}")
+    for e in report:
+        print(f"   {str(e['campaign_id'] or '-')[:20]:<20} {e['outcome']:<12} {e['calls']:>8} {e['usd']:>9.2f} "
+              f"{e['usd_per_call']:>9.3f} {e['usd_realtime']:>9.2f} {e['usd_sip']:>8.2f} "
+              f"{e['input_audio_s'] / 60:>7.1f}m {e['audio_in_tokens'] + e['text_in_tokens']:>9.0f} "
+              f"{e['audio_out_tokens']:>9.0f} {e['cpu_s']:>7.1f}")
+    if not report:
+        print("   - (sin intentos con costo registrado)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Programador de rellamadas para tdx-sdr-bot")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Despachar las rellamadas a medida que vencen")
+    run.add_argument("--db", default=os.getenv(REDIAL_DB_ENV, "redial.db"))
+    run.add_argument("--batch", type=int, default=PULL_BATCH, help="Llamadas por consulta")
+    run.add_argument("--max-in-flight", type=int, default=10, help="Dispatches simultáneos")
+    run.add_argument("--lease-s", type=float, default=CLAIM_LEASE_S,
+                     help="Segundos sin resultado antes de devolver una llamada tomada a la cola")
+
+    stats = sub.add_parser("stats", help="Resumen de la cola")
+    stats.add_argument("--db", default=os.getenv(REDIAL_DB_ENV, "redial.db"))
+
+    costs = sub.add_parser("costs", help="Costo de las llamadas por campaña y resultado")
+    costs.add_argument("--db", default=os.getenv(REDIAL_DB_ENV, "redial.db"))
+    costs.add_argument("--since-days", type=float, help="Solo los intentos de los últimos N días")
+    costs.add_argument("--json", action="store_true")
+
+    bench = sub.add_parser("bench", help="Benchmark con una base temporal")
+    bench.add_argument("--calls", type=int, default=100000)
+    bench.add_argument("--batch", type=int, default=PULL_BATCH)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        try:
+            asyncio.run(run_loop(args))
+        except KeyboardInterrupt:
+            print("\n👋 Scheduler detenido")
+    elif args.command == "stats":
+        scheduler = RedialScheduler(args.db)
+        print(json.dumps(scheduler.stats(), indent=2))
+        scheduler.close()
+    elif args.command == "costs":
+        scheduler = RedialScheduler(args.db)
+        since = time.time() - args.since_days * 86400 if args.since_days else None
+        report = scheduler.costs(since)
+        scheduler.close()
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_costs(report)
+    else:
+        run_bench(args.calls, args.batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,863 @@
+#!/usr/bin/env python3
+"""
+Replay offline de llamadas con un modelo realtime simulado
+
+Corre el `entrypoint` real de agent.py y TDXSDRBot sin red: el modelo
+realtime es un stub determinista (respuestas y tool calls de un guion, con
+latencias configurables), el audio del prospecto sale de una grabación WAV o
+se sintetiza a partir del guion, y LiveKit/SIP/Microsoft Graph se reemplazan
+por dobles locales con latencias configurables.
+
+Para cada turno se reporta:
+    respuesta    fin de la voz del prospecto -> primer audio del agente
+    vad          silencio de la fase (agent.TURN_DETECTION_BY_PHASE) antes de cerrar el turno
+    overhead     respuesta - vad - latencia configurada del modelo (nuestro pipeline)
+    tools        ejecución del cuerpo de las tools (check_availability, schedule_meeting...),
+                 atribuida al turno que las pidió
+y, cuando el prospecto habla encima del agente, cuánto tiempo siguió sonando
+el agente (talk-over), con y sin --barge-in.
+Con --baseline compara contra un reporte anterior y sale con código 1 si el
+overhead o las tools empeoran más que --max-regression-ms.
+
+Uso:
+    python replay_harness.py                          # guion de ejemplo
+    python replay_harness.py --script llamada.json --speed 4 --report actual.json
+    python replay_harness.py --script llamada.json --baseline base.json --max-regression-ms 30
+    python replay_harness.py --script interrupciones.json --barge-in   # barge-in local (TDX_BARGE_IN)
+
+Formato del guion (JSON):
+    {"room": "call-573153041548",
+     "metadata": {"dial_info": {"phone_number": "+573153041548"}, "prospect_info": {...}},
+     "audio": "grabacion.wav",            # opcional, mono 16 bits
+     "dial_ms": 2500, "reply_latency_ms": 450,
+     "vad_event_delay_ms": 300,           # red + VAD del servidor antes de input_speech_started
+     "graph_latency_ms": {"check_availability": 350, "create_meeting": 900},
+     "turns": [{"user_s": 1.8, "pause_s": 4, "reply": "...", "latency_ms": 400,
+                "tool_calls": [{"name": "check_availability", "arguments": {}}],
+                "after_tool": "..."}]}
+"""
+
+import argparse
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import math
+import os
+import re
+import sys
+import time
+import wave
+from array import array
+from typing import Any, Dict, List, Optional
+
+# The harness must never reach the network, whatever .env.local says
+# (the cascaded pipeline, directly or as a fallback, talks to the real OpenAI APIs)
+for _var in ("TDX_METRICS_URL", "TDX_REDIAL_DB", "TDX_DNC_FILES", "TDX_PIPELINE", "TDX_REALTIME_SLO_MS"):
+    os.environ.pop(_var, None)
+
+from livekit import api, rtc
+from livekit.agents import RunContext, llm, utils
+from livekit.agents.job import _JobContextVar
+from livekit.agents.voice import io
+from livekit.agents.types import NOT_GIVEN, NotGivenOr
+
+import agent as agent_module
+from barge_in import BargeInDetector
+from ops_dashboard import percentile
+
+logger = logging.getLogger("replay")
+
+INPUT_FRAME_MS = 20
+OUTPUT_SAMPLE_RATE = 24000
+OUTPUT_FRAME_MS = 20
+# Stub server VAD; the silence window follows the agent's phase (update_options)
+VAD_RMS_THRESHOLD = 300.0
+VAD_MIN_SPEECH_MS = 100
+# Spoken length of a stub reply
+SECONDS_PER_CHAR = 0.055
+DEFAULT_REPLY_LATENCY_MS = 450
+DEFAULT_LEAD_S = 4.0
+DEFAULT_PAUSE_S = 4.0
+
+DEFAULT_SCRIPT: Dict[str, Any] = {
+    "room": "call-573153041548",
+    "metadata": {
+        "dial_info": {"phone_number": "+573153041548", "transfer_to": "+18632190153"},
+        "prospect_info": {"company_name": "Empresa Demo", "contact_name": "Laura"},
+    },
+    "dial_ms": 2500,
+    "reply_latency_ms": 450,
+    "graph_latency_ms": {"check_availability": 350, "create_meeting": 900},
+    "turns": [
+        {"user_s": 1.5, "reply": "¡Excelente! Cuénteme, ¿cómo manejan hoy la atención de sus clientes?"},
+        {"user_s": 3.0, "reply": "Entiendo. ¿Qué presupuesto y plazos tienen en mente?",
+         "tool_calls": [{"name": "qualify_prospect", "arguments": {
+             "budget_range": "10k-50k", "authority_level": "decision_maker",
+             "need_urgency": "high", "timeline": "3_months"}}],
+         "after_tool": "Perfecto. ¿Me da su email letra por letra?", "pause_s": 10.0},
+        {"user_s": 4.0, "reply": "Gracias, lo confirmo.",
+         "tool_calls": [{"name": "collect_email", "arguments": {
+             "email": "laura@empresademo.com", "spelled_out": "l-a-u-r-a arroba empresademo punto com"}}],
+         "after_tool": "Su email es laura@empresademo.com. ¿Tiene preferencia de día?", "pause_s": 6.0},
+        {"user_s": 1.2, "reply": "Déjeme revisar la agenda.",
+         "tool_calls": [{"name": "check_availability", "arguments": {
+             "preferred_date": "", "preferred_time": "mañana"}}],
+         "after_tool": "Tengo mañana a las diez o el jueves a las tres. ¿Cuál prefiere?", "pause_s": 14.0},
+        {"user_s": 1.5, "reply": "Listo, agendando la reunión.",
+         "tool_calls": [{"name": "schedule_meeting", "arguments": {
+             "email": "laura@empresademo.com", "date": "2030-01-15", "time": "10:00",
+             "meeting_type": "discovery_call"}}],
+         "after_tool": "¡Listo! Le llegó la invitación de Teams. ¿Alguna pregunta?", "pause_s": 12.0},
+        {"user_s": 1.0, "reply": "¡Muchas gracias, Laura! Que tenga buen día."},
+    ],
+}
+
+
+def rms(samples: memoryview) -> float:
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+# --- stub realtime model -------------------------------------------------------
+
+class TurnLog:
+    """What happened in one user turn, as seen by the stub model and the audio output"""
+
+    __slots__ = ("index", "phase", "user_stopped_at", "vad_s", "model_latency_s", "first_audio_at",
+                 "tools", "tool_s")
+
+    def __init__(self, index: int, phase: str, user_stopped_at: float, vad_s: float, model_latency_s: float):
+        self.index = index
+        self.phase = phase
+        # End of the caller's speech; the VAD closes the turn vad_s later
+        self.user_stopped_at = user_stopped_at
+        self.vad_s = vad_s
+        self.model_latency_s = model_latency_s
+        self.first_audio_at: Optional[float] = None
+        self.tools: List[str] = []
+        # Run time of each tool body this turn called
+        self.tool_s: List[float] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        response = self.first_audio_at - self.user_stopped_at if self.first_audio_at else None
+        # The framework runs a turn's tools concurrently: the slowest one is what the caller waits for
+        tools = max(self.tool_s) if self.tool_s else None
+        return {
+            "turn": self.index,
+            "phase": self.phase,
+            "response_ms": round(response * 1000, 1) if response is not None else None,
+            "vad_ms": round(self.vad_s * 1000, 1),
+            "model_ms": round(self.model_latency_s * 1000, 1),
+            "overhead_ms": (
+                round((response - self.vad_s - self.model_latency_s) * 1000, 1) if response is not None else None
+            ),
+            "tools": self.tools,
+            "tools_ms": round(tools * 1000, 1) if tools is not None else None,
+        }
+
+
+class ReplayLog:
+    def __init__(self):
+        self.turns: List[TurnLog] = []
+        self.session_started_at = time.monotonic()
+        self.greeting_audio_at: Optional[float] = None
+        self.generations = 0
+        self.interrupts = 0
+        # Scripted tool call_id -> the turn that issued it
+        self.tool_calls: Dict[str, TurnLog] = {}
+        # Running tool task -> seconds it spent waiting on its own spoken feedback
+        self._tool_speech_s: Dict[asyncio.Task, float] = {}
+        # Agent audio handed to the output plays until here; caller talk-over is measured against it
+        self.agent_audible_until = 0.0
+        self.talk_over_ms: List[float] = []
+        self._talk_over_from: Optional[float] = None
+        self._caller_voiced = False
+
+    def on_agent_audio(self, at: float) -> None:
+        """First frame of each agent audio segment"""
+        if self.greeting_audio_at is None and not self.turns:
+            self.greeting_audio_at = at
+            return
+        if not self.turns:
+            return
+        turn = self.turns[-1]
+        if turn.first_audio_at is None:
+            turn.first_audio_at = at
+
+    def on_tool_started(self, task: asyncio.Task) -> None:
+        self._tool_speech_s[task] = 0.0
+
+    def on_reply_requested(self, task: Optional[asyncio.Task], handle: Any) -> None:
+        """A tool saying "un momento" and awaiting it: that playout is not the tool's work"""
+        if task not in self._tool_speech_s:
+            return
+        requested_at = time.monotonic()
+
+        def done(_) -> None:
+            if task in self._tool_speech_s:
+                self._tool_speech_s[task] += time.monotonic() - requested_at
+
+        handle.add_done_callback(done)
+
+    def on_tool_done(self, task: asyncio.Task, call_id: str, seconds: float) -> None:
+        speech_s = self._tool_speech_s.pop(task, 0.0)
+        turn = self.tool_calls.pop(call_id, None)
+        if turn is not None:
+            turn.tool_s.append(max(0.0, seconds - speech_s))
+
+    def on_caller_frame(self, at: float, voiced: bool) -> None:
+        """Caller speech starting while the agent is audible: time until the agent goes quiet"""
+        if self._talk_over_from is not None:
+            if self.agent_audible_until <= at:
+                self.talk_over_ms.append(round((self.agent_audible_until - self._talk_over_from) * 1000, 1))
+                self._talk_over_from = None
+        elif voiced and not self._caller_voiced and self.agent_audible_until > at:
+            self._talk_over_from = at
+        self._caller_voiced = voiced
+
+
+def spoken_text(instructions: NotGivenOr[str]) -> str:
+    """What the stub says for generate_reply(instructions=...): the quoted line if there is one"""
+    if not instructions:
+        return ""
+    quoted = re.search(r"'([^']+)'", instructions)
+    return quoted.group(1) if quoted else instructions[:80]
+
+
+class StubRealtimeSession(llm.RealtimeSession):
+    """Deterministic realtime session: energy VAD on pushed audio, scripted replies and tool calls"""
+
+    def __init__(self, model: "StubRealtimeModel"):
+        super().__init__(model)
+        self._model = model
+        self._chat_ctx = llm.ChatContext.empty()
+        self._tools = llm.ToolContext.empty()
+        self._speech_ms = 0
+        self._silence_ms = 0
+        self._speaking = False
+        self._script_turn = 0
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def chat_ctx(self) -> llm.ChatContext:
+        return self._chat_ctx.copy()
+
+    @property
+    def tools(self) -> llm.ToolContext:
+        return self._tools.copy()
+
+    async def update_instructions(self, instructions: str) -> None:
+        pass
+
+    async def update_chat_ctx(self, chat_ctx: llm.ChatContext) -> None:
+        self._chat_ctx = chat_ctx.copy()
+
+    async def update_tools(self, tools: List[Any]) -> None:
+        self._tools = llm.ToolContext(tools)
+
+    def update_options(self, *, tool_choice: NotGivenOr[Any] = NOT_GIVEN) -> None:
+        pass
+
+    def push_video(self, frame: rtc.VideoFrame) -> None:
+        pass
+
+    def commit_audio(self) -> None:
+        pass
+
+    def clear_audio(self) -> None:
+        pass
+
+    def interrupt(self) -> None:
+        self._model.log.interrupts += 1
+
+    def truncate(self, *, message_id: str, audio_end_ms: int) -> None:
+        pass
+
+    def push_audio(self, frame: rtc.AudioFrame) -> None:
+        frame_ms = frame.samples_per_channel * 1000 // frame.sample_rate
+        if rms(frame.data) >= VAD_RMS_THRESHOLD:
+            self._speech_ms += frame_ms
+            self._silence_ms = 0
+            if not self._speaking and self._speech_ms >= VAD_MIN_SPEECH_MS:
+                self._speaking = True
+                # The event reaches the worker after the network round trip
+                delay_s = self._model.script.get("vad_event_delay_ms", 0) / 1000
+                asyncio.get_running_loop().call_later(
+                    delay_s, self.emit, "input_speech_started", llm.InputSpeechStartedEvent()
+                )
+        else:
+            self._silence_ms += frame_ms
+            if self._speaking and self._silence_ms >= self._model.silence_ms:
+                self._speaking = False
+                self._speech_ms = 0
+                self.emit("input_speech_stopped", llm.InputSpeechStoppedEvent(user_transcription_enabled=False))
+                self._on_user_turn()
+            elif not self._speaking:
+                self._speech_ms = 0
+
+    def _on_user_turn(self) -> None:
+        turns = self._model.script.get("turns", [])
+        step = turns[self._script_turn] if self._script_turn < len(turns) else {"reply": "Entiendo."}
+        self._script_turn += 1
+        latency_s = step.get("latency_ms", self._model.script.get("reply_latency_ms", DEFAULT_REPLY_LATENCY_MS)) / 1000
+        # The silence was played at the replay speed
+        vad_s = self._silence_ms / 1000 / self._model.speed
+        turn = TurnLog(len(self._model.log.turns) + 1, self._model.phase, time.monotonic() - vad_s, vad_s, latency_s)
+        self._model.log.turns.append(turn)
+        self._model.pending_after_tool = step.get("after_tool")
+
+        async def respond() -> None:
+            await asyncio.sleep(latency_s)
+            calls = [
+                llm.FunctionCall(call_id=f"call_{turn.index}_{i}", name=c["name"],
+                                 arguments=json.dumps(c.get("arguments", {})))
+                for i, c in enumerate(step.get("tool_calls", []))
+            ]
+            turn.tools = [c.name for c in calls]
+            for call in calls:
+                self._model.log.tool_calls[call.call_id] = turn
+            self.emit("generation_created", self._generation(step.get("reply", ""), calls, user_initiated=False))
+
+        self._spawn(respond())
+
+    def generate_reply(self, *, instructions: NotGivenOr[str] = NOT_GIVEN) -> asyncio.Future:
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        text = spoken_text(instructions)
+        if not text:
+            # A reply without instructions is the framework asking for the answer to tool results
+            text = self._model.pending_after_tool or "Perfecto."
+            self._model.pending_after_tool = None
+        latency_s = self._model.script.get("reply_latency_ms", DEFAULT_REPLY_LATENCY_MS) / 1000
+
+        async def respond() -> None:
+            await asyncio.sleep(latency_s)
+            if not future.done():
+                future.set_result(self._generation(text, [], user_initiated=True))
+
+        self._spawn(respond())
+        return future
+
+    def _generation(self, text: str, calls: List[llm.FunctionCall], user_initiated: bool) -> llm.GenerationCreatedEvent:
+        self._model.log.generations += 1
+        message_ch: utils.aio.Chan = utils.aio.Chan()
+        function_ch: utils.aio.Chan = utils.aio.Chan()
+        text_ch: utils.aio.Chan = utils.aio.Chan()
+        audio_ch: utils.aio.Chan = utils.aio.Chan()
+
+        if text:
+            text_ch.send_nowait(text)
+            for frame in self._model.reply_frames(len(text)):
+                audio_ch.send_nowait(frame)
+        text_ch.close()
+        audio_ch.close()
+        message_ch.send_nowait(llm.MessageGeneration(
+            message_id=utils.shortuuid("stub_"), text_stream=text_ch, audio_stream=audio_ch
+        ))
+        message_ch.close()
+        for call in calls:
+            function_ch.send_nowait(call)
+        function_ch.close()
+        return llm.GenerationCreatedEvent(
+            message_stream=message_ch, function_stream=function_ch, user_initiated=user_initiated
+        )
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def aclose(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class StubRealtimeModel(llm.RealtimeModel):
+    """Drop-in for agent.build_realtime_model(): same prewarm/aclose surface as PooledRealtimeModel"""
+
+    def __init__(self, script: Dict[str, Any], log: ReplayLog, speed: float = 1.0):
+        super().__init__(capabilities=llm.RealtimeCapabilities(
+            message_truncation=True,
+            turn_detection=True,
+            user_transcription=False,
+            auto_tool_reply_generation=False,
+        ))
+        self.script = script
+        self.log = log
+        self.pending_after_tool: Optional[str] = None
+        self.speed = speed
+        self.phase = agent_module.PHASE_GREETING
+        self.silence_ms = agent_module.TURN_DETECTION_BY_PHASE[self.phase]["silence_duration_ms"]
+        self._sessions: List[StubRealtimeSession] = []
+        samples = OUTPUT_SAMPLE_RATE * OUTPUT_FRAME_MS // 1000
+        tone = array("h", (int(4000 * math.sin(2 * math.pi * 200 * i / OUTPUT_SAMPLE_RATE)) for i in range(samples)))
+        self._frame_bytes = tone.tobytes()
+        self._frame_samples = samples
+
+    def prewarm_sessions(self) -> None:
+        pass
+
+    def update_options(self, *, turn_detection: NotGivenOr[Any] = NOT_GIVEN, **kwargs) -> None:
+        """Same entry point TDXSDRBot.set_phase uses on the OpenAI model"""
+        if turn_detection:
+            self.silence_ms = turn_detection.silence_duration_ms
+            self.phase = next(
+                (phase for phase, opts in agent_module.TURN_DETECTION_BY_PHASE.items()
+                 if opts["silence_duration_ms"] == self.silence_ms),
+                "custom",
+            )
+
+    def reply_frames(self, chars: int) -> List[rtc.AudioFrame]:
+        frames = max(1, int(chars * SECONDS_PER_CHAR * 1000 / OUTPUT_FRAME_MS))
+        return [rtc.AudioFrame(self._frame_bytes, OUTPUT_SAMPLE_RATE, 1, self._frame_samples) for _ in range(frames)]
+
+    def session(self) -> StubRealtimeSession:
+        session = StubRealtimeSession(self)
+        self._sessions.append(session)
+        return session
+
+    async def aclose(self) -> None:
+        for session in self._sessions:
+            await session.aclose()
+
+
+# --- audio in / out -----------------------------------------------------------
+
+def script_audio(script: Dict[str, Any]) -> tuple[int, array]:
+    """The prospect's side of the call: the recording, or speech bursts built from the script"""
+    if script.get("audio"):
+        with wave.open(script["audio"], "rb") as w:
+            if w.getnchannels() != 1 or w.getsampwidth() != 2:
+                raise ValueError(f"{script['audio']}: se requiere WAV mono de 16 bits")
+            samples = array("h")
+            samples.frombytes(w.readframes(w.getnframes()))
+            return w.getframerate(), samples
+
+    rate = 16000
+    samples = array("h", bytes(2 * int(rate * script.get("lead_s", DEFAULT_LEAD_S))))
+    for step in script.get("turns", []):
+        n = int(rate * step.get("user_s", 1.5))
+        samples.extend(
+            int(5000 * (0.6 + 0.4 * math.sin(2 * math.pi * 4 * i / rate)) * math.sin(2 * math.pi * 160 * i / rate))
+            for i in range(n)
+        )
+        samples.extend(array("h", bytes(2 * int(rate * step.get("pause_s", DEFAULT_PAUSE_S)))))
+    return rate, samples
+
+
+class ReplayAudioInput(io.AudioInput):
+    """Feeds the recorded/synthetic caller audio in 20 ms frames, paced at `speed` x real time"""
+
+    def __init__(self, sample_rate: int, samples: array, speed: float, answered: asyncio.Event, log: ReplayLog):
+        self.sample_rate = sample_rate
+        self._log = log
+        self._answered = answered
+        self._samples = memoryview(samples)
+        self._step = sample_rate * INPUT_FRAME_MS // 1000
+        self._offset = 0
+        self._speed = speed
+        self._started: Optional[float] = None
+        self.done = asyncio.Event()
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        if self._offset + self._step > len(self._samples):
+            self.done.set()
+            raise StopAsyncIteration
+        if self._started is None:
+            # The caller is only heard once the call is answered
+            await self._answered.wait()
+            self._started = time.monotonic()
+        # Pace against the start time so sleep jitter doesn't accumulate
+        due = self._started + (self._offset / self.sample_rate) / self._speed
+        delay = due - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        chunk = self._samples[self._offset:self._offset + self._step]
+        self._offset += self._step
+        self._log.on_caller_frame(time.monotonic(), rms(chunk) >= VAD_RMS_THRESHOLD)
+        return rtc.AudioFrame(chunk.tobytes(), self.sample_rate, 1, self._step)
+
+
+class ReplayAudioOutput(io.AudioOutput):
+    """Audio sink that 'plays' frames from the first one, at 1/speed, and reports first frames"""
+
+    def __init__(self, log: ReplayLog, speed: float):
+        super().__init__(sample_rate=None)
+        self._log = log
+        self._speed = speed
+        self._segment_s = 0.0
+        self._segment_started: Optional[float] = None
+        self._playout: Optional[asyncio.Task] = None
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        now = time.monotonic()
+        if self._segment_started is None:
+            self._segment_started = now
+            self._log.on_agent_audio(self._segment_started)
+        self._segment_s += frame.duration
+        self._log.agent_audible_until = max(self._log.agent_audible_until, now) + frame.duration / self._speed
+
+    def flush(self) -> None:
+        super().flush()
+        if self._segment_started is None:
+            return
+        duration = self._segment_s
+
+        async def play() -> None:
+            await asyncio.sleep(max(0.0, self._log.agent_audible_until - time.monotonic()))
+            self._finish(duration, interrupted=False)
+
+        self._playout = asyncio.create_task(play())
+
+    def _finish(self, position: float, interrupted: bool) -> None:
+        self._segment_started = None
+        self._segment_s = 0.0
+        self.on_playback_finished(playback_position=position, interrupted=interrupted)
+
+    def clear_buffer(self) -> None:
+        if self._segment_started is None:
+            return
+        played = (time.monotonic() - self._segment_started) * self._speed
+        if self._playout is not None:
+            self._playout.cancel()
+        self._log.agent_audible_until = time.monotonic()
+        self._finish(min(played, self._segment_s), interrupted=True)
+
+
+# --- fake job context ---------------------------------------------------------
+
+class _Participant:
+    def __init__(self, identity: str):
+        self.identity = identity
+        self.kind = rtc.ParticipantKind.PARTICIPANT_KIND_SIP
+        self.attributes: Dict[str, str] = {}
+
+
+class _Room:
+    def __init__(self, name: str):
+        self.name = name
+        self._handlers: Dict[str, List[Any]] = {}
+
+    def on(self, event: str, callback=None):
+        def register(fn):
+            self._handlers.setdefault(event, []).append(fn)
+            return fn
+        return register(callback) if callback else register
+
+    def emit(self, event: str, *args) -> None:
+        for fn in self._handlers.get(event, []):
+            fn(*args)
+
+
+class _SIPService:
+    def __init__(self, ctx: "ReplayJobContext", dial_ms: float):
+        self._ctx = ctx
+        self._dial_s = dial_ms / 1000
+
+    async def create_sip_participant(self, request: api.CreateSIPParticipantRequest) -> api.SIPParticipantInfo:
+        participant = _Participant(request.participant_identity)
+        self._ctx.participants[participant.identity] = participant
+        await asyncio.sleep(self._dial_s * 0.3)
+        self._ctx.room.emit("participant_attributes_changed", {"sip.callStatus": "ringing"}, participant)
+        await asyncio.sleep(self._dial_s * 0.7)
+        self._ctx.room.emit("participant_attributes_changed", {"sip.callStatus": "active"}, participant)
+        self._ctx.answer()
+        return api.SIPParticipantInfo(participant_identity=participant.identity, room_name=request.room_name)
+
+    async def transfer_sip_participant(self, request: api.TransferSIPParticipantRequest) -> None:
+        logger.info(f"📞 (replay) transfer to {request.transfer_to}")
+
+
+class _RoomService:
+    def __init__(self, ctx: "ReplayJobContext"):
+        self._ctx = ctx
+
+    async def delete_room(self, request: api.DeleteRoomRequest) -> None:
+        self._ctx.shutdown("room deleted")
+
+
+class _API:
+    def __init__(self, ctx: "ReplayJobContext", dial_ms: float):
+        self.sip = _SIPService(ctx, dial_ms)
+        self.room = _RoomService(ctx)
+
+
+class _Job:
+    def __init__(self, metadata: str):
+        self.id = "AJ_replay"
+        self.metadata = metadata
+
+
+class _Proc:
+    def __init__(self):
+        self.userdata: Dict[str, Any] = {"warmup_s": 0.0}
+
+
+class ReplayJobContext:
+    """The subset of JobContext the entrypoint and the agent's tools use"""
+
+    def __init__(self, script: Dict[str, Any]):
+        self.room = _Room(script.get("room", "call-replay"))
+        self.job = _Job(json.dumps(script.get("metadata", {})))
+        self.proc = _Proc()
+        self.api = _API(self, script.get("dial_ms", 0))
+        self.participants: Dict[str, _Participant] = {}
+        self._shutdown_callbacks: List[Any] = []
+        self.shutdown_requested = asyncio.Event()
+        self.shutdown_reason = ""
+        self.answered = asyncio.Event()
+        self.answered_at: Optional[float] = None
+
+    def answer(self) -> None:
+        if not self.answered.is_set():
+            self.answered_at = time.monotonic()
+            self.answered.set()
+
+    async def connect(self, **kwargs) -> None:
+        pass
+
+    def add_shutdown_callback(self, callback) -> None:
+        self._shutdown_callbacks.append(callback)
+
+    def add_tracing_callback(self, callback) -> None:
+        pass
+
+    def shutdown(self, reason: str = "") -> None:
+        if not self.shutdown_requested.is_set():
+            self.shutdown_reason = reason
+            self.shutdown_requested.set()
+
+    async def run_shutdown_callbacks(self) -> None:
+        for callback in self._shutdown_callbacks:
+            await callback(self.shutdown_reason)
+
+    async def wait_for_participant(self, *, identity: Optional[str] = None, **kwargs) -> _Participant:
+        if identity is None:
+            # Inbound: the caller is already on the line
+            self.answer()
+            return self.participants.setdefault("sip_replay", _Participant("sip_replay"))
+        return self.participants.setdefault(identity, _Participant(identity))
+
+
+# --- run ----------------------------------------------------------------------
+
+def stub_graph(script: Dict[str, Any]) -> None:
+    """Microsoft Graph with the script's latencies and the client's own mock data"""
+    latency = script.get("graph_latency_ms", {})
+    graph = agent_module.graph_client
+
+    async def check_availability(start_date, end_date):
+        await asyncio.sleep(latency.get("check_availability", 0) / 1000)
+        return graph._get_mock_availability()
+
+    async def create_meeting(attendee_email, meeting_date, meeting_time, contact_name, company_name, meeting_type):
+        await asyncio.sleep(latency.get("create_meeting", 0) / 1000)
+        return graph._create_mock_meeting(attendee_email, meeting_date, meeting_time, contact_name)
+
+    graph.check_availability = check_availability
+    graph.create_meeting = create_meeting
+
+
+def time_tools(log: ReplayLog) -> None:
+    """Wrap TDXSDRBot's function tools so each body's run time lands on the turn whose call_id ran it"""
+
+    def timed(tool):
+        @functools.wraps(tool)
+        async def wrapper(*args, **kwargs):
+            task = asyncio.current_task()
+            log.on_tool_started(task)
+            started = time.monotonic()
+            try:
+                return await tool(*args, **kwargs)
+            finally:
+                run_ctx = next((a for a in (*args, *kwargs.values()) if isinstance(a, RunContext)), None)
+                call_id = run_ctx.function_call.call_id if run_ctx is not None else ""
+                log.on_tool_done(task, call_id, time.monotonic() - started)
+
+        # functools.wraps carried the tool info over: the framework still sees a function tool
+        wrapper.__replay_timed__ = True
+        return wrapper
+
+    for name, tool in inspect.getmembers(agent_module.TDXSDRBot, llm.is_function_tool):
+        if not getattr(tool, "__replay_timed__", False):
+            setattr(agent_module.TDXSDRBot, name, timed(tool))
+
+
+async def replay(script: Dict[str, Any], speed: float, tail_s: float) -> Dict[str, Any]:
+    log = ReplayLog()
+    model = StubRealtimeModel(script, log, speed)
+    ctx = ReplayJobContext(script)
+    sample_rate, samples = script_audio(script)
+    audio_in = ReplayAudioInput(sample_rate, samples, speed, ctx.answered, log)
+    audio_out = ReplayAudioOutput(log, speed)
+    sessions: List[Any] = []
+
+    class ReplaySession(agent_module.AgentSession):
+        """AgentSession wired to the replay audio instead of a LiveKit room"""
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.input.audio = audio_in
+            self.output.audio = audio_out
+            sessions.append(self)
+
+        async def start(self, agent, room=None, **kwargs):
+            return await super().start(agent=agent)
+
+        def generate_reply(self, **kwargs):
+            handle = super().generate_reply(**kwargs)
+            log.on_reply_requested(asyncio.current_task(), handle)
+            return handle
+
+    agent_module.build_realtime_model = lambda: model
+    agent_module.AgentSession = ReplaySession
+    stub_graph(script)
+    time_tools(log)
+
+    _JobContextVar.set(ctx)
+    started = time.monotonic()
+    await agent_module.entrypoint(ctx)
+
+    # Run until the recording ends (plus the agent's last answer) or the agent hangs up
+    done = asyncio.ensure_future(audio_in.done.wait())
+    hangup = asyncio.ensure_future(ctx.shutdown_requested.wait())
+    await asyncio.wait([done, hangup], return_when=asyncio.FIRST_COMPLETED)
+    if not hangup.done():
+        await asyncio.sleep(tail_s / speed)
+    hangup.cancel()
+    ctx.shutdown(ctx.shutdown_reason or "replay finished")
+    for session in sessions:
+        await session.aclose()
+    await ctx.run_shutdown_callbacks()
+
+    turns = [t.to_dict() for t in log.turns]
+    # The agent's own BargeInDetector, if TDX_BARGE_IN installed one (possibly under the audio gate)
+    barge_in = sessions[0].input.audio if sessions else None
+    while barge_in is not None and not isinstance(barge_in, BargeInDetector):
+        barge_in = getattr(barge_in, "_source", None)
+    greeting = log.greeting_audio_at - ctx.answered_at if log.greeting_audio_at and ctx.answered_at else None
+    return {
+        "room": ctx.room.name,
+        "speed": speed,
+        "wall_s": round(time.monotonic() - started, 2),
+        "greeting_ms": round(greeting * 1000, 1) if greeting is not None else None,
+        "turns": turns,
+        "summary": summarize(turns),
+        "response_by_phase": response_by_phase(turns),
+        "generations": log.generations,
+        "interrupts": log.interrupts,
+        "talk_over_ms": {"count": len(log.talk_over_ms), "p50": percentile(sorted(log.talk_over_ms), 50),
+                         "max": max(log.talk_over_ms, default=None)},
+        "barge_in": barge_in.stats.to_dict() if barge_in is not None else None,
+        "shutdown_reason": ctx.shutdown_reason,
+    }
+
+
+def summarize(turns: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = {}
+    for key in ("response_ms", "overhead_ms", "tools_ms"):
+        values = sorted(t[key] for t in turns if t[key] is not None)
+        summary[key] = {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95),
+                        "max": values[-1] if values else None}
+    return summary
+
+
+def response_by_phase(turns: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Median end-of-speech -> agent audio per conversation phase"""
+    phases: Dict[str, List[float]] = {}
+    for t in turns:
+        if t["response_ms"] is not None:
+            phases.setdefault(t["phase"], []).append(t["response_ms"])
+    return {phase: {"count": len(v), "p50": percentile(sorted(v), 50)} for phase, v in phases.items()}
+
+
+def regressions(report: Dict[str, Any], baseline: Dict[str, Any], max_ms: float) -> List[str]:
+    found = []
+    for key in ("overhead_ms", "tools_ms"):
+        for stat in ("p50", "p95"):
+            now, before = report["summary"][key][stat], baseline["summary"][key][stat]
+            if now is not None and before is not None and now - before > max_ms:
+                found.append(f"{key} {stat}: {before:.0f}ms -> {now:.0f}ms (+{now - before:.0f}ms)")
+    return found
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    def ms(value: Optional[float]) -> str:
+        return f"{value:.0f}ms" if value is not None else "-"
+
+    print(f"🎬 REPLAY {report['room']} ({report['wall_s']}s, x{report['speed']})")
+    print(f"   👋 Saludo: {ms(report['greeting_ms'])} desde que contestan")
+    print(f"   {'turno':>5} {'fase':<11} {'respuesta':>10} {'vad':>7} {'modelo':>8} {'overhead':>9} {'tools':>8}  nombres")
+    for t in report["turns"]:
+        print(f"   {t['turn']:>5} {t['phase']:<11} {ms(t['response_ms']):>10} {ms(t['vad_ms']):>7} {ms(t['model_ms']):>8} "
+              f"{ms(t['overhead_ms']):>9} {ms(t['tools_ms']):>8}  {', '.join(t['tools'])}")
+    for key, s in report["summary"].items():
+        print(f"📊 {key:<12} p50 {ms(s['p50']):>7}  p95 {ms(s['p95']):>7}  máx {ms(s['max']):>7}  ({s['count']})")
+    for phase, s in report["response_by_phase"].items():
+        print(f"🎚️  {phase:<12} respuesta p50 {ms(s['p50']):>7}  ({s['count']})")
+    talk_over = report["talk_over_ms"]
+    if talk_over["count"]:
+        print(f"🗯️  Talk-over    p50 {ms(talk_over['p50']):>7}  máx {ms(talk_over['max']):>7}  "
+              f"({talk_over['count']} veces que el prospecto habló encima del agente)")
+    if report["barge_in"]:
+        b = report["barge_in"]
+        print(f"✋ Barge-in     {b['detections']} detecciones, {b['confirmed']} confirmadas, "
+              f"{b['cancelled']} falsas alarmas, {b['missed']} perdidas; agente callado en "
+              f"{ms(b['stop_ms_p50'])}, {ms(b['server_ms_p50'])} antes que el servidor")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay offline de llamadas con modelo realtime simulado")
+    parser.add_argument("--script", help="Guion JSON (por defecto, una llamada de ejemplo)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Velocidad del audio (x tiempo real); las latencias del guion no se aceleran, "
+                             "así que las pausas del prospecto se acortan")
+    parser.add_argument("--tail", type=float, default=8.0, help="Segundos de audio tras el final de la grabación")
+    parser.add_argument("--report", help="Guardar el reporte JSON aquí")
+    parser.add_argument("--baseline", help="Reporte JSON anterior para comparar")
+    parser.add_argument("--max-regression-ms", type=float, default=25.0)
+    parser.add_argument("--json", action="store_true", help="Imprimir el reporte en JSON")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar los logs del agente")
+    parser.add_argument("--audio-gate", action="store_true", help="Activar el gate de silencio local (TDX_AUDIO_GATE)")
+    parser.add_argument("--barge-in", action="store_true",
+                        help="Activar la detección local de barge-in (TDX_BARGE_IN); mide a velocidad x1")
+    args = parser.parse_args()
+
+    if args.audio_gate:
+        os.environ["TDX_AUDIO_GATE"] = "1"
+    if args.barge_in:
+        os.environ["TDX_BARGE_IN"] = "1"
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    if not args.verbose:
+        agent_module.logger.setLevel(logging.WARNING)
+
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+
+    report = asyncio.run(replay(script, args.speed, args.tail))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.max_regression_ms)
+        for problem in found:
+            print(f"⚠️  Regresión: {problem}")
+        if found:
+            sys.exit(1)
+        print(f"✅ Sin regresiones de más de {args.max_regression_ms:.0f}ms contra {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
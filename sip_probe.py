@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Diagnóstico SIP y llamadas sintéticas de prueba (reemplaza check_twilio_logs.py)
+
+check: verifica en paralelo el trunk configurado, los trunks de entrada, las
+dispatch rules y los rooms de llamadas con sus participantes SIP.
+
+probe: hace llamadas de prueba a un número que contesta solo (TDX_PROBE_NUMBER)
+y mide, consultando el estado del participante SIP cada 50-100 ms en lugar
+de dormir un tiempo fijo:
+    post-dial delay   marcado -> sip.callStatus=ringing
+    answer time       marcado -> sip.callStatus=active
+    first audio       contestada -> primer track de audio publicado
+El reporte (texto o --json) se puede agregar a un historial JSONL y el
+comando sale con código 1 si alguna llamada falla o se pasa de los límites,
+así que sirve para correrlo desde cron. --standin usa un SIP local simulado.
+
+Uso:
+    python sip_probe.py check
+    python sip_probe.py probe --to +15005550006 --calls 3 --concurrency 3
+    python sip_probe.py probe --standin --calls 20 --json
+    python sip_probe.py probe --to +15005550006 --history probes.jsonl --max-answer 12
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from livekit import api
+
+from call_metrics import SIP_CALL_STATUS_ATTRIBUTE
+from dnc_index import default_guard
+from livekit_client import DEFAULT_TIMEOUT_S, livekit_api
+from ops_cli import collect_rooms, collect_sip, sip_participants_of
+from ops_dashboard import percentile
+from redial_scheduler import classify_sip_error
+
+PROBE_NUMBER_ENV = "TDX_PROBE_NUMBER"
+CALL_TIMEOUT_S = 45.0
+# Status poll backoff: fast right after a change, slower while nothing moves.
+# The cap bounds the error of every timing the probe reports, so it stays low
+# until first audio (the last thing measured) instead of drifting to seconds.
+POLL_MIN_S = 0.05
+POLL_MAX_S = 0.1
+POLL_BACKOFF = 1.5
+
+OUTCOME_ANSWERED = "answered"
+OUTCOME_NO_ANSWER = "no_answer"
+OUTCOME_HANGUP = "hangup"
+OUTCOME_TIMEOUT = "timeout"
+
+
+# --- check -------------------------------------------------------------------
+
+async def run_checks(lk_api: api.LiveKitAPI, timeout_s: float) -> Dict[str, Any]:
+    rooms, sip = await asyncio.gather(collect_rooms(lk_api, timeout_s), collect_sip(lk_api, timeout_s))
+    trunk_id = sip["configured_outbound_trunk"]
+    trunk = next((t for t in sip["outbound_trunks"] if t.get("sip_trunk_id") == trunk_id), None)
+    call_rooms = [r for r in rooms["rooms"] if r["name"].startswith(("call-", "outbound-"))]
+    problems = []
+    if trunk is None:
+        problems.append(f"trunk {trunk_id} no encontrado")
+    elif "twilio.com" not in trunk.get("address", ""):
+        problems.append(f"dirección SIP {trunk.get('address')} no parece ser de Twilio")
+    return {
+        "trunk": trunk,
+        "sip": sip,
+        "call_rooms": call_rooms,
+        "sip_participants": sip_participants_of(call_rooms),
+        "problems": problems,
+        "errors": {**rooms["errors"], **sip["errors"]},
+    }
+
+
+def print_checks(result: Dict[str, Any]) -> None:
+    print("🔍 VERIFICANDO INTEGRACIÓN TWILIO ↔ LIVEKIT")
+    print("=" * 60)
+    trunk = result["trunk"]
+    print(f"\n📞 TRUNK: {result['sip']['configured_outbound_trunk']}")
+    if trunk:
+        print(f"   ✅ {trunk.get('name', '')} -> {trunk.get('address', '')}")
+        print(f"       Números: {trunk.get('numbers', [])}  Transporte: {trunk.get('transport', '-')}")
+    else:
+        print("   ❌ No encontrado. Trunks disponibles:")
+        for t in result["sip"]["outbound_trunks"]:
+            print(f"       - {t.get('sip_trunk_id')}: {t.get('name', '')}")
+    print(f"\n🏠 ROOMS DE LLAMADAS: {len(result['call_rooms'])}")
+    for room in result["call_rooms"][:10]:
+        print(f"   📞 {room['name']} ({room['num_participants']} participantes)")
+    print(f"\n👥 PARTICIPANTES SIP: {len(result['sip_participants'])}")
+    for p in result["sip_participants"]:
+        print(f"   📞 {p['identity']} en {p['room']}: {p['attributes'].get(SIP_CALL_STATUS_ATTRIBUTE, '-')}")
+    for problem in result["problems"]:
+        print(f"⚠️  {problem}")
+    for name, error in result["errors"].items():
+        print(f"⚠️  {name}: {error}")
+
+
+# --- probe -------------------------------------------------------------------
+
+class ProbeResult:
+    __slots__ = ("room", "outcome", "sip_status", "post_dial_delay_s", "answer_s", "first_audio_s", "polls")
+
+    def __init__(self, room: str):
+        self.room = room
+        self.outcome = OUTCOME_TIMEOUT
+        self.sip_status: Optional[str] = None
+        self.post_dial_delay_s: Optional[float] = None
+        self.answer_s: Optional[float] = None
+        self.first_audio_s: Optional[float] = None
+        self.polls = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+async def probe_call(lk_api, number: str, trunk_id: Optional[str], index: int, timeout_s: float) -> ProbeResult:
+    """Place one probe call and follow the SIP participant until first audio, hangup or timeout"""
+    room_name = f"probe-{int(time.time())}-{index}"
+    identity = f"sip_probe_{index}"
+    result = ProbeResult(room_name)
+    await lk_api.room.create_room(api.CreateRoomRequest(name=room_name, empty_timeout=60))
+    try:
+        dialed_at = time.monotonic()
+        try:
+            await lk_api.sip.create_sip_participant(
+                api.CreateSIPParticipantRequest(
+                    sip_trunk_id=trunk_id,
+                    sip_call_to=number,
+                    room_name=room_name,
+                    participant_identity=identity,
+                )
+            )
+        except Exception as e:
+            result.outcome, result.sip_status = classify_sip_error(e)
+            return result
+
+        interval = POLL_MIN_S
+        last_state = None
+        seen = False
+        while time.monotonic() - dialed_at < timeout_s:
+            response = await lk_api.room.list_participants(api.ListParticipantsRequest(room=room_name))
+            result.polls += 1
+            now = time.monotonic()
+            sip = next((p for p in response.participants if p.identity == identity), None)
+            if sip is None:
+                if seen:
+                    # The callee side went away before first audio
+                    result.outcome = OUTCOME_HANGUP if result.answer_s is not None else OUTCOME_NO_ANSWER
+                    return result
+            else:
+                seen = True
+                status = sip.attributes.get(SIP_CALL_STATUS_ATTRIBUTE)
+                if status == "ringing" and result.post_dial_delay_s is None:
+                    result.post_dial_delay_s = now - dialed_at
+                if status == "active" and result.answer_s is None:
+                    result.answer_s = now - dialed_at
+                    result.outcome = OUTCOME_ANSWERED
+                if status == "hangup":
+                    result.outcome = OUTCOME_HANGUP if result.answer_s is not None else OUTCOME_NO_ANSWER
+                    return result
+                if result.answer_s is not None and any(t.type == api.TrackType.AUDIO for t in sip.tracks):
+                    result.first_audio_s = now - dialed_at - result.answer_s
+                    return result
+                state = (status, len(sip.tracks))
+                if state != last_state:
+                    last_state = state
+                    interval = POLL_MIN_S
+            await asyncio.sleep(interval)
+            interval = min(POLL_MAX_S, interval * POLL_BACKOFF)
+        return result
+    finally:
+        await lk_api.room.delete_room(api.DeleteRoomRequest(room=room_name))
+
+
+def summarize(results: List[ProbeResult]) -> Dict[str, Any]:
+    outcomes: Dict[str, int] = {}
+    for r in results:
+        outcomes[r.outcome] = outcomes.get(r.outcome, 0) + 1
+    summary: Dict[str, Any] = {"calls": len(results), "outcomes": outcomes}
+    for metric in ("post_dial_delay_s", "answer_s", "first_audio_s"):
+        values = sorted(getattr(r, metric) for r in results if getattr(r, metric) is not None)
+        summary[metric] = {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "max": values[-1] if values else None,
+        }
+    return summary
+
+
+def breaches(summary: Dict[str, Any], limits: Dict[str, Optional[float]]) -> List[str]:
+    found = []
+    # A call only passes once the callee's audio arrived
+    failed = summary["calls"] - summary["first_audio_s"]["count"]
+    if failed:
+        found.append(f"{failed} llamadas sin contestar/audio")
+    for metric, limit in limits.items():
+        worst = summary[metric]["max"]
+        if limit is not None and worst is not None and worst > limit:
+            found.append(f"{metric} máx {worst:.2f}s > {limit:.2f}s")
+    return found
+
+
+async def run_probes(lk_api, number: str, trunk_id: Optional[str], calls: int, concurrency: int,
+                     timeout_s: float) -> List[ProbeResult]:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> ProbeResult:
+        async with limit:
+            return await probe_call(lk_api, number, trunk_id, index, timeout_s)
+
+    return list(await asyncio.gather(*(one(i) for i in range(calls))))
+
+
+def fmt(seconds: Optional[float]) -> str:
+    return f"{seconds:.2f}s" if seconds is not None else "-"
+
+
+def print_probes(results: List[ProbeResult], summary: Dict[str, Any], problems: List[str]) -> None:
+    print(f"🧪 LLAMADAS DE PRUEBA: {summary['calls']}  {summary['outcomes']}")
+    print(f"   {'room':<28} {'resultado':<10} {'PDD':>7} {'answer':>7} {'audio':>7} {'polls':>5}")
+    for r in results:
+        print(f"   {r.room:<28} {r.outcome:<10} {fmt(r.post_dial_delay_s):>7} {fmt(r.answer_s):>7} "
+              f"{fmt(r.first_audio_s):>7} {r.polls:>5}")
+    for metric in ("post_dial_delay_s", "answer_s", "first_audio_s"):
+        m = summary[metric]
+        print(f"📊 {metric:<18} p50 {fmt(m['p50']):>7}  p95 {fmt(m['p95']):>7}  ({m['count']})")
+    for problem in problems:
+        print(f"⚠️  {problem}")
+    if not problems:
+        print("✅ Todas las llamadas de prueba dentro de los límites")
+
+
+class StandInSip:
+    """Local stand-in for LiveKit's room/SIP services: rings, answers and publishes audio on a timer"""
+
+    def __init__(self, seed: int = 7):
+        self.room = self
+        self.sip = self
+        self._rng = random.Random(seed)
+        self._calls: Dict[str, Dict[str, Any]] = {}
+
+    async def aclose(self) -> None:
+        pass
+
+    async def create_room(self, request: api.CreateRoomRequest) -> api.Room:
+        return api.Room(name=request.name)
+
+    async def delete_room(self, request: api.DeleteRoomRequest) -> None:
+        self._calls.pop(request.room, None)
+
+    async def create_sip_participant(self, request: api.CreateSIPParticipantRequest) -> api.SIPParticipantInfo:
+        await asyncio.sleep(self._rng.uniform(0.02, 0.08))
+        rng = self._rng
+        ring = rng.uniform(0.3, 1.5)
+        answer = None if rng.random() < 0.1 else ring + rng.uniform(0.5, 3.0)
+        self._calls[request.room_name] = {
+            "identity": request.participant_identity,
+            "started": time.monotonic(),
+            "ring": ring,
+            "answer": answer,
+            "audio": answer + rng.uniform(0.1, 0.6) if answer is not None else None,
+            "give_up": ring + 4.0,
+        }
+        return api.SIPParticipantInfo(participant_identity=request.participant_identity, room_name=request.room_name)
+
+    async def list_participants(self, request: api.ListParticipantsRequest) -> api.ListParticipantsResponse:
+        await asyncio.sleep(self._rng.uniform(0.005, 0.02))
+        call = self._calls.get(request.room)
+        if call is None:
+            return api.ListParticipantsResponse()
+        elapsed = time.monotonic() - call["started"]
+        if call["answer"] is None:
+            status = "hangup" if elapsed >= call["give_up"] else "ringing" if elapsed >= call["ring"] else "dialing"
+        else:
+            status = "active" if elapsed >= call["answer"] else "ringing" if elapsed >= call["ring"] else "dialing"
+        tracks = [api.TrackInfo(type=api.TrackType.AUDIO)] if call["audio"] is not None and elapsed >= call["audio"] else []
+        participant = api.ParticipantInfo(
+            identity=call["identity"],
+            kind=api.ParticipantInfo.Kind.SIP,
+            attributes={SIP_CALL_STATUS_ATTRIBUTE: status},
+            tracks=tracks,
+        )
+        return api.ListParticipantsResponse(participants=[participant])
+
+
+async def probe_command(args: argparse.Namespace) -> int:
+    if args.standin:
+        lk_api, number = StandInSip(args.seed), args.to or "+15005550006"
+    else:
+        number = args.to or os.getenv(PROBE_NUMBER_ENV)
+        if not number:
+            print(f"❌ Falta --to o {PROBE_NUMBER_ENV}")
+            return 2
+        # Probes call the same test line over and over: only the DNC list applies, and
+        # the probe line's dials are not recorded against the prospects' dedupe window
+        reason = default_guard().check(number, dedupe=False)
+        if reason:
+            print(f"🚫 {number} bloqueado: {reason}")
+            return 2
+    trunk_id = os.getenv("SIP_OUTBOUND_TRUNK_ID")
+    limits = {"post_dial_delay_s": args.max_pdd, "answer_s": args.max_answer, "first_audio_s": args.max_first_audio}
+
+    async def run_once(client) -> int:
+        results = await run_probes(client, number, trunk_id, args.calls, args.concurrency, args.call_timeout)
+        summary = summarize(results)
+        problems = breaches(summary, limits)
+        report = {"at": time.time(), "number": number, "summary": summary, "problems": problems,
+                  "calls": [r.to_dict() for r in results]}
+        if args.history:
+            with open(args.history, "a") as f:
+                f.write(json.dumps(report) + "\n")
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_probes(results, summary, problems)
+        return 1 if problems else 0
+
+    async def loop(client) -> int:
+        while True:
+            status = await run_once(client)
+            if not args.every:
+                return status
+            await asyncio.sleep(args.every)
+
+    if args.standin:
+        return await loop(lk_api)
+    async with livekit_api(args.timeout) as client:
+        return await loop(client)
+
+
+async def check_command(args: argparse.Namespace) -> int:
+    async with livekit_api(args.timeout) as lk_api:
+        result = await run_checks(lk_api, args.timeout)
+    if args.json:
+        print(json.dumps(result, indent=2, default=str))
+    else:
+        print_checks(result)
+    return 1 if result["problems"] or result["errors"] else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Diagnóstico SIP y llamadas de prueba")
+    parser.add_argument("--json", action="store_true", help="Salida JSON")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_S, help="Timeout por consulta (s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("check", help="Trunks, dispatch rules y participantes SIP en paralelo")
+
+    probe = sub.add_parser("probe", help="Llamadas de prueba con medición de latencias")
+    probe.add_argument("--to", help=f"Número de prueba (por defecto {PROBE_NUMBER_ENV})")
+    probe.add_argument("--calls", type=int, default=1)
+    probe.add_argument("--concurrency", type=int, default=1)
+    probe.add_argument("--call-timeout", type=float, default=CALL_TIMEOUT_S)
+    probe.add_argument("--max-pdd", type=float, help="Límite de post-dial delay (s)")
+    probe.add_argument("--max-answer", type=float, help="Límite de tiempo hasta contestar (s)")
+    probe.add_argument("--max-first-audio", type=float, help="Límite de contestada -> primer audio (s)")
+    probe.add_argument("--history", help="Agregar cada reporte a este archivo JSONL")
+    probe.add_argument("--every", type=float, help="Repetir cada N segundos")
+    probe.add_argument("--standin", action="store_true", help="Usar un SIP local simulado")
+    probe.add_argument("--seed", type=int, default=7)
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "check":
+            return asyncio.run(check_command(args))
+        return asyncio.run(probe_command(args))
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
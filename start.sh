@@ -1,8 +1,6 @@
 #!/bin/bash
 set -e
 
-echo "Downloading LiveKit agent models..."
-python agent.py download-files
-
+# Model files are baked into the image at build time (see Dockerfile)
 echo "Starting TDX SDR Bot..."
-python agent.py start
\ No newline at end of file
+exec python agent.py start
@@ -5,6 +5,9 @@ Startup script that verifies dependencies before starting the agent
 import sys
 import os
 import logging
+import importlib.util
+
+import startup_profiler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,13 +15,13 @@ logger = logging.getLogger(__name__)
 
 def verify_graph_sdk():
     """Verify Microsoft Graph SDK is available"""
-    try:
-        from msgraph import GraphServiceClient
-        from azure.identity import ClientSecretCredential
+    # find_spec checks the packages are installed without paying for their import
+    missing = [name for name in ("msgraph", "azure.identity") if importlib.util.find_spec(name) is None]
+    if not missing:
         logger.info("✅ Microsoft Graph SDK verified successfully")
         return True
-    except ImportError as e:
-        logger.error(f"❌ Microsoft Graph SDK not available: {e}")
+    else:
+        logger.error(f"❌ Microsoft Graph SDK not available: missing {missing}")
         logger.error("This means calendar integration will use mock data")
         return False
 
@@ -55,16 +58,18 @@ def main():
     
     # Start the actual agent
     logger.info("Starting agent.py...")
+    startup_profiler.mark("dependencies_checked")
+    startup_profiler.install_registration_hook()
     
     try:
         # Import and run the agent
-        from agent import cli, WorkerOptions, entrypoint
-        cli.run_app(
-            WorkerOptions(
-                entrypoint_fnc=entrypoint,
-                agent_name="tdx-sdr-bot",
-            )
-        )
+        from agent import cli, build_worker_options
+        startup_profiler.mark("agent_imported")
+        
+        # Render runs "python start_agent.py" with no subcommand
+        if len(sys.argv) == 1:
+            sys.argv.append("start")
+        cli.run_app(build_worker_options())
     except Exception as e:
         logger.error(f"❌ Failed to start agent: {e}")
         sys.exit(1)
@@ -1,19 +1,24 @@
 #!/usr/bin/env python3
 """
 Startup script for TDX SDR Bot
-Downloads models then starts the agent
+Runs the agent worker in this same process; model files are downloaded
+at image build time (see Dockerfile)
 """
 
-import subprocess
 import sys
 
+import startup_profiler
+
 def main():
-    print("Starting TDX SDR Bot (skipping model download for memory optimization)...")
+    print("Starting TDX SDR Bot...")
+    startup_profiler.install_registration_hook()
+    
+    # Start agent directly in this interpreter instead of spawning a second one
+    from agent import cli, build_worker_options
+    startup_profiler.mark("agent_imported")
     
-    # Start agent directly without downloading models
-    subprocess.run([
-        sys.executable, "agent.py", "start"
-    ])
+    sys.argv = [sys.argv[0], "start"]
+    cli.run_app(build_worker_options())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Startup profiler for TDX SDR Bot
+
+Entry scripts call mark() at each boot step and install_registration_hook()
+before starting the worker; when LiveKit logs "registered worker" the
+profiler logs the time-to-registered-worker measured from process start.
+
+Run it directly to see which imports dominate the boot:
+    python startup_profiler.py --top 20
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger("startup_profiler")
+
+_IMPORTED_AT = time.perf_counter()
+_marks: list[tuple[str, float]] = []
+
+
+def process_age_s() -> float:
+    """Seconds since this process was started by the OS (falls back to module import time)"""
+    try:
+        with open("/proc/self/stat") as stat:
+            # Field 22 is the start time in clock ticks since boot; the command
+            # name (field 2) may contain spaces, so split after its closing paren
+            fields = stat.read().rsplit(")", 1)[1].split()
+        started_ticks = int(fields[19])
+        with open("/proc/uptime") as uptime:
+            uptime_s = float(uptime.read().split()[0])
+        return uptime_s - started_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter() - _IMPORTED_AT
+
+
+def mark(name: str) -> float:
+    """Record a boot step and return the process age at that point"""
+    age = process_age_s()
+    _marks.append((name, age))
+    logger.info(f"⏱️ Boot step '{name}' at {age:.2f}s")
+    return age
+
+
+def report() -> None:
+    """Log every boot step recorded so far"""
+    previous = 0.0
+    for name, age in _marks:
+        logger.info(f"⏱️ {name:<22} {age:6.2f}s (+{age - previous:.2f}s)")
+        previous = age
+
+
+class _RegistrationWatcher(logging.Filter):
+    """Watches the LiveKit worker logger for the registration message"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.getMessage() == "registered worker":
+            age = mark("worker_registered")
+            report()
+            logger.info(f"🚀 Time to registered worker: {age:.2f}s")
+        return True
+
+
+def install_registration_hook() -> None:
+    """Report time-to-registered-worker once LiveKit accepts the worker"""
+    logging.getLogger("livekit.agents").addFilter(_RegistrationWatcher())
+
+
+def profile_imports(module: str, top: int) -> list[tuple[int, str]]:
+    """Import the module in a fresh interpreter with -X importtime and return the slowest imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Keep the module itself and its direct imports for a readable summary
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            timings.append((int(cumulative), name.strip()))
+    timings.sort(reverse=True)
+    return timings[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of the agent")
+    parser.add_argument("--module", default="agent", help="Module to import")
+    parser.add_argument("--top", type=int, default=15, help="Number of imports to show")
+    args = parser.parse_args()
+
+    print(f"⏱️ IMPORT TIME - {args.module}")
+    print("=" * 50)
+    for cumulative_us, name in profile_imports(args.module, args.top):
+        print(f"   {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ import json
 import os
 from dotenv import load_dotenv
 from livekit import api
+from dnc_index import default_guard
 
 # Load environment variables
 load_dotenv(dotenv_path=".env.local")
@@ -34,6 +35,12 @@ async def make_outbound_call():
         }
     }
     
+    guard = default_guard()
+    reason = guard.check(metadata['dial_info']['phone_number'])
+    if reason:
+        print(f"🚫 {metadata['dial_info']['phone_number']} bloqueado: {reason}")
+        return None
+    
     try:
         # Crear room que coincida con el patrón de dispatch rule
         # Usar patrón: call-{participant.identity}_+number_randomID
@@ -61,6 +68,8 @@ async def make_outbound_call():
                 participant_identity=f"sip_{metadata['dial_info']['phone_number'].replace('+', '')}"
             )
         )
+        # Only a call that actually went out counts for the dedupe window
+        guard.record_dial(metadata['dial_info']['phone_number'])
         
         print(f"📞 Llamada SIP iniciada: {sip_participant.participant_identity}")
         print(f"📞 Marcando a {metadata['dial_info']['phone_number']}")
@@ -9,6 +9,7 @@ import os
 import requests
 from dotenv import load_dotenv
 from livekit import api
+from dnc_index import default_guard
 
 load_dotenv(dotenv_path=".env.local")
 
@@ -34,6 +35,12 @@ async def trigger_outbound_call():
         "call_direction": "outbound"  # Explicit outbound
     }
     
+    guard = default_guard()
+    reason = guard.check(metadata['dial_info']['phone_number'])
+    if reason:
+        print(f"🚫 {metadata['dial_info']['phone_number']} bloqueado: {reason}")
+        return None
+    
     try:
         # 1. Crear room simple
         import time
@@ -79,6 +86,8 @@ async def trigger_outbound_call():
                 participant_identity=f"sip_{metadata['dial_info']['phone_number'].replace('+', '')}"
             )
         )
+        # Only a call that actually went out counts for the dedupe window
+        guard.record_dial(metadata['dial_info']['phone_number'])
         
         print(f"✅ Llamada iniciada!")
         print(f"📞 SIP Participant: {sip_participant.participant_identity}")
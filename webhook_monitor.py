@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Monitor de llamadas basado en webhooks de LiveKit
+
+En lugar de consultar list_rooms/list_participants cada segundo (como
+monitor_calls.py y real_time_monitor.py), este servicio recibe los webhooks
+de LiveKit (room_started/finished, participant_joined/left,
+track_published/unpublished), verifica su firma con LIVEKIT_API_KEY/SECRET y
+mantiene un registro en memoria de las llamadas, servido en:
+
+    GET /          resumen en texto
+    GET /calls     llamadas activas y recientes en JSON
+    POST /webhook  endpoint a configurar en LiveKit (Settings > Webhooks)
+
+Las vistas GET exponen rooms, metadata y números de teléfono: piden
+"Authorization: Bearer $TDX_METRICS_TOKEN" (el mismo token del dashboard), y
+sin token el servidor solo escucha en 127.0.0.1.
+
+Uso:
+    python webhook_monitor.py serve --port 8090
+    TDX_METRICS_TOKEN=... python webhook_monitor.py serve --host 0.0.0.0
+    # Contra un livekit-server local (--dev con webhook.urls) o con eventos sintéticos:
+    python webhook_monitor.py simulate --url http://localhost:8090/webhook --calls 20
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import os
+import random
+import sys
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+
+from aiohttp import web, ClientSession
+from dotenv import load_dotenv
+from google.protobuf.json_format import MessageToJson
+from livekit import api
+
+from call_metrics import SIP_CALL_STATUS_ATTRIBUTE
+from worker_metrics import METRICS_TOKEN_ENV
+
+load_dotenv(dotenv_path=".env.local")
+
+DEFAULT_PORT = 8090
+# Finished calls kept for the live view
+RECENT_CALLS = 500
+# Event ids remembered to drop LiveKit's retried deliveries
+SEEN_EVENT_IDS = 10000
+# Finished rooms remembered to drop events delivered after room_finished
+FINISHED_ROOMS = 10000
+
+# Call states
+STATE_WAITING = "waiting"       # room up, nobody dialed yet
+STATE_DIALING = "dialing"       # SIP participant created, callee not answered
+STATE_CONNECTED = "connected"   # callee audio is flowing
+STATE_HANGUP = "hangup"         # SIP participant left
+STATE_ENDED = "ended"           # room finished
+
+
+class ParticipantRecord:
+    __slots__ = ("identity", "kind", "joined_at", "left_at", "tracks")
+
+    def __init__(self, identity: str, kind: int, joined_at: float):
+        self.identity = identity
+        self.kind = kind
+        self.joined_at = joined_at
+        self.left_at: Optional[float] = None
+        self.tracks = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "identity": self.identity,
+            "kind": api.ParticipantInfo.Kind.Name(self.kind),
+            "joined_at": self.joined_at,
+            "left_at": self.left_at,
+            "tracks": self.tracks,
+        }
+
+
+class CallRecord:
+    __slots__ = ("room", "started_at", "state", "state_at", "ended_at", "participants", "metadata")
+
+    def __init__(self, room: str, started_at: float, metadata: str = ""):
+        self.room = room
+        self.started_at = started_at
+        self.state = STATE_WAITING
+        self.state_at = started_at
+        self.ended_at: Optional[float] = None
+        self.participants: Dict[str, ParticipantRecord] = {}
+        self.metadata = metadata
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.ended_at or time.time()
+        return {
+            "room": self.room,
+            "state": self.state,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "duration_s": round(end - self.started_at, 1),
+            "participants": [p.to_dict() for p in self.participants.values()],
+        }
+
+
+class CallRegistry:
+    """Live view of calls built only from webhook events"""
+
+    def __init__(self, recent: int = RECENT_CALLS):
+        self.active: Dict[str, CallRecord] = {}
+        self.recent: Deque[CallRecord] = deque(maxlen=recent)
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        # Room sids (names when LiveKit sent no sid) whose room_finished was applied
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self.stats = {"events": 0, "duplicates": 0, "rejected": 0, "late": 0}
+
+    def _call(self, room: api.Room, at: float, create: bool = False) -> Optional[CallRecord]:
+        """The room's record; only room_started/participant_joined may create it"""
+        call = self.active.get(room.name)
+        if call is None:
+            # Webhooks are not ordered: anything for a finished room arrived late
+            if (room.sid or room.name) in self._finished:
+                self.stats["late"] += 1
+                return None
+            if create:
+                # room_started may be lost or arrive after participant_joined
+                call = self.active[room.name] = CallRecord(room.name, at, room.metadata)
+        return call
+
+    def _mark_finished(self, room: api.Room) -> None:
+        self._finished[room.sid or room.name] = None
+        if len(self._finished) > FINISHED_ROOMS:
+            self._finished.popitem(last=False)
+
+    def _set_state(self, call: CallRecord, state: str, at: float) -> None:
+        if call.state != state:
+            print(f"🔄 {call.room}: {call.state} -> {state} (+{at - call.started_at:.1f}s)")
+            call.state = state
+            call.state_at = at
+
+    def apply(self, event: api.WebhookEvent) -> bool:
+        """Apply one event; returns False for duplicates"""
+        if event.id:
+            if event.id in self._seen:
+                self.stats["duplicates"] += 1
+                return False
+            self._seen[event.id] = None
+            if len(self._seen) > SEEN_EVENT_IDS:
+                self._seen.popitem(last=False)
+        self.stats["events"] += 1
+        at = float(event.created_at or time.time())
+
+        if event.event == "room_started":
+            call = self._call(event.room, at, create=True)
+            if call:
+                print(f"🆕 {call.room}")
+        elif event.event == "room_finished":
+            call = self.active.pop(event.room.name, None)
+            self._mark_finished(event.room)
+            if call:
+                call.ended_at = at
+                self._set_state(call, STATE_ENDED, at)
+                self.recent.append(call)
+        elif event.event in ("participant_joined", "participant_left"):
+            call = self._call(event.room, at, create=event.event == "participant_joined")
+            if call is None:
+                return True
+            p = event.participant
+            record = call.participants.get(p.identity)
+            if record is None:
+                record = call.participants[p.identity] = ParticipantRecord(p.identity, p.kind, at)
+            if event.event == "participant_left":
+                record.left_at = at
+                if p.kind == api.ParticipantInfo.Kind.SIP:
+                    self._set_state(call, STATE_HANGUP, at)
+            elif p.kind == api.ParticipantInfo.Kind.SIP:
+                answered = p.attributes.get(SIP_CALL_STATUS_ATTRIBUTE) == "active"
+                self._set_state(call, STATE_CONNECTED if answered else STATE_DIALING, at)
+        elif event.event in ("track_published", "track_unpublished"):
+            call = self._call(event.room, at)
+            record = call.participants.get(event.participant.identity) if call else None
+            if record:
+                record.tracks += 1 if event.event == "track_published" else -1
+                # The SIP participant publishes the callee's audio once the call is answered
+                if record.kind == api.ParticipantInfo.Kind.SIP and record.tracks > 0 and call.state == STATE_DIALING:
+                    self._set_state(call, STATE_CONNECTED, at)
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "active": [c.to_dict() for c in self.active.values()],
+            "recent": [c.to_dict() for c in reversed(self.recent)],
+            "stats": self.stats,
+        }
+
+
+def create_app(registry: CallRegistry, receiver: api.WebhookReceiver, token: Optional[str] = None) -> web.Application:
+    def authorized(request: web.Request) -> bool:
+        return not token or request.headers.get("Authorization") == f"Bearer {token}"
+
+    async def webhook(request: web.Request) -> web.Response:
+        body = await request.text()
+        try:
+            event = receiver.receive(body, request.headers.get("Authorization", ""))
+        except Exception as e:
+            registry.stats["rejected"] += 1
+            print(f"⚠️  Webhook rechazado: {e}")
+            return web.Response(status=401)
+        registry.apply(event)
+        return web.Response(status=200)
+
+    async def calls(request: web.Request) -> web.Response:
+        if not authorized(request):
+            return web.Response(status=401)
+        return web.json_response(registry.snapshot())
+
+    async def index(request: web.Request) -> web.Response:
+        if not authorized(request):
+            return web.Response(status=401)
+        lines = [f"📞 Llamadas activas: {len(registry.active)}  |  eventos: {registry.stats['events']}", ""]
+        for call in registry.active.values():
+            who = ", ".join(call.participants) or "-"
+            lines.append(f"{call.room:<40} {call.state:<10} {time.time() - call.started_at:6.0f}s  {who}")
+        return web.Response(text="\n".join(lines))
+
+    app = web.Application()
+    app.router.add_post("/webhook", webhook)
+    app.router.add_get("/calls", calls)
+    app.router.add_get("/", index)
+    return app
+
+
+def build_receiver() -> api.WebhookReceiver:
+    return api.WebhookReceiver(api.TokenVerifier(os.getenv("LIVEKIT_API_KEY"), os.getenv("LIVEKIT_API_SECRET")))
+
+
+def sign(body: str) -> str:
+    """Authorization header LiveKit sends with a webhook body"""
+    digest = base64.b64encode(hashlib.sha256(body.encode()).digest()).decode()
+    return (
+        api.AccessToken(os.getenv("LIVEKIT_API_KEY"), os.getenv("LIVEKIT_API_SECRET"))
+        .with_sha256(digest)
+        .to_jwt()
+    )
+
+
+async def simulate(url: str, calls: int, seed: int) -> None:
+    """Post signed synthetic call lifecycles, as LiveKit would, to a running receiver"""
+    rng = random.Random(seed)
+    sent = 0
+
+    async with ClientSession() as http:
+        async def post(event: api.WebhookEvent) -> None:
+            nonlocal sent
+            event.id = f"EV_{sent}_{rng.getrandbits(32):08x}"
+            event.created_at = int(time.time())
+            body = MessageToJson(event)
+            async with http.post(url, data=body, headers={"Authorization": sign(body)}) as resp:
+                resp.raise_for_status()
+            sent += 1
+
+        async def call_lifecycle(n: int) -> None:
+            room = api.Room(name=f"outbound-sim-{n:04d}", sid=f"RM_{n}")
+            phone = f"+1555{rng.randrange(10**7):07d}"
+            agent = api.ParticipantInfo(identity=f"agent-{n}", kind=api.ParticipantInfo.Kind.AGENT)
+            sip = api.ParticipantInfo(identity=f"sip_{phone[1:]}", kind=api.ParticipantInfo.Kind.SIP)
+            track = api.TrackInfo(sid=f"TR_{n}", type=api.TrackType.AUDIO)
+
+            await post(api.WebhookEvent(event="room_started", room=room))
+            await post(api.WebhookEvent(event="participant_joined", room=room, participant=agent))
+            await post(api.WebhookEvent(event="participant_joined", room=room, participant=sip))
+            await asyncio.sleep(rng.uniform(0.2, 1.0))
+            if rng.random() < 0.4:
+                await post(api.WebhookEvent(event="track_published", room=room, participant=sip, track=track))
+                await asyncio.sleep(rng.uniform(0.5, 2.0))
+            await post(api.WebhookEvent(event="participant_left", room=room, participant=sip))
+            await post(api.WebhookEvent(event="room_finished", room=room))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(call_lifecycle(n) for n in range(calls)))
+        elapsed = time.perf_counter() - started
+        print(f"✅ {sent} eventos firmados enviados en {elapsed:.1f}s ({sent / elapsed:.0f}/s)")
+
+        token = os.getenv(METRICS_TOKEN_ENV)
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        async with http.get(url.rsplit("/", 1)[0] + "/calls", headers=headers) as resp:
+            view = await resp.json()
+        print(f"📊 Registro: {len(view['active'])} activas, {len(view['recent'])} recientes, stats={view['stats']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor de llamadas por webhooks de LiveKit")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Recibir webhooks y servir la vista en vivo")
+    serve.add_argument("--host", default="127.0.0.1",
+                       help=f"Interfaz de escucha; fuera de 127.0.0.1 requiere {METRICS_TOKEN_ENV}")
+    serve.add_argument("--port", type=int, default=int(os.getenv("PORT", DEFAULT_PORT)))
+
+    sim = sub.add_parser("simulate", help="Enviar eventos sintéticos firmados a un receptor")
+    sim.add_argument("--url", default=f"http://localhost:{DEFAULT_PORT}/webhook")
+    sim.add_argument("--calls", type=int, default=20)
+    sim.add_argument("--seed", type=int, default=7)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        token = os.getenv(METRICS_TOKEN_ENV)
+        if not token and args.host not in ("127.0.0.1", "localhost", "::1"):
+            print(f"❌ Las vistas GET muestran números de teléfono: define {METRICS_TOKEN_ENV} para escuchar en {args.host}")
+            sys.exit(2)
+        print(f"🔍 Webhook monitor en http://{args.host}:{args.port} (POST /webhook, GET /calls)")
+        web.run_app(create_app(CallRegistry(), build_receiver(), token), host=args.host, port=args.port, print=None)
+    else:
+        asyncio.run(simulate(args.url, args.calls, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Call metrics pushed from the agent jobs to the ops dashboard
+
+Each job gets a MetricsEmitter when TDX_METRICS_URL is set. Events (call
+start/end, dial outcome, turn latency, Graph latency) are buffered in a
+bounded deque and posted in one batch per second together with a heartbeat
+carrying the process load, so a slow or dead dashboard never blocks a call
+or grows the job's memory.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import aiohttp
+
+from memory_profiler import rss_mb
+
+logger = logging.getLogger("worker_metrics")
+
+METRICS_URL_ENV = "TDX_METRICS_URL"
+METRICS_TOKEN_ENV = "TDX_METRICS_TOKEN"
+FLUSH_INTERVAL_S = 1.0
+# Events kept while the dashboard is unreachable; older ones are dropped
+MAX_BUFFERED_EVENTS = 1000
+POST_TIMEOUT_S = 2.0
+
+# Event types
+EVENT_CALL_STARTED = "call_started"
+EVENT_CALL_ENDED = "call_ended"
+EVENT_DIAL = "dial"
+EVENT_TURN = "turn"
+EVENT_GRAPH = "graph"
+EVENT_AUDIO_GATE = "audio_gate"
+EVENT_BARGE_IN = "barge_in"
+EVENT_FALLBACK = "fallback"
+EVENT_CALL_COST = "call_cost"
+EVENT_ANSWER_CACHE = "answer_cache"
+
+
+def worker_id() -> str:
+    """Name the dashboard groups load under: one per worker host"""
+    return os.getenv("TDX_WORKER_ID") or os.getenv("RENDER_INSTANCE_ID") or socket.gethostname()
+
+
+def process_load(loop_lag_s: float = 0.0) -> Dict[str, float]:
+    cpu = os.times()
+    return {
+        "loadavg_1m": os.getloadavg()[0],
+        "cpu_s": cpu.user + cpu.system,
+        "rss_mb": round(rss_mb(), 1),
+        # How late the flush timer fired: time the job's event loop was blocked
+        "loop_lag_ms": round(loop_lag_s * 1000, 1),
+    }
+
+
+class MetricsEmitter:
+    """Per-call event buffer flushed to the dashboard once per second"""
+
+    def __init__(
+        self,
+        url: str,
+        call_id: str,
+        *,
+        token: Optional[str] = None,
+        worker: Optional[str] = None,
+        flush_interval_s: float = FLUSH_INTERVAL_S,
+        max_buffered: int = MAX_BUFFERED_EVENTS,
+    ):
+        self.url = url
+        self.call_id = call_id
+        self.worker = worker or worker_id()
+        self.flush_interval_s = flush_interval_s
+        self._headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max_buffered)
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop_lag_s = 0.0
+        self.dropped = 0
+
+    def emit(self, event_type: str, **fields: Any) -> None:
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append({"t": time.time(), "type": event_type, **fields})
+
+    def start(self) -> None:
+        """Start flushing; must be called from the job's event loop"""
+        self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=POST_TIMEOUT_S))
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush(self) -> None:
+        events = list(self._events)
+        self._events.clear()
+        payload = {"worker": self.worker, "call": self.call_id, "load": process_load(self._loop_lag_s), "events": events}
+        try:
+            async with self._http.post(self.url, json=payload, headers=self._headers) as resp:
+                resp.raise_for_status()
+        except Exception as e:
+            # Retry next tick; if the buffer overflows the oldest events go first
+            pending = events + list(self._events)
+            self.dropped += max(0, len(pending) - self._events.maxlen)
+            self._events = deque(pending, maxlen=self._events.maxlen)
+            logger.debug(f"Metrics flush failed: {e}")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            woke_at = time.monotonic() + self.flush_interval_s
+            await asyncio.sleep(self.flush_interval_s)
+            self._loop_lag_s = max(0.0, time.monotonic() - woke_at)
+            await self._flush()
+
+    async def aclose(self) -> None:
+        """Stop the loop and send what is left, including call_ended"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._http is not None:
+            await self._flush()
+            await self._http.close()
+        if self.dropped:
+            logger.warning(f"📉 [{self.call_id}] {self.dropped} metric events dropped")
+
+
+def emitter_from_env(call_id: str) -> Optional[MetricsEmitter]:
+    """MetricsEmitter posting to TDX_METRICS_URL, or None when the dashboard is not configured"""
+    url = os.getenv(METRICS_URL_ENV)
+    if not url:
+        return None
+    return MetricsEmitter(url, call_id, token=os.getenv(METRICS_TOKEN_ENV))